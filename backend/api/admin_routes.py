@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
-from repository import RecipeRepository, CommentRepository, CategoryRepository, IngredientRepository
+from repository import RecipeRepository, CommentRepository, CategoryRepository, IngredientRepository, ConsumerRepository
+from service import AuthService
 from api.middleware import require_auth, require_admin
 from exception import ValidationError, NotFoundError
 
@@ -9,8 +10,7 @@ bp = Blueprint('admin', __name__)
 @require_auth
 @require_admin
 def list_recipes():
-    recipes = RecipeRepository.get_all()
-    return jsonify([r.to_dict() for r in recipes]), 200
+    return jsonify(RecipeRepository.get_all_rows()), 200
 
 @bp.route('/admin/recipes', methods=['POST'])
 @require_auth
@@ -88,3 +88,12 @@ def create_ingredient():
     )
     return jsonify(ingredient.to_dict()), 201
 
+@bp.route('/admin/consumers/<int:consumer_id>/sign-out', methods=['POST'])
+@require_auth
+@require_admin
+def sign_out_consumer(consumer_id):
+    if not ConsumerRepository.get_by_id(consumer_id):
+        raise NotFoundError("Consumer not found")
+    
+    AuthService.sign_out_everywhere(consumer_id)
+    return jsonify({'message': 'Consumer signed out'}), 200
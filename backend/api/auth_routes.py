@@ -2,7 +2,7 @@ import os
 from flask import Blueprint, request, jsonify, current_app
 from werkzeug.utils import secure_filename
 from service import AuthService
-from repository import ConsumerRepository
+from repository import ConsumerRepository, IngredientRepository
 from api.middleware import require_auth
 from exception import ValidationError
 
@@ -22,13 +22,13 @@ def register():
     phone = data.get('phone')
     password = data.get('password')
     
-    consumer = AuthService.register(username, email, phone, password)
-    token = AuthService.generate_token(consumer.id)
+    device_id = data.get('device_id')
     
-    return jsonify({
-        'access_token': token,
-        'consumer': consumer.to_dict()
-    }), 201
+    consumer = AuthService.register(username, email, phone, password, device_id)
+    result = AuthService.issue_tokens(consumer.id, device_id)
+    result['consumer'] = consumer.to_dict()
+    
+    return jsonify(result), 201
 
 @bp.route('/auth/login', methods=['POST', 'OPTIONS'])
 def login():
@@ -42,13 +42,38 @@ def login():
     email_or_phone = data.get('emailOrPhone')
     password = data.get('password')
     
-    result = AuthService.login(email_or_phone, password)
+    result = AuthService.login(email_or_phone, password, data.get('device_id'))
     return jsonify(result), 200
 
+@bp.route('/auth/refresh', methods=['POST', 'OPTIONS'])
+def refresh():
+    # OPTIONS запрос обрабатывается автоматически Flask-CORS
+    if request.method == 'OPTIONS':
+        return '', 200
+    data = request.get_json()
+    if not data:
+        raise ValidationError("Request body is required")
+    
+    result = AuthService.refresh(data.get('refresh_token'))
+    return jsonify(result), 200
+
+@bp.route('/auth/logout', methods=['POST'])
+@require_auth
+def logout():
+    data = request.get_json(silent=True) or {}
+    AuthService.logout(request.access_token, data.get('refresh_token'))
+    return jsonify({'message': 'Logged out'}), 200
+
+@bp.route('/auth/logout-all', methods=['POST'])
+@require_auth
+def logout_all():
+    AuthService.sign_out_everywhere(request.current_consumer.id)
+    return jsonify({'message': 'Logged out on all devices'}), 200
+
 @bp.route('/me', methods=['GET'])
 @require_auth
 def get_profile():
-    consumer = request.current_consumer
+    consumer = ConsumerRepository.get_by_id(request.current_consumer.id)
     return jsonify(consumer.to_dict()), 200
 
 @bp.route('/me', methods=['PUT'])
@@ -95,9 +120,9 @@ def upload_avatar():
 @bp.route('/me/forbidden-ingredients', methods=['GET'])
 @require_auth
 def get_forbidden_ingredients():
-    consumer = request.current_consumer
-    ingredients = [ing.to_dict() for ing in consumer.forbidden_ingredients]
-    return jsonify(ingredients), 200
+    principal = request.current_consumer
+    ingredients = IngredientRepository.get_by_ids(list(principal.forbidden_ingredient_ids))
+    return jsonify([ing.to_dict() for ing in ingredients]), 200
 
 @bp.route('/me/forbidden-ingredients', methods=['PUT'])
 @require_auth
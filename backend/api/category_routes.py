@@ -1,10 +1,14 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint
 from service import CategoryService
+from api.middleware import make_etag, conditional_json
 
 bp = Blueprint('categories', __name__)
 
+# Категории меняются только через админ-панель
+CATEGORIES_CACHE_CONTROL = 'public, max-age=300'
+
 @bp.route('/categories', methods=['GET'])
 def get_categories():
     categories = CategoryService.get_all()
-    return jsonify([c.to_dict() for c in categories]), 200
-
+    etag = make_etag('categories', [(c.id, c.name, c.image_url) for c in categories])
+    return conditional_json(etag, CATEGORIES_CACHE_CONTROL, lambda: [c.to_dict() for c in categories])
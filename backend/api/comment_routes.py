@@ -7,8 +7,7 @@ bp = Blueprint('comments', __name__)
 
 @bp.route('/recipes/<int:recipe_id>/comments', methods=['GET'])
 def get_comments(recipe_id):
-    comments = CommentService.get_comments(recipe_id)
-    return jsonify([c.to_dict() for c in comments]), 200
+    return jsonify(CommentService.get_comments(recipe_id)), 200
 
 @bp.route('/recipes/<int:recipe_id>/comments', methods=['POST'])
 @require_auth
@@ -1,13 +1,16 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request
 from service import IngredientService
+from api.middleware import make_etag, conditional_json
 
 bp = Blueprint('ingredients', __name__)
 
+INGREDIENTS_CACHE_CONTROL = 'public, max-age=60'
+
 @bp.route('/ingredients', methods=['GET'])
 def get_ingredients():
     query = request.args.get('q')
     limit = request.args.get('limit', 100, type=int)
     
     ingredients = IngredientService.search_ingredients(query=query, limit=limit)
-    return jsonify([ing.to_dict() for ing in ingredients]), 200
-
+    etag = make_etag('ingredients', [(ing.id, ing.name, ing.image_url) for ing in ingredients])
+    return conditional_json(etag, INGREDIENTS_CACHE_CONTROL, lambda: ingredients)
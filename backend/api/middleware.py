@@ -1,4 +1,5 @@
-from flask import request, jsonify
+import hashlib
+from flask import request, jsonify, Response
 from service import AuthService
 from exception import UnauthorizedError, ForbiddenError
 
@@ -13,8 +14,9 @@ def require_auth(f):
             token = token[7:]
         
         try:
-            consumer = AuthService.get_current_consumer(token)
-            request.current_consumer = consumer
+            # Principal из кэша: id, роль и запрещённые ингредиенты без запросов к БД
+            request.current_consumer = AuthService.get_principal(token)
+            request.access_token = token
             return f(*args, **kwargs)
         except Exception as e:
             raise UnauthorizedError(str(e))
@@ -36,3 +38,18 @@ def require_admin(f):
     wrapper.__name__ = f.__name__
     return wrapper
 
+
+def make_etag(*parts):
+    """Сильный ETag из версии или содержимого сущности"""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+def conditional_json(etag, cache_control, build):
+    """Условный GET: при совпадении If-None-Match отдаёт 304, не вызывая build();
+    иначе сериализует build() в JSON. Оба ответа несут ETag и Cache-Control."""
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
@@ -1,12 +1,18 @@
-from flask import Blueprint, request, jsonify
-from service import RecipeService, IngredientService
+from flask import Blueprint, request, jsonify, current_app
+from service import RecipeService, IngredientService, RecipeCardAssembler
+from service.recipe_fields import RecipeFields
+from service.history_ingestor import HistoryIngestor
 from repository import RecipeRepository, ConsumerRepository
-from api.middleware import require_auth
+from api.middleware import require_auth, make_etag, conditional_json
+from cache import ResponseCache, CatalogVersion
 from exception import ValidationError, NotFoundError
-from models import Mark, Comment
 
 bp = Blueprint('recipes', __name__)
 
+MAX_PAGE_SIZE = 100
+# Детали рецепта меняются с оценками и комментариями: клиент каждый раз переспрашивает по ETag
+RECIPE_CACHE_CONTROL = 'no-cache'
+
 @bp.route('/recipes', methods=['GET'])
 def search_recipes():
     # Получаем параметры запроса
@@ -17,6 +23,11 @@ def search_recipes():
     difficulty = request.args.get('difficulty')
     category_id = request.args.get('categoryId', type=int)
     sort = request.args.get('sort', 'match')
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    k = request.args.get('k', type=int)
+    # Какие части карточек считать и какие поля отдавать
+    fields = RecipeFields.parse(request.args.get('fields'), request.args.get('include'))
     
     # Получаем запрещённые ингредиенты пользователя, если авторизован
     forbidden_ingredient_ids = None
@@ -26,8 +37,8 @@ def search_recipes():
     if token and token.startswith('Bearer '):
         try:
             from service import AuthService
-            consumer = AuthService.get_current_consumer(token[7:])
-            forbidden_ingredient_ids = [ing.id for ing in consumer.forbidden_ingredients]
+            principal = AuthService.get_principal(token[7:])
+            forbidden_ingredient_ids = list(principal.forbidden_ingredient_ids)
         except:
             pass
     
@@ -36,6 +47,50 @@ def search_recipes():
         ingredient_list = [i.strip() for i in ingredients_param.split(',') if i.strip()]
         user_ingredient_ids = IngredientService.resolve_ingredient_ids(ingredient_list)
     
+    # Готовый ответ из кэша: ключ из канонизированных параметров и версии каталога
+    cache = ResponseCache.get() if current_app.config['RECIPE_CACHE_ENABLED'] else None
+    cache_key = (
+        CatalogVersion.get(),
+        ' '.join((query or '').lower().split()),
+        tuple(sorted(user_ingredient_ids)) if user_ingredient_ids is not None else None,
+        min_match, max_time, difficulty, category_id, sort, limit, cursor, k,
+        tuple(sorted(forbidden_ingredient_ids)) if forbidden_ingredient_ids is not None else None,
+        fields.key
+    )
+    if cache is not None:
+        cached = cache.lookup(cache_key)
+        if cached is not None:
+            return cached
+    
+    # Постраничная выдача: курсор следующей страницы отдаём в заголовке X-Next-Cursor
+    if limit is not None or cursor:
+        limit = limit or MAX_PAGE_SIZE
+        if not (1 <= limit <= MAX_PAGE_SIZE):
+            raise ValidationError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        
+        results, next_cursor = RecipeService.search_recipes_page(
+            limit,
+            cursor=cursor,
+            user_ingredient_ids=user_ingredient_ids,
+            forbidden_ingredient_ids=forbidden_ingredient_ids,
+            query=query,
+            max_time=max_time,
+            difficulty=difficulty,
+            category_id=category_id,
+            min_match=min_match,
+            sort=sort,
+            fields=fields
+        )
+        response = jsonify(results)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        if cache is not None:
+            cache.store(cache_key, response, headers=['X-Next-Cursor'])
+        return response, 200
+    
+    if k is not None and k < 1:
+        raise ValidationError("k must be positive")
+    
     # Поиск рецептов
     results = RecipeService.search_recipes(
         user_ingredient_ids=user_ingredient_ids,
@@ -45,10 +100,15 @@ def search_recipes():
         difficulty=difficulty,
         category_id=category_id,
         min_match=min_match,
-        sort=sort
+        sort=sort,
+        k=k,
+        fields=fields
     )
     
-    return jsonify(results), 200
+    response = jsonify(results)
+    if cache is not None:
+        cache.store(cache_key, response)
+    return response, 200
 
 @bp.route('/recipes/<int:recipe_id>', methods=['GET'])
 def get_recipe(recipe_id):
@@ -58,13 +118,20 @@ def get_recipe(recipe_id):
     if token and token.startswith('Bearer '):
         try:
             from service import AuthService
-            consumer = AuthService.get_current_consumer(token[7:])
+            principal = AuthService.get_principal(token[7:])
             # Можно использовать ингредиенты из профиля или передавать отдельно
         except:
             pass
     
-    recipe = RecipeService.get_recipe(recipe_id, user_ingredient_ids)
-    return jsonify(recipe), 200
+    fields = RecipeFields.parse(request.args.get('fields'), request.args.get('include'), detail=True)
+    
+    # Версия рецепта и счётчики из recipe_stats — одним лёгким запросом до загрузки деталей
+    etag = make_etag('recipe', recipe_id, RecipeRepository.get_version(recipe_id), fields.key)
+    return conditional_json(
+        etag,
+        RECIPE_CACHE_CONTROL,
+        lambda: RecipeService.get_recipe(recipe_id, user_ingredient_ids, fields)
+    )
 
 @bp.route('/recipes/<int:recipe_id>/missing', methods=['GET'])
 def get_missing_ingredients(recipe_id):
@@ -83,14 +150,7 @@ def get_missing_ingredients(recipe_id):
 def get_favorites():
     consumer = request.current_consumer
     recipes = RecipeRepository.get_favorites(consumer.id)
-    results = []
-    for recipe in recipes:
-        recipe_dict = recipe.to_dict()
-        marks = Mark.query.filter_by(recipe_id=recipe.id).all()
-        recipe_dict['avg_rating'] = sum(m.value for m in marks) / len(marks) if marks else 0.0
-        recipe_dict['comments_count'] = Comment.query.filter_by(recipe_id=recipe.id).count()
-        recipe_dict['categories'] = [c.to_dict() for c in recipe.categories]
-        results.append(recipe_dict)
+    results = RecipeCardAssembler.assemble([recipe.id for recipe in recipes], recipes)
     return jsonify(results), 200
 
 @bp.route('/favourites', methods=['POST'])
@@ -103,6 +163,7 @@ def add_favorite():
     
     consumer = request.current_consumer
     RecipeRepository.add_to_favorites(consumer.id, recipe_id)
+    RecipeService.refresh_recommendations(consumer.id)
     return jsonify({'message': 'Added to favorites'}), 201
 
 @bp.route('/favourites/<int:recipe_id>', methods=['DELETE'])
@@ -110,21 +171,16 @@ def add_favorite():
 def remove_favorite(recipe_id):
     consumer = request.current_consumer
     RecipeRepository.remove_from_favorites(consumer.id, recipe_id)
+    RecipeService.refresh_recommendations(consumer.id)
     return jsonify({'message': 'Removed from favorites'}), 200
 
 @bp.route('/history', methods=['GET'])
 @require_auth
 def get_history():
+    # Просмотры пишутся пакетами: последние (до HISTORY_FLUSH_INTERVAL секунд) могут ещё не попасть в выдачу
     consumer = request.current_consumer
     recipes = RecipeRepository.get_history(consumer.id)
-    results = []
-    for recipe in recipes:
-        recipe_dict = recipe.to_dict()
-        marks = Mark.query.filter_by(recipe_id=recipe.id).all()
-        recipe_dict['avg_rating'] = sum(m.value for m in marks) / len(marks) if marks else 0.0
-        recipe_dict['comments_count'] = Comment.query.filter_by(recipe_id=recipe.id).count()
-        recipe_dict['categories'] = [c.to_dict() for c in recipe.categories]
-        results.append(recipe_dict)
+    results = RecipeCardAssembler.assemble([recipe.id for recipe in recipes], recipes)
     return jsonify(results), 200
 
 @bp.route('/history', methods=['POST'])
@@ -134,10 +190,15 @@ def add_to_history():
     recipe_id = data.get('recipe_id')
     if not recipe_id:
         raise ValidationError("recipe_id is required")
+    try:
+        recipe_id = int(recipe_id)
+    except (TypeError, ValueError):
+        raise ValidationError("recipe_id must be an integer")
     
+    # Запись отложенная: просмотр попадёт в БД со следующим пакетом, лента пересчитается после записи
     consumer = request.current_consumer
-    RecipeRepository.add_to_history(consumer.id, recipe_id)
-    return jsonify({'message': 'Added to history'}), 201
+    HistoryIngestor.get().record(consumer.id, recipe_id)
+    return jsonify({'message': 'Added to history'}), 202
 
 @bp.route('/recommendations', methods=['GET'])
 @require_auth
@@ -0,0 +1,26 @@
+"""
+Пересчёт таблицы recipe_neighbor: похожие рецепты по ингредиентам и категориям.
+Использование:
+  python build_neighbors.py                      # Полный пересчёт
+  python build_neighbors.py --recipe-id 12 15    # Только изменённые рецепты и их соседи
+  python build_neighbors.py --top 30             # Размер списка соседей (по умолчанию 20)
+"""
+import argparse
+from run import create_app
+from extensions import db
+from service.recipe_similarity import RecipeSimilarity, DEFAULT_TOP_N
+
+def main():
+    parser = argparse.ArgumentParser(description='Пересчёт похожих рецептов')
+    parser.add_argument('--recipe-id', type=int, nargs='+', dest='recipe_ids')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP_N)
+    args = parser.parse_args()
+    
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        recipes, pairs = RecipeSimilarity.rebuild(args.recipe_ids, top_n=args.top)
+        print(f"✓ Neighbours rebuilt for {recipes} recipes ({pairs} pairs)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,19 @@
+from .recipe_index import RecipeIngredientIndex
+from .ingredient_lexicon import IngredientLexicon
+from .response_cache import CatalogVersion, ResponseCache
+from .recipe_factor_index import RecipeFactorIndex
+from .recommendation_feed import RecommendationFeed
+from .principal_cache import Principal, PrincipalCache
+from .revocation_filter import RevocationFilter
+
+__all__ = [
+    'RecipeIngredientIndex',
+    'IngredientLexicon',
+    'CatalogVersion',
+    'ResponseCache',
+    'RecipeFactorIndex',
+    'RecommendationFeed',
+    'Principal',
+    'PrincipalCache',
+    'RevocationFilter'
+]
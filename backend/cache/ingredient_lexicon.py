@@ -0,0 +1,211 @@
+import threading
+from bisect import bisect_left
+from collections import deque
+from flask import current_app
+from extensions import db
+from models import Ingredient
+from translit import is_latin, latin_key, to_cyrillic
+from .typo_index import DeletionIndex
+
+_build_lock = threading.Lock()
+
+
+def _suffix(entry):
+    name, start = entry
+    return name[start:]
+
+# Разговорные и альтернативные написания -> название ингредиента в каталоге
+INGREDIENT_ALIASES = {
+    'картошка': 'картофель',
+    'томаты': 'помидоры',
+    'томат': 'помидоры',
+    'яйцо': 'яйца',
+    'куриное филе': 'курица',
+    'филе курицы': 'курица',
+    'цыпленок': 'курица',
+    'шампиньон': 'шампиньоны',
+    'огурец': 'огурцы',
+    'баклажан': 'баклажаны',
+    'кабачок': 'кабачки',
+    'спагетти': 'паста',
+    'овсяные хлопья': 'овсянка',
+    'масло оливковое': 'оливковое масло',
+    'масло сливочное': 'сливочное масло'
+}
+
+# Минимальная уверенность, с которой опечатка исправляется на ингредиент
+TYPO_MIN_CONFIDENCE = 0.75
+
+
+class _SubstringAutomaton:
+    """Автомат Ахо-Корасик по словарю имён: все имена, входящие в строку, за один проход"""
+
+    def __init__(self, patterns):
+        self.transitions = [{}]
+        self.fail = [0]
+        self.outputs = [()]
+
+        for pattern, value in patterns.items():
+            state = 0
+            for char in pattern:
+                next_state = self.transitions[state].get(char)
+                if next_state is None:
+                    next_state = len(self.transitions)
+                    self.transitions[state][char] = next_state
+                    self.transitions.append({})
+                    self.fail.append(0)
+                    self.outputs.append(())
+                state = next_state
+            self.outputs[state] = self.outputs[state] + value
+
+        queue = deque(self.transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.transitions[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.transitions[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.transitions[fallback].get(char, 0)
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.fail[next_state]]
+
+    def find(self, text):
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in self.transitions[state]:
+                state = self.fail[state]
+            state = self.transitions[state].get(char, 0)
+            found.update(self.outputs[state])
+        return found
+
+
+class IngredientLexicon:
+    """Словарь ингредиентов в памяти процесса для разбора параметра ingredients=.
+
+    Семантика как у IngredientRepository.get_by_names: имя подходит, если запрос
+    входит в нормализованное название ингредиента или название входит в запрос.
+    - names: нормализованное имя -> ID ингредиентов;
+    - aliases: альтернативное написание -> нормализованное имя;
+    - suffixes: суффиксный массив имён (запрос внутри имени — префикс одного из суффиксов);
+    - automaton: Ахо-Корасик по именам (имя внутри запроса);
+    - typos: индекс удалений (SymSpell) по именам и синонимам для исправления опечаток;
+    - latin: ключ латинского написания имени или синонима -> ID (прямая транслитерация).
+    Запрос латиницей дополнительно переводится в кириллицу (обратная транслитерация).
+    """
+
+    EXTENSION_KEY = 'ingredient_lexicon'
+    VERSION_KEY = 'ingredient_lexicon_version'
+
+    def __init__(self, rows, aliases=None, version=0):
+        self.version = version
+        self.names = {}
+        self.aliases = {}
+
+        for ingredient_id, name in rows:
+            normalized = Ingredient.normalize_name(name)
+            if not normalized:
+                continue
+            self.names[normalized] = self.names.get(normalized, ()) + (ingredient_id,)
+
+        # (имя, начало суффикса), по возрастанию суффикса: память линейна по длине имён
+        self.suffixes = sorted(
+            ((normalized, start) for normalized in self.names for start in range(len(normalized))),
+            key=_suffix
+        )
+
+        self.automaton = _SubstringAutomaton(self.names)
+
+        for alias, name in (INGREDIENT_ALIASES if aliases is None else aliases).items():
+            alias = Ingredient.normalize_name(alias)
+            name = Ingredient.normalize_name(name)
+            if alias != name and name in self.names:
+                self.aliases[alias] = name
+
+        self.typos = DeletionIndex(list(self.names) + list(self.aliases))
+
+        self.latin = {}
+        for written in list(self.names) + list(self.aliases):
+            ids = self.names[self.aliases.get(written, written)]
+            key = latin_key(written)
+            self.latin[key] = self.latin.get(key, ()) + ids
+
+    @classmethod
+    def build(cls, version=0):
+        rows = db.session.query(Ingredient.id, Ingredient.name).all()
+        return cls(rows, version=version)
+
+    @classmethod
+    def get(cls):
+        """Возвращает словарь текущего приложения, строит его при первом обращении"""
+        lexicon = current_app.extensions.get(cls.EXTENSION_KEY)
+        if lexicon is None:
+            with _build_lock:
+                lexicon = current_app.extensions.get(cls.EXTENSION_KEY)
+                if lexicon is None:
+                    lexicon = cls.build(version=cls.current_version())
+                    current_app.extensions[cls.EXTENSION_KEY] = lexicon
+        return lexicon
+
+    @classmethod
+    def current_version(cls):
+        return current_app.extensions.get(cls.VERSION_KEY, 0)
+
+    @classmethod
+    def invalidate(cls):
+        """Сбрасывает словарь и повышает версию; следующий разбор построит его заново"""
+        with _build_lock:
+            current_app.extensions[cls.VERSION_KEY] = cls.current_version() + 1
+            current_app.extensions.pop(cls.EXTENSION_KEY, None)
+
+    def lookup(self, name):
+        """ID ингредиентов, подходящих под одно имя"""
+        normalized = Ingredient.normalize_name(name)
+        if not normalized:
+            return set()
+        found = set()
+        if is_latin(normalized):
+            found.update(self.latin.get(latin_key(normalized), ()))
+            normalized = to_cyrillic(normalized)
+        found.update(self._containing(normalized))
+        found.update(self.automaton.find(normalized))
+        alias = self.aliases.get(normalized)
+        if alias:
+            found.update(self.names[alias])
+        return found
+
+    def _containing(self, query):
+        """ID ингредиентов, в имени которых есть query: суффиксы с префиксом query идут подряд"""
+        found = set()
+        position = bisect_left(self.suffixes, query, key=_suffix)
+        while position < len(self.suffixes):
+            name, start = self.suffixes[position]
+            if not name.startswith(query, start):
+                break
+            found.update(self.names[name])
+            position += 1
+        return found
+
+    def correct(self, name):
+        """Исправление опечатки: (имя в каталоге, ID, уверенность) или None"""
+        normalized = Ingredient.normalize_name(name)
+        if is_latin(normalized):
+            normalized = to_cyrillic(normalized)
+        closest = self.typos.closest(normalized, canonical=lambda word: self.aliases.get(word, word))
+        if closest is None:
+            return None
+        candidate, confidence = closest
+        canonical = self.aliases.get(candidate, candidate)
+        return canonical, set(self.names[canonical]), confidence
+
+    def resolve(self, names, min_confidence=TYPO_MIN_CONFIDENCE):
+        """ID ингредиентов для списка имён; без точного совпадения — исправляем опечатку"""
+        ingredient_ids = set()
+        for name in names:
+            found = self.lookup(name)
+            if not found:
+                correction = self.correct(name)
+                if correction and correction[2] >= min_confidence:
+                    found = correction[1]
+            ingredient_ids.update(found)
+        return ingredient_ids
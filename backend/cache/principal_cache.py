@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from extensions import db
+from models import Consumer, consumer_ingredient
+
+_build_lock = threading.Lock()
+
+
+class Principal:
+    """То, что нужно обработчику запроса о пользователе: id, роль, запрещённые ингредиенты"""
+    __slots__ = ('id', 'role_id', 'forbidden_ingredient_ids', 'expires_at')
+
+    def __init__(self, consumer_id, role_id, forbidden_ingredient_ids, expires_at):
+        self.id = consumer_id
+        self.role_id = role_id
+        self.forbidden_ingredient_ids = forbidden_ingredient_ids
+        self.expires_at = expires_at
+
+
+class PrincipalCache:
+    """Короткоживущий кэш Principal по consumer_id для require_auth.
+
+    ConsumerRepository сбрасывает запись при изменении пользователя; в других
+    процессах изменения видны не позже чем через ttl.
+    """
+
+    EXTENSION_KEY = 'principal_cache'
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        # Повышается при сбросе: загрузка, начатая до сброса, не кладёт устаревшие данные
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def get(cls):
+        cache = current_app.extensions.get(cls.EXTENSION_KEY)
+        if cache is None:
+            with _build_lock:
+                cache = current_app.extensions.get(cls.EXTENSION_KEY)
+                if cache is None:
+                    config = current_app.config
+                    cache = cls(config['PRINCIPAL_CACHE_TTL'], config['PRINCIPAL_CACHE_MAX_ENTRIES'])
+                    current_app.extensions[cls.EXTENSION_KEY] = cache
+        return cache
+
+    @classmethod
+    def invalidate(cls, consumer_id):
+        cache = current_app.extensions.get(cls.EXTENSION_KEY)
+        if cache is None:
+            return
+        with cache.lock:
+            cache.entries.pop(consumer_id, None)
+            cache.generation += 1
+
+    def lookup(self, consumer_id):
+        """Principal пользователя или None, если его нет"""
+        now = time.monotonic()
+        with self.lock:
+            principal = self.entries.get(consumer_id)
+            if principal is not None and principal.expires_at > now:
+                self.entries.move_to_end(consumer_id)
+                return principal
+            generation = self.generation
+
+        principal = self._load(consumer_id, now + self.ttl)
+        if principal is None:
+            return None
+        with self.lock:
+            if self.generation == generation:
+                self.entries[consumer_id] = principal
+                self.entries.move_to_end(consumer_id)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return principal
+
+    @staticmethod
+    def _load(consumer_id, expires_at):
+        # Роль и запрещённые ингредиенты одним запросом
+        rows = db.session.query(Consumer.role_id, consumer_ingredient.c.ingredient_id).outerjoin(
+            consumer_ingredient, consumer_ingredient.c.consumer_id == Consumer.id
+        ).filter(Consumer.id == consumer_id).all()
+        if not rows:
+            return None
+        forbidden = tuple(sorted(ingredient_id for _, ingredient_id in rows if ingredient_id is not None))
+        return Principal(consumer_id, rows[0].role_id, forbidden, expires_at)
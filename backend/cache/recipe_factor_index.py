@@ -0,0 +1,102 @@
+import threading
+import time
+import numpy as np
+from flask import current_app
+from extensions import db
+from models import RecipeFactor
+
+_build_lock = threading.Lock()
+
+
+class RecipeFactorIndex:
+    """Векторы рецептов из train_recommender.py в памяти процесса.
+
+    Поиск top-K по скалярному произведению: по умолчанию полный перебор одной матричной
+    операцией; с ann_tables > 0 — кандидаты из LSH по случайным гиперплоскостям
+    (приближённо, для больших каталогов).
+    """
+
+    EXTENSION_KEY = 'recipe_factor_index'
+    # В среднем рецептов в корзине LSH: число бит подбирается под размер каталога
+    ANN_BUCKET_SIZE = 16
+
+    def __init__(self, rows, ann_tables=0, seed=0):
+        self.loaded_at = time.monotonic()
+        self.recipe_ids = np.array([recipe_id for recipe_id, _ in rows], dtype=np.int64)
+        if rows:
+            self.vectors = np.vstack([np.frombuffer(vector, dtype=np.float32) for _, vector in rows])
+        else:
+            self.vectors = np.zeros((0, 0), dtype=np.float32)
+
+        self.planes = None
+        self.buckets = []
+        if ann_tables and rows:
+            bits = int(np.clip(np.log2(max(len(rows) / self.ANN_BUCKET_SIZE, 1)), 1, 30))
+            rng = np.random.default_rng(seed)
+            self.planes = rng.normal(size=(ann_tables, bits, self.vectors.shape[1])).astype(np.float32)
+            for codes in self._codes(self.vectors):
+                buckets = {}
+                for position, code in enumerate(codes):
+                    buckets.setdefault(int(code), []).append(position)
+                self.buckets.append({code: np.array(positions) for code, positions in buckets.items()})
+
+    def _codes(self, vectors):
+        """Коды LSH: знак проекции на каждую гиперплоскость, упакованный в целое; по одному массиву на таблицу"""
+        weights = 1 << np.arange(self.planes.shape[1])
+        return [((vectors @ planes.T) > 0) @ weights for planes in self.planes]
+
+    @staticmethod
+    def _load():
+        return db.session.query(RecipeFactor.recipe_id, RecipeFactor.vector).order_by(RecipeFactor.recipe_id).all()
+
+    @classmethod
+    def get(cls):
+        """Индекс текущего приложения; перечитывается из БД раз в RECOMMENDER_RELOAD_SECONDS"""
+        config = current_app.config
+        index = current_app.extensions.get(cls.EXTENSION_KEY)
+        if index is None or time.monotonic() - index.loaded_at > config['RECOMMENDER_RELOAD_SECONDS']:
+            with _build_lock:
+                index = current_app.extensions.get(cls.EXTENSION_KEY)
+                if index is None or time.monotonic() - index.loaded_at > config['RECOMMENDER_RELOAD_SECONDS']:
+                    index = cls(cls._load(), config['RECOMMENDER_ANN_TABLES'])
+                    current_app.extensions[cls.EXTENSION_KEY] = index
+        return index
+
+    @classmethod
+    def invalidate(cls):
+        current_app.extensions.pop(cls.EXTENSION_KEY, None)
+
+    def _candidates(self, vector):
+        if self.planes is None:
+            return None
+        found = [
+            buckets.get(int(codes[0]))
+            for buckets, codes in zip(self.buckets, self._codes(vector[np.newaxis, :]))
+        ]
+        found = [positions for positions in found if positions is not None]
+        return np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+
+    def top_k(self, vector_bytes, k, exclude=()):
+        """[(recipe_id, score)] — k лучших рецептов для вектора пользователя"""
+        if not len(self.recipe_ids):
+            return []
+        vector = np.frombuffer(vector_bytes, dtype=np.float32)
+        if vector.shape[0] != self.vectors.shape[1]:
+            return []
+
+        positions = self._candidates(vector)
+        # Если LSH нашёл слишком мало кандидатов — полный перебор
+        if positions is None or len(positions) < k:
+            positions = np.arange(len(self.recipe_ids))
+        if exclude:
+            positions = positions[~np.isin(self.recipe_ids[positions], list(exclude))]
+        if not len(positions):
+            return []
+
+        scores = self.vectors[positions] @ vector
+        if len(scores) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.lexsort((self.recipe_ids[positions[best]], -scores[best]))]
+        return [(int(self.recipe_ids[positions[i]]), float(scores[i])) for i in best]
@@ -0,0 +1,135 @@
+import threading
+from flask import current_app
+from extensions import db
+from models.associations import recipe_ingredient
+
+_build_lock = threading.Lock()
+
+
+class RecipeIngredientIndex:
+    """Битовый индекс рецепт→ингредиенты в памяти процесса.
+
+    Каждому ингредиенту назначается позиция бита, каждому рецепту — позиция
+    в списке рецептов. Храним две проекции:
+    - recipe_masks: рецепт -> битовая маска его ингредиентов;
+    - ingredient_postings: ингредиент -> битовая маска рецептов, где он есть.
+    """
+
+    EXTENSION_KEY = 'recipe_ingredient_index'
+    # Поколение индекса: повышается при сбросе, индекс старого поколения не используется
+    VERSION_KEY = 'recipe_ingredient_index_version'
+
+    def __init__(self, rows, version=0):
+        self.version = version
+        self.ingredient_bits = {}
+        self.bit_ingredients = []
+        self.recipe_positions = {}
+        self.position_recipes = []
+        self.recipe_masks = []
+        self.recipe_totals = []
+        self.ingredient_postings = {}
+
+        for recipe_id, ingredient_id in rows:
+            bit = self.ingredient_bits.get(ingredient_id)
+            if bit is None:
+                bit = len(self.bit_ingredients)
+                self.ingredient_bits[ingredient_id] = bit
+                self.bit_ingredients.append(ingredient_id)
+
+            position = self.recipe_positions.get(recipe_id)
+            if position is None:
+                position = len(self.position_recipes)
+                self.recipe_positions[recipe_id] = position
+                self.position_recipes.append(recipe_id)
+                self.recipe_masks.append(0)
+
+            self.recipe_masks[position] |= 1 << bit
+            self.ingredient_postings[ingredient_id] = (
+                self.ingredient_postings.get(ingredient_id, 0) | (1 << position)
+            )
+
+        self.recipe_totals = [mask.bit_count() for mask in self.recipe_masks]
+
+    @classmethod
+    def build(cls, version=0):
+        rows = db.session.query(
+            recipe_ingredient.c.recipe_id,
+            recipe_ingredient.c.ingredient_id
+        ).all()
+        return cls(rows, version=version)
+
+    @classmethod
+    def get(cls):
+        """Возвращает индекс текущего приложения, строит его при первом обращении
+        и после сброса (индекс другого поколения перестраивается)"""
+        index = current_app.extensions.get(cls.EXTENSION_KEY)
+        if index is None or index.version != cls.current_version():
+            with _build_lock:
+                index = current_app.extensions.get(cls.EXTENSION_KEY)
+                if index is None or index.version != cls.current_version():
+                    index = cls.build(version=cls.current_version())
+                    current_app.extensions[cls.EXTENSION_KEY] = index
+        return index
+
+    @classmethod
+    def current_version(cls):
+        return current_app.extensions.get(cls.VERSION_KEY, 0)
+
+    @classmethod
+    def invalidate(cls):
+        """Сбрасывает индекс и повышает поколение; следующий поиск построит его заново.
+        Под _build_lock: построение, начатое до изменения каталога, не переживёт сброс"""
+        with _build_lock:
+            current_app.extensions[cls.VERSION_KEY] = cls.current_version() + 1
+            current_app.extensions.pop(cls.EXTENSION_KEY, None)
+
+    @staticmethod
+    def _positions(mask):
+        """Позиции установленных битов маски"""
+        bits = bin(mask)[:1:-1]
+        return [i for i, bit in enumerate(bits) if bit == '1']
+
+    def _user_mask(self, ingredient_ids):
+        mask = 0
+        for ingredient_id in ingredient_ids:
+            bit = self.ingredient_bits.get(ingredient_id)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def match(self, ingredient_ids, min_match=0.0):
+        """Рецепты, содержащие все выбранные ингредиенты: {recipe_id: match_percent}"""
+        selected = set(ingredient_ids)
+        if not selected:
+            return {}
+
+        candidates = -1
+        for ingredient_id in selected:
+            posting = self.ingredient_postings.get(ingredient_id)
+            if not posting:
+                return {}
+            candidates &= posting
+
+        matched = len(selected)
+        results = {}
+        for position in self._positions(candidates):
+            match_percent = matched / self.recipe_totals[position]
+            if match_percent >= min_match:
+                results[self.position_recipes[position]] = match_percent
+        return results
+
+    def match_info(self, recipe_id, ingredient_ids):
+        """match_percent и ID недостающих ингредиентов для одного рецепта"""
+        position = self.recipe_positions.get(recipe_id)
+        if position is None:
+            return 0.0, []
+
+        recipe_mask = self.recipe_masks[position]
+        user_mask = self._user_mask(ingredient_ids)
+        total = self.recipe_totals[position]
+        matched = (recipe_mask & user_mask).bit_count()
+        missing_ids = [
+            self.bit_ingredients[bit]
+            for bit in self._positions(recipe_mask & ~user_mask)
+        ]
+        return matched / total, missing_ids
@@ -0,0 +1,119 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from .response_cache import CatalogVersion
+
+logger = logging.getLogger(__name__)
+
+_build_lock = threading.Lock()
+
+
+class FeedEntry:
+    __slots__ = ('cards', 'built_at', 'version')
+
+    def __init__(self, cards, built_at, version):
+        self.cards = cards
+        self.built_at = built_at
+        self.version = version
+
+
+class RecommendationFeed:
+    """Готовые ленты рекомендаций по пользователям (stale-while-revalidate).
+
+    Свежая лента отдаётся из памяти. Протухшая (TTL или смена версии каталога) тоже
+    отдаётся сразу, а пересчёт уходит в фоновый пул потоков. Синхронно лента строится
+    только при первом обращении пользователя.
+    """
+
+    EXTENSION_KEY = 'recommendation_feed'
+
+    def __init__(self, app, ttl, max_entries, workers):
+        self.app = app
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.pending = set()
+        self.lock = threading.Lock()
+        # workers == 0 — пересчёт в текущем потоке (тесты, однопоточный запуск)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='feed') if workers else None
+
+    @classmethod
+    def get(cls):
+        """Ленты текущего приложения с параметрами из конфигурации"""
+        feed = current_app.extensions.get(cls.EXTENSION_KEY)
+        if feed is None:
+            with _build_lock:
+                feed = current_app.extensions.get(cls.EXTENSION_KEY)
+                if feed is None:
+                    config = current_app.config
+                    feed = cls(
+                        current_app._get_current_object(),
+                        config['RECOMMENDATION_FEED_TTL'],
+                        config['RECOMMENDATION_FEED_MAX_ENTRIES'],
+                        config['RECOMMENDATION_FEED_WORKERS']
+                    )
+                    current_app.extensions[cls.EXTENSION_KEY] = feed
+        return feed
+
+    def _is_fresh(self, entry):
+        return time.monotonic() - entry.built_at < self.ttl and entry.version == CatalogVersion.get()
+
+    def read(self, consumer_id, build):
+        """Лента пользователя; build(consumer_id) строит её заново"""
+        with self.lock:
+            entry = self.entries.get(consumer_id)
+            if entry is not None:
+                self.entries.move_to_end(consumer_id)
+        if entry is None:
+            return self._store(consumer_id, build(consumer_id), CatalogVersion.get())
+        if not self._is_fresh(entry):
+            self.refresh(consumer_id, build)
+        return entry.cards
+
+    def refresh(self, consumer_id, build):
+        """Пересчитывает ленту в фоне; повторные запросы, пока пересчёт идёт, схлопываются.
+        Пользователей без ленты не трогаем — она построится при первом чтении"""
+        with self.lock:
+            if consumer_id not in self.entries or consumer_id in self.pending:
+                return
+            self.pending.add(consumer_id)
+        if self.executor is None:
+            self._rebuild(consumer_id, build)
+        else:
+            self.executor.submit(self._rebuild, consumer_id, build)
+
+    def _rebuild(self, consumer_id, build):
+        try:
+            with self.app.app_context():
+                # Версию берём до построения: запись каталога во время пересчёта протухнет ленту снова
+                version = CatalogVersion.get()
+                cards = build(consumer_id)
+            # Ленту сбросили, пока шёл пересчёт (например, сменились запрещённые ингредиенты)
+            self._store(consumer_id, cards, version, replace_only=True)
+        except Exception:
+            logger.exception("Recommendation feed refresh failed for consumer %s", consumer_id)
+        finally:
+            with self.lock:
+                self.pending.discard(consumer_id)
+
+    def _store(self, consumer_id, cards, version, replace_only=False):
+        with self.lock:
+            if replace_only and consumer_id not in self.entries:
+                return cards
+            self.entries[consumer_id] = FeedEntry(cards, time.monotonic(), version)
+            self.entries.move_to_end(consumer_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return cards
+
+    def discard(self, consumer_id):
+        """Убирает ленту: следующее чтение построит её синхронно"""
+        with self.lock:
+            self.entries.pop(consumer_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, Response
+
+_version_lock = threading.Lock()
+_build_lock = threading.Lock()
+
+
+class CatalogVersion:
+    """Номер версии каталога (рецепты, категории, ингредиенты) текущего приложения.
+
+    Повышается при каждом изменении каталога; ключи закэшированных ответов
+    содержат версию, поэтому после записи старые ответы больше не находятся.
+    """
+
+    EXTENSION_KEY = 'catalog_version'
+
+    @classmethod
+    def get(cls):
+        return current_app.extensions.get(cls.EXTENSION_KEY, 0)
+
+    @classmethod
+    def bump(cls):
+        with _version_lock:
+            version = current_app.extensions.get(cls.EXTENSION_KEY, 0) + 1
+            current_app.extensions[cls.EXTENSION_KEY] = version
+        return version
+
+
+class CachedResponse:
+    __slots__ = ('body', 'headers', 'status', 'expires_at')
+
+    def __init__(self, body, headers, status, expires_at):
+        self.body = body
+        self.headers = headers
+        self.status = status
+        self.expires_at = expires_at
+
+    @property
+    def size(self):
+        return len(self.body) + sum(len(k) + len(v) for k, v in self.headers)
+
+    def to_response(self):
+        response = Response(self.body, status=self.status, mimetype='application/json')
+        for name, value in self.headers:
+            response.headers[name] = value
+        return response
+
+
+class ResponseCache:
+    """LRU-кэш готовых JSON-ответов с ограничением по числу записей, памяти и времени жизни.
+
+    TTL ограничивает устаревание счётчиков (рейтинг, комментарии, избранное),
+    которые меняются без смены версии каталога.
+    """
+
+    EXTENSION_KEY = 'recipe_response_cache'
+
+    def __init__(self, max_entries, max_bytes, ttl):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def get(cls):
+        """Кэш ответов текущего приложения с лимитами из конфигурации"""
+        cache = current_app.extensions.get(cls.EXTENSION_KEY)
+        if cache is None:
+            with _build_lock:
+                cache = current_app.extensions.get(cls.EXTENSION_KEY)
+                if cache is None:
+                    config = current_app.config
+                    cache = cls(
+                        config['RECIPE_CACHE_MAX_ENTRIES'],
+                        config['RECIPE_CACHE_MAX_BYTES'],
+                        config['RECIPE_CACHE_TTL']
+                    )
+                    current_app.extensions[cls.EXTENSION_KEY] = cache
+        return cache
+
+    def lookup(self, key):
+        """Flask-ответ из кэша или None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+        return entry.to_response()
+
+    def store(self, key, response, headers=()):
+        """Кладёт JSON-ответ в кэш; headers — имена заголовков, которые нужно сохранить"""
+        if response.status_code != 200:
+            return
+        entry = CachedResponse(
+            response.get_data(),
+            [(name, response.headers[name]) for name in headers if name in response.headers],
+            response.status_code,
+            time.monotonic() + self.ttl
+        )
+        if entry.size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = entry
+            self.size += entry.size
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.size -= entry.size
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
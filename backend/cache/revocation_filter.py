@@ -0,0 +1,72 @@
+import hashlib
+import math
+import threading
+import time
+from flask import current_app
+from extensions import db
+from models import RevokedToken
+
+_build_lock = threading.Lock()
+
+
+class RevocationFilter:
+    """Фильтр Блума по ключам таблицы revoked_token в памяти процесса.
+
+    Отрицательный ответ точный: токен не отозван, к БД не идём. Положительный
+    (отозван или ложное срабатывание) AuthService перепроверяет по таблице.
+    Фильтр перестраивается раз в REVOCATION_FILTER_REFRESH_SECONDS; отзывы из
+    этого процесса добавляются в него сразу, из других — видны после перестройки.
+    """
+
+    EXTENSION_KEY = 'revocation_filter'
+    # Минимальная ёмкость: запас под отзывы между перестройками
+    MIN_CAPACITY = 1024
+
+    def __init__(self, keys, fp_rate):
+        capacity = max(2 * len(keys), self.MIN_CAPACITY)
+        self.size = math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.loaded_at = time.monotonic()
+        for key in keys:
+            self._add(key)
+
+    def _positions(self, key):
+        # Двойное хэширование: k позиций из двух 64-битных половин одного дайджеста
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def _add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def might_contain(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    @staticmethod
+    def _load():
+        return [key for key, in db.session.query(RevokedToken.key).filter(RevokedToken.expires_at >= time.time())]
+
+    @classmethod
+    def get(cls):
+        """Фильтр текущего приложения; перестраивается из БД раз в REVOCATION_FILTER_REFRESH_SECONDS"""
+        config = current_app.config
+        bloom = current_app.extensions.get(cls.EXTENSION_KEY)
+        if bloom is None or time.monotonic() - bloom.loaded_at > config['REVOCATION_FILTER_REFRESH_SECONDS']:
+            with _build_lock:
+                bloom = current_app.extensions.get(cls.EXTENSION_KEY)
+                if bloom is None or time.monotonic() - bloom.loaded_at > config['REVOCATION_FILTER_REFRESH_SECONDS']:
+                    bloom = cls(cls._load(), config['REVOCATION_FILTER_FP_RATE'])
+                    current_app.extensions[cls.EXTENSION_KEY] = bloom
+        return bloom
+
+    @classmethod
+    def add(cls, key):
+        """Отзыв из этого процесса (после коммита): виден сразу, не дожидаясь перестройки.
+        Под _build_lock, чтобы не потеряться в фильтре, который как раз перестраивается"""
+        with _build_lock:
+            bloom = current_app.extensions.get(cls.EXTENSION_KEY)
+            if bloom is not None:
+                bloom._add(key)
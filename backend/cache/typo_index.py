@@ -0,0 +1,92 @@
+def edit_distance(source, target, limit=None):
+    """Расстояние Левенштейна; при превышении limit возвращает limit + 1"""
+    if source == target:
+        return 0
+    if len(source) < len(target):
+        source, target = target, source
+    if limit is not None and len(source) - len(target) > limit:
+        return limit + 1
+
+    previous = list(range(len(target) + 1))
+    for i, source_char in enumerate(source, 1):
+        current = [i]
+        for j, target_char in enumerate(target, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (source_char != target_char)
+            ))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def max_typos(word):
+    """Допустимое число опечаток в зависимости от длины слова"""
+    length = len(word)
+    if length < 4:
+        return 0
+    if length < 7:
+        return 1
+    return 2
+
+
+class DeletionIndex:
+    """Индекс удалений в стиле SymSpell для поиска слов в пределах расстояния Левенштейна.
+
+    Для каждого слова заранее сохраняются все варианты с удалением до max_distance символов.
+    Два слова на расстоянии не больше d имеют общий вариант удаления, поэтому при поиске
+    достаточно перебрать удаления запроса и проверить найденных кандидатов.
+    """
+
+    def __init__(self, words=(), max_distance=2):
+        self.max_distance = max_distance
+        self.deletes = {}
+        for word in words:
+            for variant in self._variants(word, max_distance):
+                self.deletes.setdefault(variant, set()).add(word)
+
+    @staticmethod
+    def _variants(word, max_distance):
+        variants = {word}
+        frontier = {word}
+        for _ in range(max_distance):
+            next_frontier = set()
+            for variant in frontier:
+                for i in range(len(variant)):
+                    next_frontier.add(variant[:i] + variant[i + 1:])
+            next_frontier -= variants
+            variants |= next_frontier
+            frontier = next_frontier
+        return variants
+
+    def search(self, word, max_distance):
+        """Слова в пределах max_distance: [(distance, word)] по возрастанию расстояния"""
+        max_distance = min(max_distance, self.max_distance)
+        candidates = set()
+        for variant in self._variants(word, max_distance):
+            candidates.update(self.deletes.get(variant, ()))
+        results = []
+        for candidate in candidates:
+            distance = edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                results.append((distance, candidate))
+        return sorted(results)
+
+    def closest(self, word, max_distance=None, canonical=None):
+        """Ближайшее слово и уверенность 0..1 или None, если ничего не нашлось.
+        canonical(слово) — к чему слово сводится (синоним -> имя): такие слова не соперничают"""
+        if max_distance is None:
+            max_distance = max_typos(word)
+        if max_distance <= 0:
+            return None
+        matches = self.search(word, max_distance)
+        if not matches:
+            return None
+        distance, best = matches[0]
+        confidence = 1 - distance / max(len(word), len(best))
+        # Несколько разных кандидатов на одном расстоянии — неоднозначность, снижаем уверенность
+        canonical = canonical or (lambda candidate: candidate)
+        ties = len({canonical(candidate) for d, candidate in matches if d == distance})
+        return best, confidence / ties
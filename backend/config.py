@@ -11,6 +11,56 @@ class Config:
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key')
     JWT_ALGORITHM = 'HS256'
     JWT_EXPIRATION_HOURS = 24
+    # Refresh-токен устройства (POST /api/auth/refresh): срок с последнего обновления
+    REFRESH_TOKEN_EXPIRATION_DAYS = int(os.getenv('REFRESH_TOKEN_EXPIRATION_DAYS', '30'))
+    # Отзыв access-токенов: фильтр Блума по revoked_token перестраивается раз в столько секунд
+    # (столько же отзыв из другого процесса может быть не виден); доля ложных срабатываний фильтра
+    REVOCATION_FILTER_REFRESH_SECONDS = int(os.getenv('REVOCATION_FILTER_REFRESH_SECONDS', '30'))
+    REVOCATION_FILTER_FP_RATE = float(os.getenv('REVOCATION_FILTER_FP_RATE', '0.01'))
+    
+    # Подбор по ингредиентам: битовый индекс в памяти или агрегат в БД
+    RECIPE_INDEX_ENABLED = os.getenv('RECIPE_INDEX_ENABLED', 'true').lower() == 'true'
+    # Полнотекстовый поиск рецептов (tsvector/FTS5) вместо ILIKE по названию
+    RECIPE_FULLTEXT_ENABLED = os.getenv('RECIPE_FULLTEXT_ENABLED', 'true').lower() == 'true'
+    # Кэш ответов GET /api/recipes: LRU с лимитом записей и памяти, TTL в секундах
+    RECIPE_CACHE_ENABLED = os.getenv('RECIPE_CACHE_ENABLED', 'true').lower() == 'true'
+    RECIPE_CACHE_MAX_ENTRIES = int(os.getenv('RECIPE_CACHE_MAX_ENTRIES', '1024'))
+    RECIPE_CACHE_MAX_BYTES = int(os.getenv('RECIPE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+    RECIPE_CACHE_TTL = int(os.getenv('RECIPE_CACHE_TTL', '30'))
+    
+    # Хэширование паролей в пуле процессов: метод werkzeug (смена вызывает перехэширование при входе),
+    # число процессов (0 — в потоке запроса) и сколько задач может ждать сверх них до ответа 503
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+    PASSWORD_HASH_MAX_QUEUE = int(os.getenv('PASSWORD_HASH_MAX_QUEUE', '16'))
+    
+    # Кэш пользователя для require_auth (роль, запрещённые ингредиенты): время жизни в секундах и размер
+    PRINCIPAL_CACHE_TTL = int(os.getenv('PRINCIPAL_CACHE_TTL', '30'))
+    PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv('PRINCIPAL_CACHE_MAX_ENTRIES', '10000'))
+    
+    # Отложенная запись истории просмотров: период и размер пакета (HISTORY_FLUSH_INTERVAL=0 — писать сразу),
+    # каталог спула на случай недоступности БД (по умолчанию instance/history_spool)
+    HISTORY_FLUSH_INTERVAL = float(os.getenv('HISTORY_FLUSH_INTERVAL', '2'))
+    HISTORY_FLUSH_SIZE = int(os.getenv('HISTORY_FLUSH_SIZE', '500'))
+    HISTORY_SPOOL_DIR = os.getenv('HISTORY_SPOOL_DIR', '')
+    
+    # Сериализация JSON через orjson (если установлен); false — стандартный json
+    ORJSON_ENABLED = os.getenv('ORJSON_ENABLED', 'true').lower() == 'true'
+    
+    # Затухающие счета популярности: период полураспада веса события в днях
+    # (sort=popular — долгая память, sort=trending — события последней недели)
+    POPULARITY_HALF_LIFE_DAYS = float(os.getenv('POPULARITY_HALF_LIFE_DAYS', '90'))
+    TRENDING_HALF_LIFE_DAYS = float(os.getenv('TRENDING_HALF_LIFE_DAYS', '2'))
+    
+    # Коллаборативные рекомендации (train_recommender.py): минимум оценок и избранного у пользователя,
+    # число таблиц LSH для приближённого top-K (0 — полный перебор), период перечитывания векторов
+    RECOMMENDER_MIN_INTERACTIONS = int(os.getenv('RECOMMENDER_MIN_INTERACTIONS', '5'))
+    RECOMMENDER_ANN_TABLES = int(os.getenv('RECOMMENDER_ANN_TABLES', '0'))
+    RECOMMENDER_RELOAD_SECONDS = int(os.getenv('RECOMMENDER_RELOAD_SECONDS', '300'))
+    # Лента рекомендаций: время жизни, число пользователей в памяти, потоки фонового пересчёта
+    RECOMMENDATION_FEED_TTL = int(os.getenv('RECOMMENDATION_FEED_TTL', '600'))
+    RECOMMENDATION_FEED_MAX_ENTRIES = int(os.getenv('RECOMMENDATION_FEED_MAX_ENTRIES', '10000'))
+    RECOMMENDATION_FEED_WORKERS = int(os.getenv('RECOMMENDATION_FEED_WORKERS', '2'))
     
     # Парсим CORS_ORIGINS: split, strip, фильтруем пустые
     cors_origins_str = os.getenv('CORS_ORIGINS', 'http://localhost:8080')
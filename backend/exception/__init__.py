@@ -3,6 +3,7 @@ from .handlers import (
     ValidationError,
     NotFoundError,
     UnauthorizedError,
-    ForbiddenError
+    ForbiddenError,
+    ServiceUnavailableError
 )
 
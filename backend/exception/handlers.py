@@ -23,6 +23,11 @@ class ForbiddenError(AppException):
     def __init__(self, message="Forbidden", details=None):
         super().__init__(message, code=403, details=details)
 
+class ServiceUnavailableError(AppException):
+    def __init__(self, message="Service temporarily unavailable", details=None, retry_after=None):
+        super().__init__(message, code=503, details=details)
+        self.retry_after = retry_after
+
 def register_error_handlers(app):
     @app.errorhandler(AppException)
     def handle_app_exception(e):
@@ -34,7 +39,10 @@ def register_error_handlers(app):
         }
         if e.details:
             response['error']['details'] = e.details
-        return jsonify(response), e.code
+        headers = {}
+        if getattr(e, 'retry_after', None):
+            headers['Retry-After'] = str(e.retry_after)
+        return jsonify(response), e.code, headers
     
     @app.errorhandler(BadRequest)
     def handle_bad_request(e):
@@ -5,6 +5,14 @@ from .category import Category
 from .comment import Comment
 from .mark import Mark
 from .learning import Learning, StepLearning
+from .recipe_stats import RecipeStats, ScoreEpoch
+from .recipe_neighbor import RecipeNeighbor
+from .recommender_factor import ConsumerFactor, RecipeFactor
+from .refresh_token import RefreshToken
+from .revoked_token import RevokedToken
+from .schema import ensure_schema
+from .recipe_search import ensure_recipe_search_index
+from .ingredient_search import ingredient_trigram, ensure_ingredient_search_index
 from .associations import (
     recipe_category,
     recipe_ingredient,
@@ -24,6 +32,17 @@ __all__ = [
     'Mark',
     'Learning',
     'StepLearning',
+    'RecipeStats',
+    'ScoreEpoch',
+    'RecipeNeighbor',
+    'ConsumerFactor',
+    'RecipeFactor',
+    'RefreshToken',
+    'RevokedToken',
+    'ensure_schema',
+    'ensure_recipe_search_index',
+    'ingredient_trigram',
+    'ensure_ingredient_search_index',
     'recipe_category',
     'recipe_ingredient',
     'consumer_ingredient',
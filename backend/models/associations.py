@@ -22,7 +22,8 @@ consumer_ingredient = db.Table(
 consumer_recipe_fav = db.Table(
     'consumer_recipe_fav',
     db.Column('consumer_id', db.Integer, db.ForeignKey('consumer.id'), primary_key=True),
-    db.Column('recipe_id', db.Integer, db.ForeignKey('recipe.id'), primary_key=True)
+    db.Column('recipe_id', db.Integer, db.ForeignKey('recipe.id'), primary_key=True),
+    db.Column('added_at', db.DateTime, default=datetime.utcnow)
 )
 
 consumer_recipe_history = db.Table(
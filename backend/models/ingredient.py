@@ -1,10 +1,13 @@
+import re
 from extensions import db
+from sqlalchemy.orm import validates
 
 class Ingredient(db.Model):
     __tablename__ = 'ingredient'
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
+    normalized_name = db.Column(db.String(100), nullable=True, index=True)
     image_url = db.Column(db.String(255), nullable=True)
     
     recipes = db.relationship(
@@ -18,10 +21,21 @@ class Ingredient(db.Model):
         back_populates='forbidden_ingredients'
     )
     
+    @staticmethod
+    def normalize_name(name):
+        if not name:
+            return ''
+        normalized = name.strip().lower().replace('ё', 'е')
+        return re.sub(r'\s+', ' ', normalized)
+    
+    @validates('name')
+    def _set_normalized_name(self, key, name):
+        self.normalized_name = Ingredient.normalize_name(name)
+        return name
+    
     def to_dict(self):
         return {
             'id': self.id,
             'name': self.name,
             'image_url': self.image_url
         }
-
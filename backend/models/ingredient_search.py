@@ -0,0 +1,79 @@
+from extensions import db
+from sqlalchemy import event, text, select
+from .ingredient import Ingredient
+
+# Нечёткий поиск ингредиентов по нормализованному имени.
+# PostgreSQL: pg_trgm и GIN-индекс по ingredient.normalized_name.
+# SQLite: таблица триграмм ingredient_trigram, заполняемая событиями маппера.
+
+ingredient_trigram = db.Table(
+    'ingredient_trigram',
+    db.Column('trigram', db.String(3), primary_key=True),
+    db.Column('ingredient_id', db.Integer, db.ForeignKey('ingredient.id', ondelete='CASCADE'), primary_key=True)
+)
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE INDEX IF NOT EXISTS ix_ingredient_normalized_name_trgm
+    ON ingredient USING GIN (normalized_name gin_trgm_ops)
+    """
+]
+
+def trigrams(value):
+    """Триграммы в стиле pg_trgm: каждое слово дополняется двумя пробелами слева и одним справа"""
+    result = set()
+    for word in value.split():
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+def _uses_trigram_table(connection):
+    return connection.dialect.name != 'postgresql'
+
+def _write_trigrams(connection, ingredient_id, normalized_name):
+    connection.execute(
+        ingredient_trigram.delete().where(ingredient_trigram.c.ingredient_id == ingredient_id)
+    )
+    rows = [
+        {'trigram': trigram, 'ingredient_id': ingredient_id}
+        for trigram in trigrams(normalized_name or '')
+    ]
+    if rows:
+        connection.execute(ingredient_trigram.insert(), rows)
+
+@event.listens_for(Ingredient, 'after_insert')
+@event.listens_for(Ingredient, 'after_update')
+def _index_ingredient(mapper, connection, ingredient):
+    if _uses_trigram_table(connection):
+        _write_trigrams(connection, ingredient.id, ingredient.normalized_name)
+
+@event.listens_for(Ingredient, 'after_delete')
+def _unindex_ingredient(mapper, connection, ingredient):
+    if _uses_trigram_table(connection):
+        connection.execute(
+            ingredient_trigram.delete().where(ingredient_trigram.c.ingredient_id == ingredient.id)
+        )
+
+def _create_postgres_index(target, connection, **kw):
+    if connection.dialect.name == 'postgresql':
+        for statement in POSTGRES_DDL:
+            connection.execute(text(statement))
+
+def ensure_ingredient_search_index(engine):
+    """Для уже существующей БД (после ensure_schema): индекс и заполнение normalized_name и триграмм"""
+    with engine.begin() as connection:
+        _create_postgres_index(Ingredient.__table__, connection)
+
+        rows = connection.execute(select(Ingredient.__table__.c.id, Ingredient.__table__.c.name)).all()
+        for ingredient_id, name in rows:
+            normalized_name = Ingredient.normalize_name(name)
+            connection.execute(
+                Ingredient.__table__.update().where(Ingredient.__table__.c.id == ingredient_id).values(
+                    normalized_name=normalized_name
+                )
+            )
+            if _uses_trigram_table(connection):
+                _write_trigrams(connection, ingredient_id, normalized_name)
+
+event.listen(Ingredient.__table__, 'after_create', _create_postgres_index)
@@ -16,6 +16,8 @@ class Recipe(db.Model):
     cooking_time = db.Column(db.Integer, nullable=False)  # в минутах
     difficulty = db.Column(db.Enum(Difficulty), nullable=False, default=Difficulty.MEDIUM)
     image_url = db.Column(db.String(255), nullable=True)
+    # Версия содержимого рецепта, повышается при каждом изменении (для ETag)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     
     categories = db.relationship(
         'Category',
@@ -40,6 +42,7 @@ class Recipe(db.Model):
     comments = db.relationship('Comment', back_populates='recipe', cascade='all, delete-orphan')
     marks = db.relationship('Mark', back_populates='recipe', cascade='all, delete-orphan')
     learning = db.relationship('Learning', back_populates='recipe', uselist=False, cascade='all, delete-orphan')
+    stats = db.relationship('RecipeStats', back_populates='recipe', uselist=False, cascade='all, delete-orphan')
     
     def to_dict(self, include_details=False):
         data = {
@@ -63,4 +66,23 @@ class Recipe(db.Model):
                 data['steps'] = [s.to_dict() for s in sorted(self.learning.steps, key=lambda x: x.number)]
         
         return data
+    
+    DETAIL_PARTS = ('stats', 'categories', 'ingredients', 'steps')
+    
+    def to_detail_dict(self, include=DETAIL_PARTS):
+        """Детали из заранее загруженных связей (RecipeRepository.get_details):
+        счётчики берутся из recipe_stats, шаги уже упорядочены связью Learning.steps.
+        include — какие части добавлять; остальные связи не трогаются"""
+        data = self.to_dict()
+        if 'categories' in include:
+            data['categories'] = [c.to_dict() for c in self.categories]
+        if 'ingredients' in include:
+            data['ingredients'] = [i.to_dict() for i in self.ingredients]
+        if 'stats' in include:
+            data['comments_count'] = self.stats.comment_count if self.stats else 0
+            data['avg_rating'] = self.stats.avg_rating if self.stats else 0.0
+            data['favorites_count'] = self.stats.favorite_count if self.stats else 0
+        if 'steps' in include and self.learning:
+            data['steps'] = [s.to_dict() for s in self.learning.steps]
+        return data
 
@@ -0,0 +1,9 @@
+from extensions import db
+
+class RecipeNeighbor(db.Model):
+    """Предвычисленные похожие рецепты (top-N по ингредиентам и категориям), строит build_neighbors.py"""
+    __tablename__ = 'recipe_neighbor'
+    
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id', ondelete='CASCADE'), primary_key=True)
+    neighbor_id = db.Column(db.Integer, db.ForeignKey('recipe.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
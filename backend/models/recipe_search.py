@@ -0,0 +1,75 @@
+from sqlalchemy import event, text
+from .recipe import Recipe
+
+# Полнотекстовый индекс по названию и описанию рецепта.
+# PostgreSQL: генерируемая колонка tsvector (русская конфигурация) + GIN-индекс.
+# SQLite: теневая таблица FTS5, синхронизируемая триггерами.
+
+POSTGRES_DDL = [
+    """
+    ALTER TABLE recipe ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_recipe_search_vector ON recipe USING GIN (search_vector)"
+]
+
+# Текст в FTS5 кладём с заменой ё→е: unicode61 не снимает диакритику с кириллицы
+_SQLITE_TITLE = "replace(replace({row}.title, 'ё', 'е'), 'Ё', 'Е')"
+_SQLITE_DESCRIPTION = "replace(replace({row}.description, 'ё', 'е'), 'Ё', 'Е')"
+
+def _sqlite_values(row):
+    return f"{row}.id, {_SQLITE_TITLE.format(row=row)}, {_SQLITE_DESCRIPTION.format(row=row)}"
+
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipe_fts USING fts5(
+        title, description,
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS recipe_fts_ai AFTER INSERT ON recipe BEGIN
+        INSERT INTO recipe_fts(rowid, title, description) VALUES ({_sqlite_values('new')});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipe_fts_ad AFTER DELETE ON recipe BEGIN
+        DELETE FROM recipe_fts WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS recipe_fts_au AFTER UPDATE ON recipe BEGIN
+        DELETE FROM recipe_fts WHERE rowid = old.id;
+        INSERT INTO recipe_fts(rowid, title, description) VALUES ({_sqlite_values('new')});
+    END
+    """
+]
+
+SQLITE_REBUILD = [
+    "DELETE FROM recipe_fts",
+    f"INSERT INTO recipe_fts(rowid, title, description) SELECT {_sqlite_values('recipe')} FROM recipe"
+]
+
+def create_recipe_search_index(target, connection, rebuild=False, **kw):
+    """Создаёт полнотекстовый индекс для текущего диалекта (идемпотентно)"""
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        statements = POSTGRES_DDL
+    elif dialect == 'sqlite':
+        statements = list(SQLITE_DDL)
+        if rebuild:
+            statements.extend(SQLITE_REBUILD)
+    else:
+        return
+    for statement in statements:
+        connection.execute(text(statement))
+
+def ensure_recipe_search_index(engine):
+    """Для уже существующей БД, где after_create не срабатывает"""
+    with engine.begin() as connection:
+        create_recipe_search_index(Recipe.__table__, connection, rebuild=True)
+
+event.listen(Recipe.__table__, 'after_create', create_recipe_search_index)
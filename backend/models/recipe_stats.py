@@ -0,0 +1,34 @@
+from extensions import db
+
+class RecipeStats(db.Model):
+    """Денормализованная статистика рецепта, обновляется вместе с исходными записями"""
+    __tablename__ = 'recipe_stats'
+    
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id', ondelete='CASCADE'), primary_key=True)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    avg_rating = db.Column(db.Float, nullable=False, default=0.0, index=True)
+    comment_count = db.Column(db.Integer, nullable=False, default=0)
+    favorite_count = db.Column(db.Integer, nullable=False, default=0, index=True)
+    view_count = db.Column(db.Integer, nullable=False, default=0)
+    # Взвешенные события с экспоненциальным затуханием, в масштабе эпохи из score_epoch
+    popularity_score = db.Column(db.Float, nullable=False, default=0.0, index=True)
+    trending_score = db.Column(db.Float, nullable=False, default=0.0, index=True)
+    
+    recipe = db.relationship('Recipe', back_populates='stats')
+    
+    def to_dict(self):
+        return {
+            'avg_rating': self.avg_rating,
+            'comments_count': self.comment_count,
+            'favorites_count': self.favorite_count
+        }
+
+
+class ScoreEpoch(db.Model):
+    """Точка отсчёта затухающего счёта: recipe_stats хранит счёт, умноженный на 2^((epoch - now) / период полураспада)"""
+    __tablename__ = 'score_epoch'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    # Unix-время в секундах
+    epoch = db.Column(db.Float, nullable=False)
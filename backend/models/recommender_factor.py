@@ -0,0 +1,19 @@
+from extensions import db
+from datetime import datetime
+
+class ConsumerFactor(db.Model):
+    """Вектор пользователя из матричного разложения взаимодействий (train_recommender.py)"""
+    __tablename__ = 'consumer_factor'
+    
+    consumer_id = db.Column(db.Integer, db.ForeignKey('consumer.id', ondelete='CASCADE'), primary_key=True)
+    vector = db.Column(db.LargeBinary, nullable=False)  # float32, RECOMMENDER_FACTORS значений
+    interactions = db.Column(db.Integer, nullable=False, default=0)
+    trained_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class RecipeFactor(db.Model):
+    """Вектор рецепта из того же разложения"""
+    __tablename__ = 'recipe_factor'
+    
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id', ondelete='CASCADE'), primary_key=True)
+    vector = db.Column(db.LargeBinary, nullable=False)
+    trained_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,17 @@
+from extensions import db
+from datetime import datetime
+
+class RefreshToken(db.Model):
+    """Refresh-токен устройства пользователя. Храним только SHA-256 токена;
+    при каждом обновлении токен заменяется новым (ротация)"""
+    __tablename__ = 'refresh_token'
+    __table_args__ = (db.UniqueConstraint('consumer_id', 'device_id', name='uq_refresh_token_device'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    consumer_id = db.Column(db.Integer, db.ForeignKey('consumer.id', ondelete='CASCADE'), nullable=False)
+    device_id = db.Column(db.String(64), nullable=False)
+    token_hash = db.Column(db.String(64), unique=True, nullable=False)
+    # Хэш предыдущего токена: его повторное предъявление означает утечку, устройство разлогиниваем
+    previous_hash = db.Column(db.String(64), index=True, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
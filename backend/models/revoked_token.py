@@ -0,0 +1,12 @@
+from extensions import db
+
+class RevokedToken(db.Model):
+    """Отозванные access-токены: 'jti:<jti>' — один токен (выход),
+    'consumer:<id>' — все токены пользователя, выданные до revoked_at (принудительный выход)"""
+    __tablename__ = 'revoked_token'
+    
+    key = db.Column(db.String(64), primary_key=True)
+    consumer_id = db.Column(db.Integer, db.ForeignKey('consumer.id', ondelete='CASCADE'), nullable=False)
+    # Unix-время в секундах; после expires_at отозванные токены истекли сами, запись не нужна
+    revoked_at = db.Column(db.Float, nullable=False)
+    expires_at = db.Column(db.Float, nullable=False, index=True)
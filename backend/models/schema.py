@@ -0,0 +1,32 @@
+from sqlalchemy import inspect, text
+
+# Колонки, добавленные в существующие таблицы после первого create_all:
+# (таблица, колонка, определение для ALTER TABLE ... ADD COLUMN)
+ADDED_COLUMNS = [
+    ('ingredient', 'normalized_name', 'VARCHAR(100)'),
+    ('recipe', 'version', 'INTEGER NOT NULL DEFAULT 1'),
+    ('recipe_stats', 'popularity_score', 'FLOAT NOT NULL DEFAULT 0'),
+    ('recipe_stats', 'trending_score', 'FLOAT NOT NULL DEFAULT 0'),
+    ('consumer_recipe_fav', 'added_at', 'TIMESTAMP')
+]
+
+# Индексы по добавленным колонкам: (имя индекса, таблица, колонка)
+ADDED_INDEXES = [
+    ('ix_recipe_stats_popularity_score', 'recipe_stats', 'popularity_score'),
+    ('ix_recipe_stats_trending_score', 'recipe_stats', 'trending_score')
+]
+
+def ensure_schema(engine):
+    """Досоздаёт недостающие колонки в уже существующей БД (create_all их не добавляет)"""
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        tables = set(inspector.get_table_names())
+        for table_name, column_name, definition in ADDED_COLUMNS:
+            if table_name not in tables:
+                continue
+            columns = {column['name'] for column in inspector.get_columns(table_name)}
+            if column_name not in columns:
+                connection.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {definition}'))
+        for index_name, table_name, column_name in ADDED_INDEXES:
+            if table_name in tables:
+                connection.execute(text(f'CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({column_name})'))
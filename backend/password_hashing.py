@@ -0,0 +1,16 @@
+"""Хэширование паролей для пула процессов: без импорта приложения, чтобы воркеры стартовали быстро"""
+from werkzeug.security import generate_password_hash, check_password_hash
+
+def hash_password(password, method):
+    return generate_password_hash(password, method=method)
+
+def verify_password(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+def method_of(password_hash):
+    """Параметры хэша в формате werkzeug: 'scrypt:32768:8:1', 'pbkdf2:sha256:600000'"""
+    return password_hash.split('$', 1)[0]
+
+def canonical_method(method):
+    """Полная запись метода с параметрами по умолчанию: 'pbkdf2:sha256' -> 'pbkdf2:sha256:600000'"""
+    return method_of(generate_password_hash('', method=method))
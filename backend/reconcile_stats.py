@@ -0,0 +1,20 @@
+"""
+Пересборка денормализованной статистики recipe_stats по исходным таблицам
+(mark, comment, consumer_recipe_fav, consumer_recipe_history).
+Использование:
+  python reconcile_stats.py
+"""
+from run import create_app
+from extensions import db
+from repository import RecipeStatsRepository
+
+def main():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        RecipeStatsRepository.ensure_epochs()
+        count = RecipeStatsRepository.reconcile()
+        print(f"✓ Recipe stats rebuilt for {count} recipes")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+"""
+Перенос эпохи затухающих счетов популярности (recipe_stats.popularity_score, trending_score)
+на текущий момент. Порядок рецептов не меняется; запускать периодически (например, раз в сутки
+из cron), чтобы множители новых событий не росли неограниченно.
+Использование:
+  python renormalize_scores.py
+"""
+from run import create_app
+from extensions import db
+from repository import RecipeStatsRepository
+
+def main():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        RecipeStatsRepository.ensure_epochs()
+        count = RecipeStatsRepository.renormalize()
+        print(f"✓ Popularity scores renormalized for {count} recipes")
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,11 @@ from .recipe_repository import RecipeRepository
 from .category_repository import CategoryRepository
 from .comment_repository import CommentRepository
 from .mark_repository import MarkRepository
+from .recipe_stats_repository import RecipeStatsRepository
+from .recipe_neighbor_repository import RecipeNeighborRepository
+from .recommender_repository import RecommenderRepository
+from .refresh_token_repository import RefreshTokenRepository
+from .revoked_token_repository import RevokedTokenRepository
 
 __all__ = [
     'ConsumerRepository',
@@ -11,6 +16,11 @@ __all__ = [
     'RecipeRepository',
     'CategoryRepository',
     'CommentRepository',
-    'MarkRepository'
+    'MarkRepository',
+    'RecipeStatsRepository',
+    'RecipeNeighborRepository',
+    'RecommenderRepository',
+    'RefreshTokenRepository',
+    'RevokedTokenRepository'
 ]
 
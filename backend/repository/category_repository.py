@@ -1,5 +1,7 @@
 from extensions import db
 from models import Category
+from models.associations import recipe_category
+from cache import CatalogVersion
 
 class CategoryRepository:
     @staticmethod
@@ -14,10 +16,24 @@ class CategoryRepository:
     def get_all():
         return Category.query.all()
     
+    @staticmethod
+    def get_by_recipe_ids(recipe_ids):
+        """Возвращает {recipe_id: [Category, ...]} одним запросом"""
+        result = {recipe_id: [] for recipe_id in recipe_ids}
+        if not recipe_ids:
+            return result
+        rows = db.session.query(recipe_category.c.recipe_id, Category).join(
+            Category, Category.id == recipe_category.c.category_id
+        ).filter(recipe_category.c.recipe_id.in_(recipe_ids)).order_by(Category.id).all()
+        for recipe_id, category in rows:
+            result[recipe_id].append(category)
+        return result
+    
     @staticmethod
     def create(name):
         category = Category(name=name)
         db.session.add(category)
         db.session.commit()
+        CatalogVersion.bump()
         return category
 
@@ -1,6 +1,8 @@
 from extensions import db
-from models import Comment
+from models import Comment, Consumer
 from exception import NotFoundError
+from repository.recipe_stats_repository import RecipeStatsRepository
+from repository.rows import CommentRow
 
 class CommentRepository:
     @staticmethod
@@ -11,10 +13,19 @@ class CommentRepository:
     def get_by_recipe(recipe_id):
         return Comment.query.filter_by(recipe_id=recipe_id).order_by(Comment.created_at.desc()).all()
     
+    @staticmethod
+    def get_rows_by_recipe(recipe_id):
+        """Комментарии рецепта строками CommentRow: имя автора берётся join-ом, а не запросом на каждый"""
+        q = db.session.query(*CommentRow.COLUMNS).join(Consumer, Consumer.id == Comment.consumer_id).filter(
+            Comment.recipe_id == recipe_id
+        ).order_by(Comment.created_at.desc())
+        return [CommentRow.from_row(row) for row in q]
+    
     @staticmethod
     def create(text, consumer_id, recipe_id):
         comment = Comment(text=text, consumer_id=consumer_id, recipe_id=recipe_id)
         db.session.add(comment)
+        RecipeStatsRepository.increment(recipe_id, comment_count=1)
         db.session.commit()
         return comment
     
@@ -24,5 +35,6 @@ class CommentRepository:
         if not comment:
             raise NotFoundError("Comment not found")
         db.session.delete(comment)
+        RecipeStatsRepository.increment(comment.recipe_id, comment_count=-1, happened_at=comment.created_at)
         db.session.commit()
 
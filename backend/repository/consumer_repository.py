@@ -1,6 +1,7 @@
 from extensions import db
 from models import Consumer, Role
 from exception import NotFoundError
+from cache import RecommendationFeed, PrincipalCache
 
 class ConsumerRepository:
     @staticmethod
@@ -23,14 +24,18 @@ class ConsumerRepository:
         return consumer
     
     @staticmethod
-    def create(username, email, phone, password, role_id=2):
+    def create(username, email, phone, password, role_id=2, password_hash=None):
+        """password_hash — уже посчитанный хэш (PasswordHasher); иначе хэшируем password здесь"""
         consumer = Consumer(
             username=username,
             email=email,
             phone=phone,
             role_id=role_id
         )
-        consumer.set_password(password)
+        if password_hash:
+            consumer.password_hash = password_hash
+        else:
+            consumer.set_password(password)
         db.session.add(consumer)
         db.session.commit()
         return consumer
@@ -46,8 +51,14 @@ class ConsumerRepository:
                 setattr(consumer, key, value)
         
         db.session.commit()
+        PrincipalCache.invalidate(consumer_id)
         return consumer
     
+    @staticmethod
+    def update_password_hash(consumer_id, password_hash):
+        Consumer.query.filter_by(id=consumer_id).update({Consumer.password_hash: password_hash})
+        db.session.commit()
+    
     @staticmethod
     def set_forbidden_ingredients(consumer_id, ingredient_ids):
         consumer = ConsumerRepository.get_by_id(consumer_id)
@@ -58,5 +69,8 @@ class ConsumerRepository:
         ingredients = Ingredient.query.filter(Ingredient.id.in_(ingredient_ids)).all()
         consumer.forbidden_ingredients = ingredients
         db.session.commit()
+        PrincipalCache.invalidate(consumer_id)
+        # Старая лента может содержать рецепты с теперь запрещёнными ингредиентами
+        RecommendationFeed.get().discard(consumer_id)
         return consumer
 
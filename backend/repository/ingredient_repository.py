@@ -1,14 +1,18 @@
-import re
 from extensions import db
-from models import Ingredient
+from models import Ingredient, ingredient_trigram
+from models.ingredient_search import trigrams
+from cache import IngredientLexicon, CatalogVersion
+from translit import is_latin, to_cyrillic
+from repository.rows import IngredientRow
+from sqlalchemy import case, cast, func, or_, select, Float
+
+# Порог похожести, как pg_trgm.similarity_threshold по умолчанию
+TRIGRAM_SIMILARITY_THRESHOLD = 0.3
 
 class IngredientRepository:
     @staticmethod
     def _normalize_name(name):
-        if not name:
-            return ''
-        normalized = name.strip().lower().replace('ё', 'е')
-        return re.sub(r'\s+', ' ', normalized)
+        return Ingredient.normalize_name(name)
 
     @staticmethod
     def get_by_id(ingredient_id):
@@ -20,50 +24,91 @@ class IngredientRepository:
     
     @staticmethod
     def search(query=None, limit=100):
-        q = Ingredient.query
+        q = Ingredient.query.with_entities(*IngredientRow.COLUMNS)
         if not query:
-            return q.limit(limit).all()
+            return [IngredientRow.from_row(row) for row in q.limit(limit)]
 
         normalized_query = IngredientRepository._normalize_name(query)
         if not normalized_query:
             return []
+        # Набрано латиницей: ищем по обратной транслитерации ("kuritsa" -> "курица")
+        if is_latin(normalized_query):
+            normalized_query = to_cyrillic(normalized_query)
+
+        if db.engine.dialect.name == 'postgresql':
+            q, similarity = IngredientRepository._pg_trgm_candidates(q, normalized_query)
+        elif len(normalized_query) < 3:
+            # Из короткого запроса не собрать триграмму: ищем по началу слов
+            q = q.filter(or_(
+                Ingredient.normalized_name.startswith(normalized_query, autoescape=True),
+                Ingredient.normalized_name.contains(' ' + normalized_query, autoescape=True)
+            ))
+            similarity = None
+        else:
+            q, similarity = IngredientRepository._trigram_candidates(q, normalized_query)
+
+        # Сначала совпадения по началу названия, затем по похожести
+        prefix_first = case(
+            (Ingredient.normalized_name.startswith(normalized_query, autoescape=True), 0),
+            else_=1
+        )
+        order = [prefix_first]
+        if similarity is not None:
+            order.append(similarity.desc())
+        order.extend([Ingredient.name, Ingredient.id])
+        return [IngredientRow.from_row(row) for row in q.order_by(*order).limit(limit)]
+
+    @staticmethod
+    def _pg_trgm_candidates(q, normalized_query):
+        """PostgreSQL: оператор % и similarity() из pg_trgm, обслуживаются GIN-индексом"""
+        q = q.filter(or_(
+            Ingredient.normalized_name.contains(normalized_query, autoescape=True),
+            Ingredient.normalized_name.op('%')(normalized_query)
+        ))
+        return q, func.similarity(Ingredient.normalized_name, normalized_query)
+
+    @staticmethod
+    def _trigram_candidates(q, normalized_query):
+        """SQLite: кандидаты из таблицы ingredient_trigram, похожесть как в pg_trgm"""
+        query_trigrams = trigrams(normalized_query)
+        shared_trigram = case((ingredient_trigram.c.trigram.in_(query_trigrams), 1), else_=0)
+        candidate_ids = select(ingredient_trigram.c.ingredient_id).where(
+            ingredient_trigram.c.trigram.in_(query_trigrams)
+        )
+        counts = select(
+            ingredient_trigram.c.ingredient_id,
+            func.sum(shared_trigram).label('shared'),
+            func.count().label('total')
+        ).where(
+            ingredient_trigram.c.ingredient_id.in_(candidate_ids)
+        ).group_by(ingredient_trigram.c.ingredient_id).subquery('ingredient_trigram_match')
+
+        shared = cast(counts.c.shared, Float)
+        similarity = shared / (len(query_trigrams) + counts.c.total - shared)
+        q = q.join(counts, counts.c.ingredient_id == Ingredient.id).filter(or_(
+            Ingredient.normalized_name.contains(normalized_query, autoescape=True),
+            similarity >= TRIGRAM_SIMILARITY_THRESHOLD
+        ))
+        return q, similarity
 
-        ingredients = q.all()
-        matched = []
-        for ing in ingredients:
-            ing_name = IngredientRepository._normalize_name(ing.name)
-            if normalized_query in ing_name:
-                matched.append(ing)
-                if len(matched) >= limit:
-                    break
-        return matched
-    
     @staticmethod
     def get_by_ids(ingredient_ids):
         return Ingredient.query.filter(Ingredient.id.in_(ingredient_ids)).all()
     
     @staticmethod
     def get_by_names(names):
-        normalized_names = [
-            IngredientRepository._normalize_name(name)
-            for name in names
-            if IngredientRepository._normalize_name(name)
-        ]
-        if not normalized_names:
+        ingredient_ids = IngredientLexicon.get().resolve(names)
+        if not ingredient_ids:
             return []
-        ingredients = Ingredient.query.all()
-        matched = []
-        for ing in ingredients:
-            ing_name = IngredientRepository._normalize_name(ing.name)
-            if any(query in ing_name or ing_name in query for query in normalized_names):
-                matched.append(ing)
-        return matched
+        return IngredientRepository.get_by_ids(ingredient_ids)
     
     @staticmethod
     def create(name, image_url=None):
         ingredient = Ingredient(name=name, image_url=image_url)
         db.session.add(ingredient)
         db.session.commit()
+        IngredientLexicon.invalidate()
+        CatalogVersion.bump()
         return ingredient
     
     @staticmethod
@@ -1,6 +1,7 @@
 from extensions import db
 from models import Mark
 from sqlalchemy import and_
+from repository.recipe_stats_repository import RecipeStatsRepository
 
 class MarkRepository:
     @staticmethod
@@ -13,10 +14,15 @@ class MarkRepository:
     def upsert(consumer_id, recipe_id, value):
         mark = MarkRepository.get_by_consumer_and_recipe(consumer_id, recipe_id)
         if mark:
+            # Сначала новая оценка: если строки recipe_stats нет, increment пересчитает её из mark.
+            # Вклад оценки в счёт считается от created_at, поэтому и разницу добавляем на эту дату
+            delta = value - mark.value
             mark.value = value
+            RecipeStatsRepository.increment(recipe_id, rating_sum=delta, happened_at=mark.created_at)
         else:
             mark = Mark(consumer_id=consumer_id, recipe_id=recipe_id, value=value)
             db.session.add(mark)
+            RecipeStatsRepository.increment(recipe_id, rating_sum=value, rating_count=1)
         db.session.commit()
         return mark
     
@@ -34,5 +40,8 @@ class MarkRepository:
         if not mark:
             return False
         db.session.delete(mark)
+        RecipeStatsRepository.increment(
+            recipe_id, rating_sum=-mark.value, rating_count=-1, happened_at=mark.created_at
+        )
         db.session.commit()
         return True
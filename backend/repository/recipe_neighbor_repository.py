@@ -0,0 +1,40 @@
+from extensions import db
+from models import RecipeNeighbor
+
+class RecipeNeighborRepository:
+    @staticmethod
+    def get_for(recipe_ids):
+        """{recipe_id: [(neighbor_id, score), ...]} по убыванию похожести"""
+        result = {recipe_id: [] for recipe_id in recipe_ids}
+        if not recipe_ids:
+            return result
+        rows = db.session.query(
+            RecipeNeighbor.recipe_id,
+            RecipeNeighbor.neighbor_id,
+            RecipeNeighbor.score
+        ).filter(RecipeNeighbor.recipe_id.in_(recipe_ids)).order_by(
+            RecipeNeighbor.recipe_id, RecipeNeighbor.score.desc(), RecipeNeighbor.neighbor_id
+        ).all()
+        for recipe_id, neighbor_id, score in rows:
+            result[recipe_id].append((neighbor_id, score))
+        return result
+    
+    @staticmethod
+    def replace(neighbors, replace_all=False):
+        """Заменяет списки соседей для рецептов из {recipe_id: [(neighbor_id, score), ...]};
+        с replace_all удаляет и все остальные списки. Одна транзакция."""
+        if replace_all:
+            RecipeNeighbor.query.delete(synchronize_session=False)
+        elif neighbors:
+            RecipeNeighbor.query.filter(
+                RecipeNeighbor.recipe_id.in_(list(neighbors))
+            ).delete(synchronize_session=False)
+        rows = [
+            {'recipe_id': recipe_id, 'neighbor_id': neighbor_id, 'score': score}
+            for recipe_id, items in neighbors.items()
+            for neighbor_id, score in items
+        ]
+        if rows:
+            db.session.execute(RecipeNeighbor.__table__.insert(), rows)
+        db.session.commit()
+        return len(rows)
@@ -1,20 +1,124 @@
+import base64
+import json
+import math
 from extensions import db
-from models import Recipe, Difficulty, Mark
-from models.associations import recipe_ingredient, consumer_recipe_fav, consumer_recipe_history
-from sqlalchemy import func, desc, asc, and_, or_
-from exception import NotFoundError
+from models import Recipe, Difficulty, RecipeStats, Learning, Mark
+from models.associations import recipe_ingredient, consumer_recipe_history, consumer_recipe_fav
+from sqlalchemy import func, desc, asc, and_, or_, case, cast, select, tuple_, literal, Float, any_, bindparam
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import joinedload, selectinload
+from exception import NotFoundError, ValidationError
+from cache import RecipeIngredientIndex, CatalogVersion
+from repository.recipe_stats_repository import RecipeStatsRepository, VIEW_WEIGHT
+from repository.recipe_text_search import RecipeTextSearch
+from repository.rows import RecipeRow
+
+# Кандидатов для search_keys вне PostgreSQL передаём порциями: у SQLite лимит параметров запроса
+SEARCH_KEYS_CHUNK = 500
 
 class RecipeRepository:
     @staticmethod
     def get_by_id(recipe_id):
         return Recipe.query.get(recipe_id)
     
+    @staticmethod
+    def get_details(recipe_id, stats=True, categories=True, ingredients=True, steps=True):
+        """Рецепт для детальной страницы за 3-4 запроса: рецепт вместе с recipe_stats и learning,
+        затем selectin-запросы категорий, ингредиентов и шагов. Ненужные части не загружаются"""
+        options = []
+        if stats:
+            options.append(joinedload(Recipe.stats))
+        if steps:
+            options.append(joinedload(Recipe.learning).selectinload(Learning.steps))
+        if categories:
+            options.append(selectinload(Recipe.categories))
+        if ingredients:
+            options.append(selectinload(Recipe.ingredients))
+        return Recipe.query.options(*options).filter(Recipe.id == recipe_id).first()
+    
     @staticmethod
     def get_all():
         return Recipe.query.all()
     
     @staticmethod
-    def search(
+    def get_all_rows():
+        """Все рецепты строками RecipeRow, без загрузки ORM-объектов"""
+        return [RecipeRow.from_row(row) for row in db.session.query(*RecipeRow.COLUMNS).order_by(Recipe.id)]
+    
+    @staticmethod
+    def get_card_rows(recipe_ids):
+        if not recipe_ids:
+            return []
+        q = db.session.query(*RecipeRow.COLUMNS).filter(Recipe.id.in_(recipe_ids))
+        return [RecipeRow.from_row(row) for row in q]
+    
+    @staticmethod
+    def get_version(recipe_id):
+        """Версия рецепта и счётчики, от которых зависят его детали; NotFoundError, если рецепта нет"""
+        row = db.session.query(
+            Recipe.version,
+            RecipeStats.rating_sum,
+            RecipeStats.rating_count,
+            RecipeStats.comment_count,
+            RecipeStats.favorite_count
+        ).outerjoin(RecipeStats, RecipeStats.recipe_id == Recipe.id).filter(Recipe.id == recipe_id).first()
+        if row is None:
+            raise NotFoundError("Recipe not found")
+        return tuple(row)
+    
+    @staticmethod
+    def get_by_ids(recipe_ids):
+        return Recipe.query.filter(Recipe.id.in_(recipe_ids)).all()
+    
+    @staticmethod
+    def _match_subquery(ingredient_ids, min_match=0.0):
+        """Агрегат по recipe_ingredient: рецепты, содержащие все выбранные ингредиенты"""
+        selected = list(set(ingredient_ids))
+        total = func.count(recipe_ingredient.c.ingredient_id)
+        matched = func.sum(case((recipe_ingredient.c.ingredient_id.in_(selected), 1), else_=0))
+        match_percent = cast(matched, Float) / cast(total, Float)
+        
+        q = select(
+            recipe_ingredient.c.recipe_id,
+            total.label('total'),
+            matched.label('matched'),
+            match_percent.label('match_percent')
+        ).group_by(recipe_ingredient.c.recipe_id).having(matched == len(selected))
+        
+        if min_match:
+            q = q.having(match_percent >= min_match)
+        
+        return q.subquery('recipe_match')
+    
+    @staticmethod
+    def match_ratios(ingredient_ids, min_match=0.0):
+        """Возвращает [(recipe_id, match_percent)] подходящих рецептов, по убыванию совпадения"""
+        if not ingredient_ids:
+            return []
+        match = RecipeRepository._match_subquery(ingredient_ids, min_match)
+        rows = db.session.execute(
+            select(match.c.recipe_id, match.c.match_percent).order_by(
+                desc(match.c.match_percent), desc(match.c.recipe_id)
+            )
+        ).all()
+        return [(row.recipe_id, row.match_percent) for row in rows]
+    
+    @staticmethod
+    def get_ingredient_ids(recipe_ids):
+        """Возвращает {recipe_id: [ingredient_id, ...]} одним запросом"""
+        result = {recipe_id: [] for recipe_id in recipe_ids}
+        if not recipe_ids:
+            return result
+        rows = db.session.query(
+            recipe_ingredient.c.recipe_id,
+            recipe_ingredient.c.ingredient_id
+        ).filter(recipe_ingredient.c.recipe_id.in_(recipe_ids)).all()
+        for recipe_id, ingredient_id in rows:
+            result[recipe_id].append(ingredient_id)
+        return result
+    
+    @staticmethod
+    def _search_query(
         query=None,
         ingredient_ids=None,
         forbidden_ingredient_ids=None,
@@ -22,10 +126,33 @@ class RecipeRepository:
         difficulty=None,
         category_id=None,
         min_match=0.0,
-        sort='match'
+        recipe_ids=None,
+        exclude_ids=None,
+        exclude_viewed_by=None,
+        exclude_interacted_by=None
     ):
+        """Базовый запрос поиска с фильтрами; возвращает (query, подзапрос совпадения, релевантность)"""
         q = Recipe.query
         
+        # Ограничиваем кандидатами, отобранными заранее (например, индексом ингредиентов)
+        if recipe_ids is not None:
+            q = q.filter(Recipe.id.in_(recipe_ids))
+        if exclude_ids:
+            q = q.filter(Recipe.id.notin_(exclude_ids))
+        
+        # Рекомендации: без просмотренного, оценённого и избранного — подзапросом, не списком id
+        if exclude_viewed_by is not None:
+            q = q.filter(~Recipe.id.in_(
+                select(consumer_recipe_history.c.recipe_id).where(consumer_recipe_history.c.consumer_id == exclude_viewed_by)
+            ))
+        if exclude_interacted_by is not None:
+            q = q.filter(
+                ~Recipe.id.in_(select(Mark.recipe_id).where(Mark.consumer_id == exclude_interacted_by)),
+                ~Recipe.id.in_(
+                    select(consumer_recipe_fav.c.recipe_id).where(consumer_recipe_fav.c.consumer_id == exclude_interacted_by)
+                )
+            )
+        
         # Исключаем рецепты с запрещёнными ингредиентами
         if forbidden_ingredient_ids:
             subquery = db.session.query(recipe_ingredient.c.recipe_id).filter(
@@ -33,9 +160,10 @@ class RecipeRepository:
             ).subquery()
             q = q.filter(~Recipe.id.in_(db.session.query(subquery.c.recipe_id)))
         
-        # Поиск по названию
+        # Полнотекстовый поиск по названию и описанию
+        rank = None
         if query:
-            q = q.filter(Recipe.title.ilike(f'%{query}%'))
+            q, rank = RecipeTextSearch.apply(q, query)
         
         # Фильтр по времени
         if max_time:
@@ -53,17 +181,165 @@ class RecipeRepository:
         if category_id:
             q = q.join(Recipe.categories).filter_by(id=category_id)
         
-        # Сортировка
+        # Подбор по ингредиентам: подмножество и min_match считаются в БД
+        match = None
+        if ingredient_ids:
+            match = RecipeRepository._match_subquery(ingredient_ids, min_match)
+            q = q.join(match, match.c.recipe_id == Recipe.id)
+        
+        return q, match, rank
+    
+    @staticmethod
+    def _sort_key(q, sort, match, rank=None):
+        """Присоединяет ключ сортировки; возвращает (query, ключ или None, по убыванию)"""
         if sort == 'rating':
-            q = q.outerjoin(Mark).group_by(Recipe.id).order_by(desc(func.avg(Mark.value)))
-        elif sort == 'time':
-            q = q.order_by(asc(Recipe.cooking_time))
-        elif sort == 'popular':
-            q = q.outerjoin(consumer_recipe_fav).group_by(Recipe.id).order_by(desc(func.count(consumer_recipe_fav.c.consumer_id)))
-        else:
-            q = q.order_by(desc(Recipe.id))
+            q = q.outerjoin(RecipeStats, RecipeStats.recipe_id == Recipe.id)
+            return q, func.coalesce(RecipeStats.avg_rating, 0.0), True
+        if sort == 'time':
+            return q, Recipe.cooking_time, False
+        if sort == 'popular':
+            q = q.outerjoin(RecipeStats, RecipeStats.recipe_id == Recipe.id)
+            return q, func.coalesce(RecipeStats.popularity_score, 0.0), True
+        if sort == 'trending':
+            q = q.outerjoin(RecipeStats, RecipeStats.recipe_id == Recipe.id)
+            return q, func.coalesce(RecipeStats.trending_score, 0.0), True
+        if match is not None:
+            return q, match.c.match_percent, True
+        if rank is not None:
+            return q, rank, True
+        return q, None, True
+    
+    @staticmethod
+    def _order(q, key, descending):
+        if key is None:
+            return q.order_by(desc(Recipe.id))
+        if descending:
+            return q.order_by(desc(key), desc(Recipe.id))
+        return q.order_by(asc(key), asc(Recipe.id))
+    
+    @staticmethod
+    def encode_cursor(sort, key, recipe_id):
+        payload = json.dumps({'s': sort, 'k': key, 'id': recipe_id}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+    
+    @staticmethod
+    def _is_number(value):
+        return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+    
+    @staticmethod
+    def decode_cursor(cursor, sort):
+        """Возвращает (ключ, recipe_id) из курсора; ValidationError, если курсор чужой или битый"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if payload['s'] != sort:
+                raise ValueError(payload['s'])
+            key, recipe_id = payload['k'], payload['id']
+            # В запрос уходят только числа: ключ без сортировки (None) бывает лишь у sort=match
+            if not isinstance(recipe_id, int) or isinstance(recipe_id, bool):
+                raise ValueError(recipe_id)
+            if not (RecipeRepository._is_number(key) or (key is None and sort == 'match')):
+                raise ValueError(key)
+            return key, recipe_id
+        except (ValueError, KeyError, TypeError, AttributeError):
+            raise ValidationError("Invalid cursor")
+    
+    @staticmethod
+    def search(
+        query=None,
+        ingredient_ids=None,
+        forbidden_ingredient_ids=None,
+        max_time=None,
+        difficulty=None,
+        category_id=None,
+        min_match=0.0,
+        sort='match',
+        recipe_ids=None,
+        exclude_ids=None,
+        exclude_viewed_by=None,
+        exclude_interacted_by=None,
+        limit=None
+    ):
+        q, match, rank = RecipeRepository._search_query(
+            query=query,
+            ingredient_ids=ingredient_ids,
+            forbidden_ingredient_ids=forbidden_ingredient_ids,
+            max_time=max_time,
+            difficulty=difficulty,
+            category_id=category_id,
+            min_match=min_match,
+            recipe_ids=recipe_ids,
+            exclude_ids=exclude_ids,
+            exclude_viewed_by=exclude_viewed_by,
+            exclude_interacted_by=exclude_interacted_by
+        )
+        q, key, descending = RecipeRepository._sort_key(q, sort, match, rank)
+        q = RecipeRepository._order(q, key, descending).with_entities(*RecipeRow.COLUMNS)
+        if limit is not None:
+            q = q.limit(limit)
+        return [RecipeRow.from_row(row) for row in q]
+    
+    @staticmethod
+    def search_keys(recipe_ids=None, **filters):
+        """Лёгкие строки (id и поля сортировки) без загрузки ORM-объектов.
+        recipe_ids — кандидаты (например, из индекса ингредиентов); их могут быть десятки тысяч,
+        поэтому на PostgreSQL они уходят одним параметром-массивом, на остальных СУБД — порциями"""
+        q, _, _ = RecipeRepository._search_query(**filters)
+        q = q.outerjoin(RecipeStats, RecipeStats.recipe_id == Recipe.id).with_entities(
+            Recipe.id,
+            Recipe.cooking_time,
+            func.coalesce(RecipeStats.avg_rating, 0.0).label('avg_rating'),
+            func.coalesce(RecipeStats.comment_count, 0).label('comments_count'),
+            func.coalesce(RecipeStats.favorite_count, 0).label('favorites_count'),
+            func.coalesce(RecipeStats.popularity_score, 0.0).label('popularity_score'),
+            func.coalesce(RecipeStats.trending_score, 0.0).label('trending_score')
+        )
+        if recipe_ids is None:
+            return q.all()
         
-        return q.all()
+        recipe_ids = list(recipe_ids)
+        if db.engine.dialect.name == 'postgresql':
+            ids = bindparam('recipe_ids', value=recipe_ids, type_=postgresql.ARRAY(db.Integer))
+            return q.filter(Recipe.id == any_(ids)).all()
+        rows = []
+        for start in range(0, len(recipe_ids), SEARCH_KEYS_CHUNK):
+            rows.extend(q.filter(Recipe.id.in_(recipe_ids[start:start + SEARCH_KEYS_CHUNK])).all())
+        return rows
+    
+    @staticmethod
+    def search_page(limit, cursor=None, sort='match', **filters):
+        """Keyset-пагинация поиска.
+        
+        Выбирает limit + 1 строк после курсора; возвращает
+        ([(RecipeRow, match_percent), ...], next_cursor или None).
+        """
+        q, match, rank = RecipeRepository._search_query(**filters)
+        q, key, descending = RecipeRepository._sort_key(q, sort, match, rank)
+        
+        if cursor:
+            last_key, last_id = RecipeRepository.decode_cursor(cursor, sort)
+            # Ключ из курсора — тем же типом, что и выражение сортировки (double для ранга)
+            if key is not None:
+                last_key = literal(last_key, type_=key.type)
+            if key is None:
+                q = q.filter(Recipe.id < last_id)
+            elif descending:
+                q = q.filter(tuple_(key, Recipe.id) < tuple_(last_key, last_id))
+            else:
+                q = q.filter(tuple_(key, Recipe.id) > tuple_(last_key, last_id))
+        
+        q = q.with_entities(
+            *RecipeRow.COLUMNS,
+            match.c.match_percent if match is not None else literal(None),
+            key if key is not None else literal(None)
+        )
+        rows = RecipeRepository._order(q, key, descending).limit(limit + 1).all()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = RecipeRepository.encode_cursor(sort, rows[-1][-1], rows[-1][0])
+        return [(RecipeRow.from_row(row), row[-2]) for row in rows], next_cursor
     
     @staticmethod
     def create(title, description, cooking_time, difficulty, image_url=None, category_ids=None, ingredient_ids=None):
@@ -86,7 +362,11 @@ class RecipeRepository:
             recipe.ingredients = ingredients
         
         db.session.add(recipe)
+        db.session.flush()
+        RecipeStatsRepository.create_empty(recipe.id)
         db.session.commit()
+        RecipeIngredientIndex.invalidate()
+        CatalogVersion.bump()
         return recipe
     
     @staticmethod
@@ -101,8 +381,11 @@ class RecipeRepository:
         for key, value in kwargs.items():
             if hasattr(recipe, key) and value is not None:
                 setattr(recipe, key, value)
+        recipe.version = Recipe.version + 1
         
         db.session.commit()
+        RecipeIngredientIndex.invalidate()
+        CatalogVersion.bump()
         return recipe
     
     @staticmethod
@@ -112,6 +395,8 @@ class RecipeRepository:
             raise NotFoundError("Recipe not found")
         db.session.delete(recipe)
         db.session.commit()
+        RecipeIngredientIndex.invalidate()
+        CatalogVersion.bump()
     
     @staticmethod
     def get_favorites(consumer_id):
@@ -119,7 +404,11 @@ class RecipeRepository:
         consumer = Consumer.query.get(consumer_id)
         if not consumer:
             raise NotFoundError("Consumer not found")
-        return consumer.favorite_recipes
+        from models import consumer_recipe_fav
+        q = db.session.query(*RecipeRow.COLUMNS).join(
+            consumer_recipe_fav, consumer_recipe_fav.c.recipe_id == Recipe.id
+        ).filter(consumer_recipe_fav.c.consumer_id == consumer_id)
+        return [RecipeRow.from_row(row) for row in q]
     
     @staticmethod
     def add_to_favorites(consumer_id, recipe_id):
@@ -130,6 +419,7 @@ class RecipeRepository:
             raise NotFoundError("Consumer or recipe not found")
         if recipe not in consumer.favorite_recipes:
             consumer.favorite_recipes.append(recipe)
+            RecipeStatsRepository.increment(recipe_id, favorite_count=1)
             db.session.commit()
     
     @staticmethod
@@ -140,7 +430,13 @@ class RecipeRepository:
         if not consumer or not recipe:
             raise NotFoundError("Consumer or recipe not found")
         if recipe in consumer.favorite_recipes:
+            # Вычитаем вклад на момент добавления — ровно то, что добавил add_to_favorites
+            added_at = db.session.query(consumer_recipe_fav.c.added_at).filter(
+                consumer_recipe_fav.c.consumer_id == consumer_id,
+                consumer_recipe_fav.c.recipe_id == recipe_id
+            ).scalar()
             consumer.favorite_recipes.remove(recipe)
+            RecipeStatsRepository.increment(recipe_id, favorite_count=-1, happened_at=added_at)
             db.session.commit()
     
     @staticmethod
@@ -170,8 +466,10 @@ class RecipeRepository:
                     )
                 ).values(viewed_at=datetime.utcnow())
             )
+            # Повторный просмотр не меняет view_count, но добавляет вес в счёт популярности
+            RecipeStatsRepository.increment(recipe_id, score=VIEW_WEIGHT)
         else:
-            # Добавляем новую запись
+            # Добавляем новую запись; view_count считает уникальных зрителей
             db.session.execute(
                 consumer_recipe_history.insert().values(
                     consumer_id=consumer_id,
@@ -179,8 +477,86 @@ class RecipeRepository:
                     viewed_at=datetime.utcnow()
                 )
             )
+            RecipeStatsRepository.increment(recipe_id, view_count=1)
         db.session.commit()
     
+    @staticmethod
+    def record_views(views):
+        """Пакет просмотров [(consumer_id, recipe_id, viewed_at)] одним INSERT ... ON CONFLICT DO UPDATE.
+        Просмотры удалённых рецептов и пользователей отбрасываются. Возвращает id пользователей из пакета"""
+        from models import Consumer
+        from sqlalchemy.dialects import sqlite
+        from collections import Counter
+        # Повторы пары в пакете: в таблицу — последний просмотр, в счёт популярности — каждый
+        latest = {}
+        repeats = Counter()
+        for consumer_id, recipe_id, viewed_at in views:
+            key = (consumer_id, recipe_id)
+            if key in latest:
+                repeats[key] += 1
+                latest[key] = max(latest[key], viewed_at)
+            else:
+                latest[key] = viewed_at
+        if not latest:
+            return []
+        
+        consumer_ids = {consumer_id for consumer_id, _ in latest}
+        recipe_ids = {recipe_id for _, recipe_id in latest}
+        known_consumers = {row.id for row in db.session.query(Consumer.id).filter(Consumer.id.in_(consumer_ids))}
+        known_recipes = {row.id for row in db.session.query(Recipe.id).filter(Recipe.id.in_(recipe_ids))}
+        latest = {
+            key: viewed_at for key, viewed_at in latest.items()
+            if key[0] in known_consumers and key[1] in known_recipes
+        }
+        if not latest:
+            return []
+        
+        # Уже просмотренные пары: новый зритель увеличивает view_count, повторный — только счёт
+        existing = {
+            (row.consumer_id, row.recipe_id) for row in db.session.query(
+                consumer_recipe_history.c.consumer_id, consumer_recipe_history.c.recipe_id
+            ).filter(
+                consumer_recipe_history.c.consumer_id.in_(known_consumers),
+                consumer_recipe_history.c.recipe_id.in_(known_recipes)
+            )
+        }
+        
+        dialect_insert = postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+        insert = dialect_insert(consumer_recipe_history).values([
+            {'consumer_id': consumer_id, 'recipe_id': recipe_id, 'viewed_at': viewed_at}
+            for (consumer_id, recipe_id), viewed_at in latest.items()
+        ])
+        # Отложенные (из спула) просмотры не откатывают viewed_at назад
+        db.session.execute(insert.on_conflict_do_update(
+            index_elements=[consumer_recipe_history.c.consumer_id, consumer_recipe_history.c.recipe_id],
+            set_={'viewed_at': case(
+                (insert.excluded.viewed_at > consumer_recipe_history.c.viewed_at, insert.excluded.viewed_at),
+                else_=consumer_recipe_history.c.viewed_at
+            )}
+        ))
+        
+        new_viewers = Counter()
+        all_views = Counter()
+        for key in latest:
+            if key not in existing:
+                new_viewers[key[1]] += 1
+            all_views[key[1]] += 1 + repeats[key]
+        RecipeStatsRepository.increment_many({
+            recipe_id: {'view_count': new_viewers[recipe_id], 'score': VIEW_WEIGHT * views}
+            for recipe_id, views in all_views.items()
+        })
+        db.session.commit()
+        return sorted({consumer_id for consumer_id, _ in latest})
+    
+    @staticmethod
+    def get_recent_history_ids(consumer_id, limit):
+        """id последних limit просмотренных рецептов, от свежих к старым"""
+        return [
+            row.recipe_id for row in db.session.query(consumer_recipe_history.c.recipe_id).filter(
+                consumer_recipe_history.c.consumer_id == consumer_id
+            ).order_by(desc(consumer_recipe_history.c.viewed_at), desc(consumer_recipe_history.c.recipe_id)).limit(limit)
+        ]
+    
     @staticmethod
     def get_history(consumer_id):
         from models import Consumer, consumer_recipe_history
@@ -198,7 +574,7 @@ class RecipeRepository:
         ).all()
         
         recipe_ids = [r.recipe_id for r in history_records]
-        recipes = Recipe.query.filter(Recipe.id.in_(recipe_ids)).all()
+        recipes = RecipeRepository.get_card_rows(recipe_ids)
         
         # Сохраняем порядок
         recipe_dict = {r.id: r for r in recipes}
@@ -227,9 +603,8 @@ class RecipeRepository:
         matched = len(recipe_ingredient_ids & user_ingredient_ids)
         match_percent = (matched / total) if total > 0 else 0.0
         
-        missing_ids = recipe_ingredient_ids - user_ingredient_ids
-        from models import Ingredient
-        missing = Ingredient.query.filter(Ingredient.id.in_(missing_ids)).all()
+        # Ингредиенты рецепта уже загружены — недостающие берём из них без запроса
+        missing = [ing for ing in recipe.ingredients if ing.id not in user_ingredient_ids]
         
         return {
             'match_percent': match_percent,
@@ -0,0 +1,282 @@
+import calendar
+import time
+from flask import current_app
+from extensions import db
+from models import Recipe, RecipeStats, ScoreEpoch, Mark, Comment
+from models.associations import consumer_recipe_fav, consumer_recipe_history
+from sqlalchemy import func, case, cast, literal, bindparam, Float
+from sqlalchemy.dialects import postgresql, sqlite
+
+# Вес событий в затухающем счёте популярности; оценка весит пропорционально значению
+VIEW_WEIGHT = 1.0
+FAVORITE_WEIGHT = 4.0
+COMMENT_WEIGHT = 3.0
+MARK_WEIGHT = 2.0
+MAX_MARK = 5
+
+# Затухающие счета: колонка recipe_stats -> ключ периода полураспада (в днях) в конфигурации
+DECAYED_SCORES = {
+    'popularity_score': 'POPULARITY_HALF_LIFE_DAYS',
+    'trending_score': 'TRENDING_HALF_LIFE_DAYS'
+}
+SECONDS_PER_DAY = 24 * 60 * 60
+# Счётчики, которые increment_many сдвигает пакетом
+BATCH_COUNTERS = ('comment_count', 'favorite_count', 'view_count')
+# Значение по умолчанию для happened_at в increment(): событие происходит сейчас
+_NOW = object()
+
+class RecipeStatsRepository:
+    """Счётчики recipe_stats.
+    
+    Методы изменения не делают commit: они вызываются внутри транзакции,
+    которая пишет исходные данные (оценку, комментарий, избранное, просмотр).
+    
+    Затухающие счета (forward decay): событие веса w в момент t добавляет
+    w * 2^((t - epoch) / half_life). Общий множитель 2^((epoch - now) / half_life)
+    одинаков для всех рецептов и на порядок не влияет, поэтому счёт обновляется
+    одним UPDATE без пересчёта старых событий. renormalize() переносит эпоху
+    на текущий момент, чтобы множители не росли неограниченно.
+    """
+    
+    @staticmethod
+    def get_by_recipe_ids(recipe_ids):
+        if not recipe_ids:
+            return {}
+        rows = RecipeStats.query.filter(RecipeStats.recipe_id.in_(recipe_ids)).all()
+        return {stats.recipe_id: stats for stats in rows}
+    
+    @staticmethod
+    def create_empty(recipe_id):
+        stats = RecipeStats(
+            recipe_id=recipe_id,
+            rating_sum=0,
+            rating_count=0,
+            avg_rating=0.0,
+            comment_count=0,
+            favorite_count=0,
+            view_count=0,
+            popularity_score=0.0,
+            trending_score=0.0
+        )
+        db.session.add(stats)
+        return stats
+    
+    @staticmethod
+    def _half_life(column):
+        return current_app.config[DECAYED_SCORES[column]] * SECONDS_PER_DAY
+    
+    @staticmethod
+    def ensure_epochs():
+        """Создаёт недостающие строки score_epoch при запуске (рядом с ensure_schema).
+        ON CONFLICT DO NOTHING: одновременный запуск нескольких процессов не падает"""
+        dialect_insert = postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+        now = time.time()
+        db.session.execute(dialect_insert(ScoreEpoch.__table__).values([
+            {'name': name, 'epoch': now} for name in DECAYED_SCORES
+        ]).on_conflict_do_nothing(index_elements=[ScoreEpoch.__table__.c.name]))
+        db.session.commit()
+    
+    @staticmethod
+    def _epochs(for_update=False):
+        """{колонка счёта: эпоха}; строка эпохи блокируется, чтобы не разойтись с renormalize()"""
+        q = ScoreEpoch.query.filter(ScoreEpoch.name.in_(list(DECAYED_SCORES)))
+        q = q.with_for_update() if for_update else q.with_for_update(read=True)
+        epochs = {row.name: row.epoch for row in q}
+        missing = [name for name in DECAYED_SCORES if name not in epochs]
+        if missing:
+            raise RuntimeError(f"score_epoch rows missing: {', '.join(missing)}; call RecipeStatsRepository.ensure_epochs()")
+        return epochs
+    
+    @staticmethod
+    def _decay_factors(timestamp, epochs):
+        """{колонка счёта: множитель события в момент timestamp (unix-секунды)}"""
+        return {
+            column: 2.0 ** ((timestamp - epochs[column]) / RecipeStatsRepository._half_life(column))
+            for column in DECAYED_SCORES
+        }
+    
+    @staticmethod
+    def _event_factors(happened_at, epochs):
+        """Множители события с датой happened_at (datetime, UTC); событие без даты — в момент эпохи"""
+        if happened_at is None:
+            return dict.fromkeys(DECAYED_SCORES, 1.0)
+        return RecipeStatsRepository._decay_factors(calendar.timegm(happened_at.utctimetuple()), epochs)
+    
+    @staticmethod
+    def event_weight(rating_sum=0, comment_count=0, favorite_count=0, view_count=0):
+        """Вес события для счёта популярности по изменению счётчиков"""
+        return (
+            VIEW_WEIGHT * view_count
+            + FAVORITE_WEIGHT * favorite_count
+            + COMMENT_WEIGHT * comment_count
+            + MARK_WEIGHT * rating_sum / MAX_MARK
+        )
+    
+    @staticmethod
+    def increment(recipe_id, rating_sum=0, rating_count=0, comment_count=0, favorite_count=0, view_count=0,
+                  score=None, happened_at=_NOW):
+        """Атомарно сдвигает счётчики рецепта на заданные величины.
+        score — вес события для затухающих счетов; по умолчанию выводится из изменения счётчиков.
+        happened_at — время события, вклад которого меняется (при отмене — время исходного события,
+        чтобы вычесть ровно то, что было добавлено); по умолчанию текущий момент"""
+        if score is None:
+            score = RecipeStatsRepository.event_weight(rating_sum, comment_count, favorite_count, view_count)
+        new_sum = RecipeStats.rating_sum + rating_sum
+        new_count = RecipeStats.rating_count + rating_count
+        values = {
+            'rating_sum': new_sum,
+            'rating_count': new_count,
+            'avg_rating': case((new_count > 0, cast(new_sum, Float) / new_count), else_=0.0),
+            'comment_count': RecipeStats.comment_count + comment_count,
+            'favorite_count': RecipeStats.favorite_count + favorite_count,
+            'view_count': RecipeStats.view_count + view_count
+        }
+        if score:
+            epochs = RecipeStatsRepository._epochs()
+            if happened_at is _NOW:
+                factors = RecipeStatsRepository._decay_factors(time.time(), epochs)
+            else:
+                factors = RecipeStatsRepository._event_factors(happened_at, epochs)
+            for column, factor in factors.items():
+                values[column] = RecipeStats.__table__.c[column] + score * factor
+        result = db.session.execute(
+            RecipeStats.__table__.update().where(RecipeStats.recipe_id == recipe_id).values(
+                {RecipeStats.__table__.c[key]: value for key, value in values.items()}
+            )
+        )
+        if result.rowcount:
+            return
+        
+        # Строки ещё нет (рецепт создан до появления recipe_stats) — пересчитываем её целиком
+        RecipeStatsRepository._rebuild_one(recipe_id)
+    
+    @staticmethod
+    def increment_many(deltas):
+        """Пакетный increment для событий «сейчас»: {recipe_id: {счётчик из BATCH_COUNTERS: сдвиг, 'score': вес}}.
+        Эпохи читаются один раз, все строки сдвигаются одним UPDATE (executemany)"""
+        if not deltas:
+            return
+        epochs = RecipeStatsRepository._epochs()
+        factors = RecipeStatsRepository._decay_factors(time.time(), epochs)
+        existing = {
+            recipe_id for (recipe_id,) in db.session.query(RecipeStats.recipe_id).filter(
+                RecipeStats.recipe_id.in_(list(deltas))
+            )
+        }
+        params = []
+        # По возрастанию id, как и поштучные increment: блокировки строк берутся в одном порядке
+        for recipe_id in sorted(existing):
+            delta = deltas[recipe_id]
+            counts = {counter: delta.get(counter, 0) for counter in BATCH_COUNTERS}
+            score = delta.get('score')
+            if score is None:
+                score = RecipeStatsRepository.event_weight(**counts)
+            row = {'stats_recipe_id': recipe_id}
+            row.update({f'delta_{counter}': count for counter, count in counts.items()})
+            row.update({f'delta_{column}': score * factor for column, factor in factors.items()})
+            params.append(row)
+        if params:
+            table = RecipeStats.__table__
+            db.session.execute(
+                table.update().where(table.c.recipe_id == bindparam('stats_recipe_id')).values({
+                    table.c[column]: table.c[column] + bindparam(f'delta_{column}')
+                    for column in BATCH_COUNTERS + tuple(DECAYED_SCORES)
+                }),
+                params
+            )
+        
+        # Строк ещё нет — пересчитываем их целиком, как increment
+        for recipe_id in sorted(set(deltas) - existing):
+            RecipeStatsRepository._rebuild_one(recipe_id, epochs)
+    
+    @staticmethod
+    def _rebuild_one(recipe_id, epochs=None):
+        db.session.flush()
+        stats = RecipeStatsRepository._aggregate([recipe_id], epochs).get(recipe_id)
+        row = RecipeStatsRepository.create_empty(recipe_id)
+        if stats:
+            for key, value in stats.items():
+                setattr(row, key, value)
+        db.session.flush()
+    
+    @staticmethod
+    def _aggregate(recipe_ids=None, epochs=None):
+        """Считает статистику по исходным таблицам: {recipe_id: {поле: значение}}.
+        epochs — уже прочитанные в этой транзакции эпохи"""
+        def grouped(column, *aggregates):
+            q = db.session.query(column, *aggregates)
+            if recipe_ids is not None:
+                q = q.filter(column.in_(recipe_ids))
+            return q.group_by(column).all()
+        
+        result = {}
+        
+        def row(recipe_id):
+            return result.setdefault(recipe_id, {})
+        
+        for recipe_id, total, count in grouped(Mark.recipe_id, func.sum(Mark.value), func.count(Mark.id)):
+            row(recipe_id).update(
+                rating_sum=int(total),
+                rating_count=count,
+                avg_rating=float(total) / count
+            )
+        for recipe_id, count in grouped(Comment.recipe_id, func.count(Comment.id)):
+            row(recipe_id)['comment_count'] = count
+        for recipe_id, count in grouped(consumer_recipe_fav.c.recipe_id, func.count(consumer_recipe_fav.c.consumer_id)):
+            row(recipe_id)['favorite_count'] = count
+        for recipe_id, count in grouped(consumer_recipe_history.c.recipe_id, func.count(consumer_recipe_history.c.consumer_id)):
+            row(recipe_id)['view_count'] = count
+        
+        # Затухающие счета — по времени каждого события; история хранит только последний просмотр,
+        # избранное без даты (добавлено до появления added_at) считаем добавленным в момент эпохи
+        if epochs is None:
+            epochs = RecipeStatsRepository._epochs()
+        for recipe_id in result:
+            for column in DECAYED_SCORES:
+                result[recipe_id][column] = 0.0
+        events = [
+            (Mark.recipe_id, Mark.created_at, MARK_WEIGHT / MAX_MARK * Mark.value),
+            (Comment.recipe_id, Comment.created_at, literal(COMMENT_WEIGHT, Float)),
+            (consumer_recipe_fav.c.recipe_id, consumer_recipe_fav.c.added_at, literal(FAVORITE_WEIGHT, Float)),
+            (consumer_recipe_history.c.recipe_id, consumer_recipe_history.c.viewed_at, literal(VIEW_WEIGHT, Float))
+        ]
+        for recipe_column, time_column, weight in events:
+            q = db.session.query(recipe_column, time_column, weight)
+            if recipe_ids is not None:
+                q = q.filter(recipe_column.in_(recipe_ids))
+            for recipe_id, happened_at, event_weight in q.yield_per(1000):
+                factors = RecipeStatsRepository._event_factors(happened_at, epochs)
+                for column, factor in factors.items():
+                    row(recipe_id)[column] = row(recipe_id).get(column, 0.0) + float(event_weight) * factor
+        return result
+    
+    @staticmethod
+    def reconcile():
+        """Полностью пересобирает recipe_stats по исходным таблицам; возвращает число строк"""
+        aggregates = RecipeStatsRepository._aggregate()
+        recipe_ids = [recipe_id for (recipe_id,) in db.session.query(Recipe.id).all()]
+        
+        RecipeStats.query.delete()
+        for recipe_id in recipe_ids:
+            stats = RecipeStatsRepository.create_empty(recipe_id)
+            for key, value in aggregates.get(recipe_id, {}).items():
+                setattr(stats, key, value)
+        db.session.commit()
+        return len(recipe_ids)
+    
+    @staticmethod
+    def renormalize(now=None):
+        """Переносит эпохи затухающих счетов на текущий момент, масштабируя recipe_stats.
+        Порядок рецептов не меняется; возвращает число обновлённых строк"""
+        now = time.time() if now is None else now
+        epochs = RecipeStatsRepository._epochs(for_update=True)
+        factors = RecipeStatsRepository._decay_factors(now, epochs)
+        table = RecipeStats.__table__
+        result = db.session.execute(
+            table.update().values({table.c[column]: table.c[column] / factor for column, factor in factors.items()})
+        )
+        ScoreEpoch.query.filter(ScoreEpoch.name.in_(list(DECAYED_SCORES))).update(
+            {ScoreEpoch.epoch: now}, synchronize_session=False
+        )
+        db.session.commit()
+        return result.rowcount
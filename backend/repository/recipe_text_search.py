@@ -0,0 +1,79 @@
+import re
+from flask import current_app
+from extensions import db
+from models import Recipe
+from sqlalchemy import func, literal_column, or_, select, table, column, cast
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION
+from translit import is_latin, to_cyrillic
+
+# Окончания, которые отбрасываем перед префиксным поиском в FTS5 (грубый стеммер для SQLite;
+# в PostgreSQL стемминг делает словарь russian)
+_RU_ENDINGS = sorted([
+    'ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ых', 'их',
+    'ой', 'ей', 'ий', 'ый', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ую', 'юю',
+    'ов', 'ев', 'ах', 'ях', 'ам', 'ям', 'ом', 'ем',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й'
+], key=len, reverse=True)
+
+class RecipeTextSearch:
+    """Полнотекстовый поиск по названию и описанию рецептов с ранжированием"""
+    
+    @staticmethod
+    def _tokens(query):
+        return re.findall(r'\w+', query.lower().replace('ё', 'е'))
+    
+    @staticmethod
+    def _stem(token):
+        for ending in _RU_ENDINGS:
+            if token.endswith(ending) and len(token) - len(ending) >= 3:
+                return token[:-len(ending)]
+        return token
+    
+    @staticmethod
+    def fts5_query(query):
+        """Запрос FTS5: все слова обязательны, каждое — префикс от основы"""
+        tokens = RecipeTextSearch._tokens(query)
+        return ' '.join(f'"{RecipeTextSearch._stem(token)}"*' for token in tokens)
+    
+    @staticmethod
+    def variants(query):
+        """Запрос и, если он набран латиницей, его обратная транслитерация"""
+        if is_latin(query):
+            return [query, to_cyrillic(query)]
+        return [query]
+    
+    @staticmethod
+    def _title_ilike(q, queries):
+        return q.filter(or_(*[Recipe.title.ilike(f'%{query}%') for query in queries]))
+    
+    @staticmethod
+    def apply(q, query):
+        """Фильтрует запрос рецептов по тексту; возвращает (query, выражение релевантности или None)"""
+        queries = RecipeTextSearch.variants(query)
+        dialect = db.engine.dialect.name
+        if not current_app.config['RECIPE_FULLTEXT_ENABLED'] or dialect not in ('postgresql', 'sqlite'):
+            return RecipeTextSearch._title_ilike(q, queries), None
+        
+        if dialect == 'postgresql':
+            search_vector = literal_column('recipe.search_vector')
+            ts_query = func.websearch_to_tsquery('russian', queries[0])
+            for variant in queries[1:]:
+                ts_query = ts_query.op('||')(func.websearch_to_tsquery('russian', variant))
+            q = q.filter(search_vector.op('@@')(ts_query))
+            # ts_rank_cd возвращает float4; курсор хранит double, поэтому ключ сразу приводим
+            # к double precision — иначе на границе страницы равные ранги не совпадут
+            return q, cast(func.ts_rank_cd(search_vector, ts_query), DOUBLE_PRECISION)
+        
+        fts_queries = [RecipeTextSearch.fts5_query(variant) for variant in queries]
+        fts_query = ' OR '.join(f'({fts})' for fts in fts_queries if fts)
+        if not fts_query:
+            return RecipeTextSearch._title_ilike(q, queries), None
+        # bm25 тем меньше, чем релевантнее; разворачиваем знак, чтобы сортировать по убыванию
+        fts = table('recipe_fts', column('rowid'))
+        fts_table = literal_column('recipe_fts')
+        matches = select(
+            fts.c.rowid.label('recipe_id'),
+            (-func.bm25(fts_table, 10.0, 1.0)).label('rank')
+        ).where(fts_table.op('MATCH')(fts_query)).subquery('recipe_fts_match')
+        q = q.join(matches, matches.c.recipe_id == Recipe.id)
+        return q, matches.c.rank
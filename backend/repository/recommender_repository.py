@@ -0,0 +1,61 @@
+from datetime import datetime
+from extensions import db
+from models import Mark, ConsumerFactor, RecipeFactor
+from models.associations import consumer_recipe_fav
+from sqlalchemy import func, union_all, select, literal, cast, Float
+
+# Вес взаимодействий: оценка даёт value / 5, добавление в избранное — 1
+FAVORITE_WEIGHT = 1.0
+MARK_SCALE = 5.0
+
+class RecommenderRepository:
+    @staticmethod
+    def interactions():
+        """[(consumer_id, recipe_id, weight)] по оценкам и избранному, вес суммируется"""
+        events = union_all(
+            select(
+                Mark.consumer_id.label('consumer_id'),
+                Mark.recipe_id.label('recipe_id'),
+                (cast(Mark.value, Float) / MARK_SCALE).label('weight')
+            ),
+            select(
+                consumer_recipe_fav.c.consumer_id,
+                consumer_recipe_fav.c.recipe_id,
+                literal(FAVORITE_WEIGHT, Float)
+            )
+        ).subquery()
+        return db.session.query(
+            events.c.consumer_id,
+            events.c.recipe_id,
+            func.sum(events.c.weight)
+        ).group_by(events.c.consumer_id, events.c.recipe_id).all()
+    
+    @staticmethod
+    def interacted_recipe_ids(consumer_id):
+        """Рецепты, которые пользователь уже оценил или добавил в избранное"""
+        marked = select(Mark.recipe_id).where(Mark.consumer_id == consumer_id)
+        favorites = select(consumer_recipe_fav.c.recipe_id).where(consumer_recipe_fav.c.consumer_id == consumer_id)
+        return {recipe_id for (recipe_id,) in db.session.execute(union_all(marked, favorites))}
+    
+    @staticmethod
+    def get_consumer_factor(consumer_id):
+        return db.session.get(ConsumerFactor, consumer_id)
+    
+    @staticmethod
+    def replace_factors(consumer_rows, recipe_rows):
+        """Заменяет все векторы одной транзакцией.
+        consumer_rows: [(consumer_id, vector_bytes, interactions)], recipe_rows: [(recipe_id, vector_bytes)]"""
+        trained_at = datetime.utcnow()
+        ConsumerFactor.query.delete(synchronize_session=False)
+        RecipeFactor.query.delete(synchronize_session=False)
+        if consumer_rows:
+            db.session.execute(ConsumerFactor.__table__.insert(), [
+                {'consumer_id': consumer_id, 'vector': vector, 'interactions': interactions, 'trained_at': trained_at}
+                for consumer_id, vector, interactions in consumer_rows
+            ])
+        if recipe_rows:
+            db.session.execute(RecipeFactor.__table__.insert(), [
+                {'recipe_id': recipe_id, 'vector': vector, 'trained_at': trained_at}
+                for recipe_id, vector in recipe_rows
+            ])
+        db.session.commit()
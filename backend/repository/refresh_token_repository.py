@@ -0,0 +1,59 @@
+from datetime import datetime
+from extensions import db
+from models import RefreshToken
+
+class RefreshTokenRepository:
+    @staticmethod
+    def get_by_hash(token_hash):
+        return RefreshToken.query.filter_by(token_hash=token_hash).first()
+    
+    @staticmethod
+    def get_by_previous_hash(token_hash):
+        return RefreshToken.query.filter_by(previous_hash=token_hash).first()
+    
+    @staticmethod
+    def save(consumer_id, device_id, token_hash, expires_at):
+        """Новый токен устройства; вход с того же устройства заменяет прежний"""
+        token = RefreshToken.query.filter_by(consumer_id=consumer_id, device_id=device_id).first()
+        if token:
+            token.token_hash = token_hash
+            token.previous_hash = None
+            token.created_at = datetime.utcnow()
+            token.expires_at = expires_at
+        else:
+            token = RefreshToken(
+                consumer_id=consumer_id,
+                device_id=device_id,
+                token_hash=token_hash,
+                expires_at=expires_at
+            )
+            db.session.add(token)
+        db.session.commit()
+        return token
+    
+    @staticmethod
+    def rotate(token_id, token_hash, new_hash, expires_at):
+        """Заменяет токен, только если он всё ещё текущий: из двух одновременных
+        обновлений одним токеном проходит одно"""
+        updated = RefreshToken.query.filter_by(id=token_id, token_hash=token_hash).update({
+            RefreshToken.token_hash: new_hash,
+            RefreshToken.previous_hash: token_hash,
+            RefreshToken.expires_at: expires_at
+        }, synchronize_session=False)
+        db.session.commit()
+        return updated == 1
+    
+    @staticmethod
+    def delete(token_id):
+        RefreshToken.query.filter_by(id=token_id).delete(synchronize_session=False)
+        db.session.commit()
+    
+    @staticmethod
+    def delete_by_hash(consumer_id, token_hash):
+        RefreshToken.query.filter_by(consumer_id=consumer_id, token_hash=token_hash).delete(synchronize_session=False)
+        db.session.commit()
+    
+    @staticmethod
+    def delete_by_consumer(consumer_id):
+        RefreshToken.query.filter_by(consumer_id=consumer_id).delete(synchronize_session=False)
+        db.session.commit()
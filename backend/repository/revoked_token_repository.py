@@ -0,0 +1,25 @@
+import time
+from extensions import db
+from models import RevokedToken
+
+class RevokedTokenRepository:
+    @staticmethod
+    def jti_key(jti):
+        return f'jti:{jti}'
+    
+    @staticmethod
+    def consumer_key(consumer_id):
+        return f'consumer:{consumer_id}'
+    
+    @staticmethod
+    def get(key):
+        return db.session.get(RevokedToken, key)
+    
+    @staticmethod
+    def revoke(key, consumer_id, expires_at):
+        """Отзывает ключ; повторный отзыв сдвигает revoked_at. Заодно чистит истёкшие записи"""
+        now = time.time()
+        RevokedToken.query.filter(RevokedToken.expires_at < now).delete(synchronize_session=False)
+        db.session.merge(RevokedToken(key=key, consumer_id=consumer_id, revoked_at=now, expires_at=expires_at))
+        db.session.commit()
+        return now
@@ -0,0 +1,69 @@
+"""Лёгкие строки для списков: только нужные колонки, без ORM-объектов и их identity map.
+
+dataclass со __slots__ orjson сериализует напрямую, стандартный провайдер Flask — через asdict.
+"""
+from dataclasses import dataclass
+from models import Recipe, Comment, Consumer, Ingredient, Difficulty
+
+
+@dataclass(slots=True)
+class RecipeRow:
+    id: int
+    title: str
+    description: str
+    cooking_time: int
+    difficulty: str
+    image_url: str
+
+    # Колонки карточки рецепта в порядке полей
+    COLUMNS = (Recipe.id, Recipe.title, Recipe.description, Recipe.cooking_time, Recipe.difficulty, Recipe.image_url)
+
+    @classmethod
+    def from_row(cls, row):
+        recipe_id, title, description, cooking_time, difficulty, image_url = row[:6]
+        if isinstance(difficulty, Difficulty):
+            difficulty = difficulty.value
+        return cls(recipe_id, title, description, cooking_time, difficulty, image_url)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'cooking_time': self.cooking_time,
+            'difficulty': self.difficulty,
+            'image_url': self.image_url
+        }
+
+
+@dataclass(slots=True)
+class CommentRow:
+    id: int
+    text: str
+    consumer_id: int
+    consumer_username: str
+    recipe_id: int
+    created_at: str
+
+    COLUMNS = (Comment.id, Comment.text, Comment.consumer_id, Consumer.username, Comment.recipe_id, Comment.created_at)
+
+    @classmethod
+    def from_row(cls, row):
+        comment_id, text, consumer_id, username, recipe_id, created_at = row
+        return cls(comment_id, text, consumer_id, username, recipe_id, created_at.isoformat())
+
+
+@dataclass(slots=True)
+class IngredientRow:
+    id: int
+    name: str
+    image_url: str
+
+    COLUMNS = (Ingredient.id, Ingredient.name, Ingredient.image_url)
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+    def to_dict(self):
+        return {'id': self.id, 'name': self.name, 'image_url': self.image_url}
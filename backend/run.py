@@ -2,7 +2,11 @@ from flask import Flask, request
 from config import Config
 from extensions import db, migrate, cors
 from api.routes import register_routes
+from api.json_provider import FastJSONProvider
 from exception.handlers import register_error_handlers
+from cache import RecipeIngredientIndex, IngredientLexicon
+from repository import RecipeStatsRepository
+from models import ensure_schema, ensure_recipe_search_index, ensure_ingredient_search_index
 import logging
 
 # Настройка логирования
@@ -12,6 +16,7 @@ logger = logging.getLogger(__name__)
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.json = FastJSONProvider(app, enabled=app.config['ORJSON_ENABLED'])
     
     db.init_app(app)
     migrate.init_app(app, db)
@@ -25,7 +30,7 @@ def create_app():
             "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
             "allow_headers": ["Content-Type", "Authorization"],
             "supports_credentials": False,
-            "expose_headers": ["Content-Type"]
+            "expose_headers": ["Content-Type", "X-Next-Cursor"]
         }},
         automatic_options=True  # Автоматически обрабатывать OPTIONS
     )
@@ -51,5 +56,12 @@ if __name__ == '__main__':
     app = create_app()
     with app.app_context():
         db.create_all()
+        ensure_schema(db.engine)
+        RecipeStatsRepository.ensure_epochs()
+        ensure_recipe_search_index(db.engine)
+        ensure_ingredient_search_index(db.engine)
+        # Прогреваем индекс ингредиентов и словарь имён до первого запроса
+        RecipeIngredientIndex.get()
+        IngredientLexicon.get()
     app.run(host='0.0.0.0', port=5000, debug=True)
 
@@ -6,10 +6,13 @@ Seed script для загрузки начальных данных
 """
 import sys
 import re
-import unicodedata
 from run import create_app
 from extensions import db
-from models import Consumer, Role, Ingredient, Category, Recipe, Difficulty, Learning, StepLearning
+from models import Consumer, Role, Ingredient, Category, Recipe, Difficulty, Learning, StepLearning, RecipeStats, RecipeNeighbor
+from models import ensure_schema, ensure_recipe_search_index, ensure_ingredient_search_index
+from repository import RecipeStatsRepository
+from service.recipe_similarity import RecipeSimilarity
+from translit import slugify
 from werkzeug.security import generate_password_hash
 
 def normalize_name(name):
@@ -19,29 +22,6 @@ def normalize_name(name):
     normalized = re.sub(r'\s+', ' ', name.strip().lower())
     return normalized
 
-def slugify(name):
-    if not name:
-        return ''
-    translit_map = {
-        'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
-        'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'i', 'к': 'k', 'л': 'l', 'м': 'm',
-        'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
-        'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch',
-        'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya'
-    }
-    normalized = unicodedata.normalize('NFKD', name).lower().replace('ё', 'е')
-    normalized = ''.join(
-        char for char in normalized if unicodedata.category(char) != 'Mn'
-    )
-    slug_chars = []
-    for char in normalized:
-        if char.isalnum():
-            slug_chars.append(translit_map.get(char, char))
-        else:
-            slug_chars.append('-')
-    slug = re.sub(r'-{2,}', '-', ''.join(slug_chars))
-    return slug.strip('-')
-
 def image_path(kind, name):
     return f"/static/img/{kind}/{slugify(name)}.svg"
 
@@ -227,6 +207,8 @@ def seed_recipes(reset=False):
         # Удаляем в правильном порядке (сначала зависимые)
         StepLearning.query.delete()
         Learning.query.delete()
+        RecipeStats.query.delete()
+        RecipeNeighbor.query.delete()
         Recipe.query.delete()
         db.session.commit()
         print("✓ Recipes cleared")
@@ -853,6 +835,7 @@ def seed_recipes(reset=False):
             recipe.image_url = recipe_image_url(title)
             recipe.ingredients = ingredients
             recipe.categories = categories
+            recipe.version = (recipe.version or 1) + 1
 
             if recipe.learning:
                 learning = recipe.learning
@@ -905,6 +888,10 @@ def main():
     app = create_app()
     with app.app_context():
         db.create_all()
+        ensure_schema(db.engine)
+        RecipeStatsRepository.ensure_epochs()
+        ensure_recipe_search_index(db.engine)
+        ensure_ingredient_search_index(db.engine)
         
         if reset:
             print("⚠ Reset mode: clearing existing data...")
@@ -915,6 +902,12 @@ def main():
         seed_categories(reset=reset)
         seed_recipes(reset=reset)
         
+        count = RecipeStatsRepository.reconcile()
+        print(f"✓ Recipe stats rebuilt for {count} recipes")
+        
+        recipes, pairs = RecipeSimilarity.rebuild()
+        print(f"✓ Neighbours rebuilt for {recipes} recipes ({pairs} pairs)")
+        
         print("\n✓ Seeding completed!")
 
 if __name__ == '__main__':
@@ -4,6 +4,7 @@ from .ingredient_service import IngredientService
 from .category_service import CategoryService
 from .comment_service import CommentService
 from .mark_service import MarkService
+from .recipe_card_assembler import RecipeCardAssembler
 
 __all__ = [
     'AuthService',
@@ -11,6 +12,7 @@ __all__ = [
     'IngredientService',
     'CategoryService',
     'CommentService',
-    'MarkService'
+    'MarkService',
+    'RecipeCardAssembler'
 ]
 
@@ -1,16 +1,29 @@
 import jwt
+import hashlib
+import secrets
+import time
+import uuid
 from datetime import datetime, timedelta
 from config import Config
-from repository import ConsumerRepository
-from exception import ValidationError, UnauthorizedError
+from repository import ConsumerRepository, RefreshTokenRepository, RevokedTokenRepository
+from exception import ValidationError, UnauthorizedError, ServiceUnavailableError
 from models import Consumer
+from cache import PrincipalCache, RevocationFilter
+from service.password_hasher import PasswordHasher
 
 class AuthService:
     @staticmethod
-    def register(username, email, phone, password):
+    def validate_device_id(device_id):
+        """Проверяет device_id до любых записей в БД; None — устройство получит новый id"""
+        if device_id is not None and (not isinstance(device_id, str) or not 0 < len(device_id) <= 64):
+            raise ValidationError("device_id must be a string of 1-64 characters")
+    
+    @staticmethod
+    def register(username, email, phone, password, device_id=None):
         # Валидация
         if not username or not email or not password:
             raise ValidationError("Username, email and password are required")
+        AuthService.validate_device_id(device_id)
         
         if ConsumerRepository.get_by_email(email):
             raise ValidationError("Email already exists")
@@ -18,43 +31,164 @@ class AuthService:
         if phone and ConsumerRepository.get_by_phone(phone):
             raise ValidationError("Phone already exists")
         
-        consumer = ConsumerRepository.create(username, email, phone, password)
+        password_hash = PasswordHasher.get().hash(password)
+        consumer = ConsumerRepository.create(username, email, phone, password, password_hash=password_hash)
         return consumer
     
     @staticmethod
-    def login(email_or_phone, password):
+    def login(email_or_phone, password, device_id=None):
         if not email_or_phone or not password:
             raise ValidationError("Email/phone and password are required")
+        AuthService.validate_device_id(device_id)
         
         consumer = ConsumerRepository.get_by_email_or_phone(email_or_phone)
-        if not consumer or not consumer.check_password(password):
+        hasher = PasswordHasher.get()
+        if not consumer or not hasher.verify(consumer.password_hash, password):
             raise UnauthorizedError("Invalid credentials")
         
-        token = AuthService.generate_token(consumer.id)
+        # Параметры хэширования поменялись — перехэшируем, пока знаем пароль. Это попутная работа:
+        # пароль уже проверен, и переполненный пул не должен отказывать во входе
+        if hasher.needs_rehash(consumer.password_hash):
+            try:
+                ConsumerRepository.update_password_hash(consumer.id, hasher.hash(password))
+            except ServiceUnavailableError:
+                pass
+        
+        result = AuthService.issue_tokens(consumer.id, device_id)
+        result['consumer'] = consumer.to_dict()
+        return result
+    
+    @staticmethod
+    def _hash_refresh_token(refresh_token):
+        # Токен случайный и длинный: медленный KDF не нужен, достаточно SHA-256
+        return hashlib.sha256(refresh_token.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def issue_tokens(consumer_id, device_id=None):
+        """Access JWT и refresh-токен устройства; без device_id устройство получает новый id.
+        device_id уже проверен validate_device_id"""
+        if device_id is None:
+            device_id = uuid.uuid4().hex
+        
+        refresh_token = secrets.token_urlsafe(32)
+        RefreshTokenRepository.save(
+            consumer_id,
+            device_id,
+            AuthService._hash_refresh_token(refresh_token),
+            datetime.utcnow() + timedelta(days=Config.REFRESH_TOKEN_EXPIRATION_DAYS)
+        )
+        return {
+            'access_token': AuthService.generate_token(consumer_id),
+            'refresh_token': refresh_token,
+            'device_id': device_id
+        }
+    
+    @staticmethod
+    def refresh(refresh_token):
+        """Новый access JWT по refresh-токену без проверки пароля; refresh-токен заменяется новым"""
+        if not refresh_token or not isinstance(refresh_token, str):
+            raise ValidationError("refresh_token is required")
+        
+        token_hash = AuthService._hash_refresh_token(refresh_token)
+        token = RefreshTokenRepository.get_by_hash(token_hash)
+        if token is None:
+            # Уже заменённый токен предъявили снова: его могли украсть — закрываем сессию устройства
+            reused = RefreshTokenRepository.get_by_previous_hash(token_hash)
+            if reused is not None:
+                RefreshTokenRepository.delete(reused.id)
+            raise UnauthorizedError("Invalid refresh token")
+        
+        if token.expires_at < datetime.utcnow():
+            RefreshTokenRepository.delete(token.id)
+            raise UnauthorizedError("Refresh token expired")
+        
+        new_token = secrets.token_urlsafe(32)
+        expires_at = datetime.utcnow() + timedelta(days=Config.REFRESH_TOKEN_EXPIRATION_DAYS)
+        if not RefreshTokenRepository.rotate(token.id, token_hash, AuthService._hash_refresh_token(new_token), expires_at):
+            raise UnauthorizedError("Invalid refresh token")
+        
         return {
-            'access_token': token,
-            'consumer': consumer.to_dict()
+            'access_token': AuthService.generate_token(token.consumer_id),
+            'refresh_token': new_token,
+            'device_id': token.device_id
         }
     
     @staticmethod
     def generate_token(consumer_id):
         payload = {
             'consumer_id': consumer_id,
+            'jti': uuid.uuid4().hex,
             'exp': datetime.utcnow() + timedelta(hours=Config.JWT_EXPIRATION_HOURS),
-            'iat': datetime.utcnow()
+            # С долями секунды: токен, выданный сразу после принудительного выхода, не считается отозванным
+            'iat': time.time()
         }
         return jwt.encode(payload, Config.JWT_SECRET_KEY, algorithm=Config.JWT_ALGORITHM)
     
     @staticmethod
-    def verify_token(token):
+    def _decode(token):
         try:
-            payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=[Config.JWT_ALGORITHM])
-            return payload.get('consumer_id')
+            return jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=[Config.JWT_ALGORITHM])
         except jwt.ExpiredSignatureError:
             raise UnauthorizedError("Token expired")
         except jwt.InvalidTokenError:
             raise UnauthorizedError("Invalid token")
     
+    @staticmethod
+    def _is_revoked(payload):
+        """Фильтр Блума отвечает без БД; таблицу revoked_token читаем только при попадании в фильтр"""
+        revocations = RevocationFilter.get()
+        jti = payload.get('jti')
+        if jti:
+            key = RevokedTokenRepository.jti_key(jti)
+            if revocations.might_contain(key) and RevokedTokenRepository.get(key) is not None:
+                return True
+        
+        key = RevokedTokenRepository.consumer_key(payload.get('consumer_id'))
+        if revocations.might_contain(key):
+            revoked = RevokedTokenRepository.get(key)
+            if revoked is not None and payload.get('iat', 0) < revoked.revoked_at:
+                return True
+        return False
+    
+    @staticmethod
+    def verify_token(token):
+        payload = AuthService._decode(token)
+        if AuthService._is_revoked(payload):
+            raise UnauthorizedError("Token revoked")
+        return payload.get('consumer_id')
+    
+    @staticmethod
+    def logout(token, refresh_token=None):
+        """Отзывает access-токен (по jti) и refresh-токен устройства, если он передан"""
+        payload = AuthService._decode(token)
+        consumer_id = payload.get('consumer_id')
+        if refresh_token:
+            RefreshTokenRepository.delete_by_hash(consumer_id, AuthService._hash_refresh_token(refresh_token))
+        
+        jti = payload.get('jti')
+        if jti:
+            key = RevokedTokenRepository.jti_key(jti)
+            RevokedTokenRepository.revoke(key, consumer_id, payload['exp'])
+            RevocationFilter.add(key)
+    
+    @staticmethod
+    def sign_out_everywhere(consumer_id):
+        """Принудительный выход: все выданные до этого момента токены пользователя недействительны"""
+        RefreshTokenRepository.delete_by_consumer(consumer_id)
+        key = RevokedTokenRepository.consumer_key(consumer_id)
+        # Запись нужна, пока не истекут access-токены, выданные до отзыва
+        RevokedTokenRepository.revoke(key, consumer_id, time.time() + Config.JWT_EXPIRATION_HOURS * 3600)
+        RevocationFilter.add(key)
+    
+    @staticmethod
+    def get_principal(token):
+        """Principal (id, роль, запрещённые ингредиенты) по токену; из кэша — без запросов к БД"""
+        consumer_id = AuthService.verify_token(token)
+        principal = PrincipalCache.get().lookup(consumer_id)
+        if principal is None:
+            raise UnauthorizedError("Consumer not found")
+        return principal
+    
     @staticmethod
     def get_current_consumer(token):
         consumer_id = AuthService.verify_token(token)
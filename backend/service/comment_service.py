@@ -5,7 +5,7 @@ from models import Comment
 class CommentService:
     @staticmethod
     def get_comments(recipe_id):
-        return CommentRepository.get_by_recipe(recipe_id)
+        return CommentRepository.get_rows_by_recipe(recipe_id)
     
     @staticmethod
     def create_comment(recipe_id, consumer_id, text):
@@ -0,0 +1,160 @@
+import atexit
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from flask import current_app
+from repository import RecipeRepository
+from service.recipe_service import RecipeService
+
+logger = logging.getLogger(__name__)
+
+_build_lock = threading.Lock()
+
+
+class HistoryIngestor:
+    """Отложенная пакетная запись истории просмотров (write-behind).
+
+    Просмотры копятся в памяти процесса и раз в interval секунд или при
+    max_batch событиях пишутся одним upsert (RecipeRepository.record_views).
+    Если БД недоступна, пакет дописывается в файл спула и переигрывается при
+    следующей удачной записи. При остановке процесса буфер сбрасывается (atexit).
+    """
+
+    EXTENSION_KEY = 'history_ingestor'
+    # Сколько ждать фоновый поток при остановке, секунд
+    CLOSE_TIMEOUT = 10
+
+    def __init__(self, app, interval, max_batch, spool_dir):
+        self.app = app
+        self.interval = interval
+        self.max_batch = max_batch
+        self.spool_dir = spool_dir
+        self.buffer = []
+        self.lock = threading.Lock()
+        # Одна запись в БД за раз: фоновый поток, сброс по размеру и при остановке не пересекаются
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.closed = False
+        # interval == 0 — пишем сразу в потоке запроса (тесты, однопоточный запуск)
+        self.thread = None
+        if interval:
+            self.thread = threading.Thread(target=self._run, name='history-ingestor', daemon=True)
+            self.thread.start()
+            atexit.register(self.close)
+
+    @classmethod
+    def get(cls):
+        ingestor = current_app.extensions.get(cls.EXTENSION_KEY)
+        if ingestor is None:
+            with _build_lock:
+                ingestor = current_app.extensions.get(cls.EXTENSION_KEY)
+                if ingestor is None:
+                    app = current_app._get_current_object()
+                    config = app.config
+                    ingestor = cls(
+                        app,
+                        config['HISTORY_FLUSH_INTERVAL'],
+                        config['HISTORY_FLUSH_SIZE'],
+                        config['HISTORY_SPOOL_DIR'] or os.path.join(app.instance_path, 'history_spool')
+                    )
+                    current_app.extensions[cls.EXTENSION_KEY] = ingestor
+        return ingestor
+
+    def record(self, consumer_id, recipe_id):
+        view = (consumer_id, recipe_id, datetime.utcnow())
+        if self.thread is None or self.closed:
+            if self._write([view]):
+                self._replay_spool()
+            return
+        with self.lock:
+            self.buffer.append(view)
+            full = len(self.buffer) >= self.max_batch
+        if full:
+            self.wake.set()
+
+    def flush(self):
+        """Пишет накопленные просмотры; True, если БД приняла пакет (или он пуст)"""
+        with self.flush_lock:
+            with self.lock:
+                views, self.buffer = self.buffer, []
+            return not views or self._write(views)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(self.CLOSE_TIMEOUT)
+        if self.flush():
+            self._replay_spool()
+
+    def _run(self):
+        while not self.closed:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            try:
+                if self.flush():
+                    self._replay_spool()
+            except Exception:
+                logger.exception("History flush failed")
+
+    def _write(self, views):
+        try:
+            with self.app.app_context():
+                consumer_ids = RecipeRepository.record_views(views)
+        except Exception:
+            logger.exception("Failed to write %d history views, spooling", len(views))
+            self._spool(views)
+            return False
+
+        # Просмотр меняет ленту рекомендаций
+        with self.app.app_context():
+            for consumer_id in consumer_ids:
+                try:
+                    RecipeService.refresh_recommendations(consumer_id)
+                except Exception:
+                    logger.exception("Recommendation refresh failed for consumer %s", consumer_id)
+        return True
+
+    def _spool(self, views):
+        # Файл на процесс: строки из разных воркеров не перемешиваются
+        path = os.path.join(self.spool_dir, f'{os.getpid()}.jsonl')
+        try:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as spool:
+                for consumer_id, recipe_id, viewed_at in views:
+                    spool.write(json.dumps([consumer_id, recipe_id, viewed_at.isoformat()]) + '\n')
+        except OSError:
+            logger.exception("Failed to spool %d history views, they are lost", len(views))
+
+    def _replay_spool(self):
+        """Переигрывает файлы спула всех процессов; файл захватывается переименованием"""
+        if not os.path.isdir(self.spool_dir):
+            return
+        for name in sorted(os.listdir(self.spool_dir)):
+            if not name.endswith('.jsonl'):
+                continue
+            path = os.path.join(self.spool_dir, name)
+            claimed = f'{path}.{os.getpid()}.replay'
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                # Файл уже забрал другой процесс
+                continue
+
+            views = []
+            with open(claimed, encoding='utf-8') as spool:
+                for line in spool:
+                    try:
+                        consumer_id, recipe_id, viewed_at = json.loads(line)
+                        views.append((consumer_id, recipe_id, datetime.fromisoformat(viewed_at)))
+                    except (TypeError, ValueError):
+                        logger.warning("Skipping malformed history spool line in %s", name)
+            # Неудачная запись снова попадёт в спул этого процесса
+            written = not views or self._write(views)
+            os.remove(claimed)
+            if not written:
+                return
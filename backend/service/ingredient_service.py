@@ -1,4 +1,5 @@
 from repository import IngredientRepository
+from cache import IngredientLexicon
 
 class IngredientService:
     @staticmethod
@@ -25,10 +26,9 @@ class IngredientService:
             else:
                 ingredient_names.append(item.strip())
         
-        # Получаем ID по именам
+        # Получаем ID по именам через словарь ингредиентов в памяти
         if ingredient_names:
-            ingredients = IngredientRepository.get_by_names(ingredient_names)
-            ingredient_ids.extend([ing.id for ing in ingredients])
+            ingredient_ids.extend(IngredientLexicon.get().resolve(ingredient_names))
         
         return list(set(ingredient_ids))  # Убираем дубликаты
 
@@ -1,12 +1,15 @@
 from repository import MarkRepository
 from exception import ValidationError
+from service.recipe_service import RecipeService
 
 class MarkService:
     @staticmethod
     def upsert_mark(recipe_id, consumer_id, value):
         if not (1 <= value <= 5):
             raise ValidationError("Mark value must be between 1 and 5")
-        return MarkRepository.upsert(consumer_id, recipe_id, value)
+        mark = MarkRepository.upsert(consumer_id, recipe_id, value)
+        RecipeService.refresh_recommendations(consumer_id)
+        return mark
     
     @staticmethod
     def get_marks(consumer_id):
@@ -14,4 +17,7 @@ class MarkService:
 
     @staticmethod
     def delete_mark(recipe_id, consumer_id):
-        return MarkRepository.delete_by_consumer_and_recipe(consumer_id, recipe_id)
+        deleted = MarkRepository.delete_by_consumer_and_recipe(consumer_id, recipe_id)
+        if deleted:
+            RecipeService.refresh_recommendations(consumer_id)
+        return deleted
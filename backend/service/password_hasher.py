@@ -0,0 +1,82 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from exception import ServiceUnavailableError
+import password_hashing
+
+logger = logging.getLogger(__name__)
+
+_build_lock = threading.Lock()
+
+# Через сколько секунд клиенту стоит повторить вход, если пул переполнен
+RETRY_AFTER_SECONDS = 1
+
+
+class PasswordHasher:
+    """Хэширование и проверка паролей в отдельном пуле процессов.
+
+    Дорогой KDF не занимает потоки веб-сервера и не держит GIL. Одновременно
+    принимается не больше workers + max_queue задач; сверх этого сразу
+    ServiceUnavailableError (503), а не очередь без конца.
+    """
+
+    EXTENSION_KEY = 'password_hasher'
+
+    def __init__(self, method, workers, max_queue):
+        self.method = password_hashing.canonical_method(method)
+        self.workers = workers
+        # workers == 0 — хэшируем в текущем потоке (тесты, однопоточный запуск)
+        self.executor = self._executor() if workers else None
+        self.slots = threading.BoundedSemaphore(max(workers, 1) + max_queue)
+        self.lock = threading.Lock()
+
+    def _executor(self):
+        # spawn: fork многопоточного сервера может унаследовать захваченные блокировки
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    @classmethod
+    def get(cls):
+        hasher = current_app.extensions.get(cls.EXTENSION_KEY)
+        if hasher is None:
+            with _build_lock:
+                hasher = current_app.extensions.get(cls.EXTENSION_KEY)
+                if hasher is None:
+                    config = current_app.config
+                    hasher = cls(
+                        config['PASSWORD_HASH_METHOD'],
+                        config['PASSWORD_HASH_WORKERS'],
+                        config['PASSWORD_HASH_MAX_QUEUE']
+                    )
+                    current_app.extensions[cls.EXTENSION_KEY] = hasher
+        return hasher
+
+    def _run(self, function, *args):
+        if not self.slots.acquire(blocking=False):
+            raise ServiceUnavailableError("Too many concurrent sign-ins, retry later", retry_after=RETRY_AFTER_SECONDS)
+        executor = self.executor
+        try:
+            if executor is None:
+                return function(*args)
+            return executor.submit(function, *args).result()
+        except BrokenProcessPool:
+            # Воркер упал (например, OOM): пересоздаём пул, текущий запрос отклоняем
+            logger.exception("Password hashing pool is broken, restarting")
+            with self.lock:
+                if self.executor is executor:
+                    self.executor = self._executor()
+            raise ServiceUnavailableError("Password hashing is temporarily unavailable", retry_after=RETRY_AFTER_SECONDS)
+        finally:
+            self.slots.release()
+
+    def hash(self, password):
+        return self._run(password_hashing.hash_password, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(password_hashing.verify_password, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Хэш сделан с другими параметрами, чем PASSWORD_HASH_METHOD"""
+        return password_hashing.method_of(password_hash) != self.method
@@ -0,0 +1,41 @@
+from repository import RecipeRepository, CategoryRepository, RecipeStatsRepository
+
+class RecipeCardAssembler:
+    """Собирает карточки рецептов для списков пачкой.
+    
+    Вместо запросов на каждую карточку выполняет фиксированное число
+    запросов: колонки карточек рецептов, счётчики из recipe_stats, категории.
+    """
+    
+    @staticmethod
+    def assemble(recipe_ids, recipes=None, fields=None):
+        """Карточки в порядке recipe_ids; recipes — уже загруженные рецепты (ORM или RecipeRow), если есть.
+        fields (RecipeFields) отключает запросы счётчиков и категорий, которые не нужны"""
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return []
+        
+        if recipes is None:
+            recipes = RecipeRepository.get_card_rows(recipe_ids)
+        recipes_by_id = {recipe.id: recipe for recipe in recipes}
+        
+        with_stats = fields is None or fields.wants('stats')
+        with_categories = fields is None or fields.wants('categories')
+        stats = RecipeStatsRepository.get_by_recipe_ids(recipe_ids) if with_stats else {}
+        categories = CategoryRepository.get_by_recipe_ids(recipe_ids) if with_categories else {}
+        
+        cards = []
+        for recipe_id in recipe_ids:
+            recipe = recipes_by_id.get(recipe_id)
+            if recipe is None:
+                continue
+            card = recipe.to_dict()
+            if with_stats:
+                if recipe_id in stats:
+                    card.update(stats[recipe_id].to_dict())
+                else:
+                    card.update(avg_rating=0.0, comments_count=0, favorites_count=0)
+            if with_categories:
+                card['categories'] = [c.to_dict() for c in categories[recipe_id]]
+            cards.append(card)
+        return cards
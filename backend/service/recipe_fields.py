@@ -0,0 +1,76 @@
+from exception import ValidationError
+
+
+class RecipeFields:
+    """Разбор ?fields= и ?include= для списка и деталей рецепта.
+
+    include перечисляет дорогие части ответа (каждая — отдельный запрос или вычисление),
+    fields — поля, которые нужно отдать. Части, которые не попали ни в include, ни
+    в поля из fields, не вычисляются. Без параметров ответ полный, как раньше.
+    """
+
+    BASE_FIELDS = ('id', 'title', 'description', 'cooking_time', 'difficulty', 'image_url', 'match_percent')
+    # Часть ответа -> поля, которые она добавляет
+    EXPANSIONS = {
+        'stats': ('avg_rating', 'comments_count', 'favorites_count'),
+        'categories': ('categories',),
+        'missing_ingredients': ('missing_ingredients',),
+        'ingredients': ('ingredients',),
+        'steps': ('steps',)
+    }
+    LIST_EXPANSIONS = ('stats', 'categories', 'missing_ingredients')
+    DETAIL_EXPANSIONS = ('stats', 'categories', 'missing_ingredients', 'ingredients', 'steps')
+
+    def __init__(self, include, fields=None):
+        self.include = frozenset(include)
+        self.fields = frozenset(fields) if fields is not None else None
+
+    @staticmethod
+    def _split(value):
+        return [part.strip() for part in value.split(',') if part.strip()]
+
+    @classmethod
+    def parse(cls, fields=None, include=None, detail=False):
+        """RecipeFields из параметров запроса; ValidationError для неизвестных имён"""
+        allowed = cls.DETAIL_EXPANSIONS if detail else cls.LIST_EXPANSIONS
+        if fields is None and include is None:
+            return cls(allowed)
+
+        expansions = set()
+        if include is not None:
+            expansions.update(cls._split(include))
+            unknown = expansions - set(allowed)
+            if unknown:
+                raise ValidationError(
+                    f"Unknown include: {', '.join(sorted(unknown))}. Allowed: {', '.join(allowed)}"
+                )
+
+        requested = None
+        if fields is not None:
+            requested = set(cls._split(fields))
+            owners = {field: name for name in allowed for field in cls.EXPANSIONS[name]}
+            unknown = requested - set(cls.BASE_FIELDS) - set(owners)
+            if unknown:
+                raise ValidationError(f"Unknown fields: {', '.join(sorted(unknown))}")
+            # Части из include попадают в ответ целиком, даже если их полей нет в fields
+            for name in expansions:
+                requested.update(cls.EXPANSIONS[name])
+            expansions.update(owners[field] for field in requested if field in owners)
+        return cls(expansions, requested)
+
+    def wants(self, expansion):
+        return expansion in self.include
+
+    @property
+    def key(self):
+        """Канонический вид для ключей кэша и ETag"""
+        return (
+            tuple(sorted(self.include)),
+            tuple(sorted(self.fields)) if self.fields is not None else None
+        )
+
+    def project(self, data):
+        """Оставляет в ответе только запрошенные поля"""
+        if self.fields is None:
+            return data
+        return {key: value for key, value in data.items() if key in self.fields}
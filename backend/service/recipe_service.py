@@ -1,7 +1,16 @@
-from repository import RecipeRepository, ConsumerRepository, IngredientRepository
+import heapq
+from flask import current_app
+from repository import RecipeRepository, ConsumerRepository, IngredientRepository, RecipeNeighborRepository, RecommenderRepository
 from exception import NotFoundError, ValidationError
-from sqlalchemy import func
-from models import Mark, Comment
+from cache import RecipeIngredientIndex, RecipeFactorIndex, RecommendationFeed
+from service.recipe_card_assembler import RecipeCardAssembler
+from service.recipe_fields import RecipeFields
+
+# Рекомендации: сколько последних просмотров учитывать и сколько рецептов отдавать
+RECENT_HISTORY_SIZE = 5
+RECOMMENDATIONS_LIMIT = 10
+# Кандидатов из коллаборативной модели берём с запасом: часть отсеют запрещённые ингредиенты
+COLLABORATIVE_CANDIDATES = 3 * RECOMMENDATIONS_LIMIT
 
 class RecipeService:
     @staticmethod
@@ -13,139 +22,268 @@ class RecipeService:
         difficulty=None,
         category_id=None,
         min_match=0.0,
-        sort='match'
+        sort='match',
+        k=None,
+        fields=None
     ):
-        # Получаем базовый список рецептов
-        recipes = RecipeRepository.search(
-            query=query,
-            ingredient_ids=None,  # Вычисляем match в сервисе
-            forbidden_ingredient_ids=forbidden_ingredient_ids,
-            max_time=max_time,
-            difficulty=difficulty,
-            category_id=category_id,
-            min_match=0.0,
-            sort=sort
-        )
-        
-        # Если есть ингредиенты для поиска, вычисляем match_percent
+        """Поиск рецептов; k ограничивает выдачу лучшими k по активной сортировке,
+        fields (RecipeFields) — какие части карточек считать"""
+        fields = fields or RecipeFields.parse()
+        # Если есть ингредиенты для поиска, сначала отбираем подходящие рецепты
         if user_ingredient_ids:
-            selected_ids = set(user_ingredient_ids)
-            results = []
-            for recipe in recipes:
-                recipe_ingredient_ids = {ing.id for ing in recipe.ingredients}
-                if not selected_ids.issubset(recipe_ingredient_ids):
-                    continue
-                match_info = RecipeRepository.calculate_match_info(recipe, user_ingredient_ids)
-                if match_info['match_percent'] >= min_match:
-                    recipe_dict = recipe.to_dict()
-                    recipe_dict['match_percent'] = match_info['match_percent']
-                    recipe_dict['missing_ingredients'] = match_info['missing_ingredients']
-                    
-                    # Добавляем статистику
-                    recipe_dict['avg_rating'] = RecipeService._calculate_avg_rating(recipe.id)
-                    recipe_dict['comments_count'] = RecipeService._count_comments(recipe.id)
-                    recipe_dict['categories'] = [c.to_dict() for c in recipe.categories]
-                    
-                    results.append(recipe_dict)
+            matches = RecipeService._match_ingredients(user_ingredient_ids, min_match)
+            if not matches:
+                return []
+            
+            # Остальные фильтры применяем в БД, забирая только ключи сортировки
+            rows = RecipeRepository.search_keys(
+                query=query,
+                forbidden_ingredient_ids=forbidden_ingredient_ids,
+                max_time=max_time,
+                difficulty=difficulty,
+                category_id=category_id,
+                recipe_ids=list(matches)
+            )
+            top_ids = RecipeService._top_k(rows, matches, sort, k)
             
-            # Сортировка
-            if sort == 'match':
-                results.sort(key=lambda x: x['match_percent'], reverse=True)
-            elif sort == 'rating':
-                results.sort(key=lambda x: (x['avg_rating'], x['match_percent']), reverse=True)
-            elif sort == 'time':
-                results.sort(key=lambda x: (x['cooking_time'], -x['match_percent']))
-            elif sort == 'popular':
-                # Для popular нужно считать fav_count, упростим
-                results.sort(key=lambda x: (x['comments_count'], x['match_percent']), reverse=True)
+            # Полные карточки и недостающие ингредиенты — только для top-K
+            missing = None
+            if fields.wants('missing_ingredients'):
+                missing = RecipeService._missing_ingredients(top_ids, user_ingredient_ids)
+            results = RecipeCardAssembler.assemble(top_ids, fields=fields)
+            for recipe_dict in results:
+                recipe_dict['match_percent'] = matches[recipe_dict['id']]
+                if missing is not None:
+                    recipe_dict['missing_ingredients'] = missing[recipe_dict['id']]
             
-            return results
+            return [fields.project(recipe_dict) for recipe_dict in results]
         else:
             # Без ингредиентов - просто возвращаем рецепты
-            results = []
-            for recipe in recipes:
-                recipe_dict = recipe.to_dict()
+            recipes = RecipeRepository.search(
+                query=query,
+                forbidden_ingredient_ids=forbidden_ingredient_ids,
+                max_time=max_time,
+                difficulty=difficulty,
+                category_id=category_id,
+                sort=sort,
+                limit=k
+            )
+            results = RecipeCardAssembler.assemble([recipe.id for recipe in recipes], recipes, fields)
+            for recipe_dict in results:
                 recipe_dict['match_percent'] = None
-                recipe_dict['missing_ingredients'] = []
-                recipe_dict['avg_rating'] = RecipeService._calculate_avg_rating(recipe.id)
-                recipe_dict['comments_count'] = RecipeService._count_comments(recipe.id)
-                recipe_dict['categories'] = [c.to_dict() for c in recipe.categories]
-                results.append(recipe_dict)
+                if fields.wants('missing_ingredients'):
+                    recipe_dict['missing_ingredients'] = []
             
-            return results
+            return [fields.project(recipe_dict) for recipe_dict in results]
+    
+    @staticmethod
+    def _top_k(rows, matches, sort, k=None):
+        """ID лучших k рецептов по активной сортировке; k=None — все, отсортированные"""
+        if sort == 'rating':
+            key = lambda row: (row.avg_rating, matches[row.id], row.id)
+        elif sort == 'time':
+            key = lambda row: (-row.cooking_time, matches[row.id], -row.id)
+        elif sort == 'popular':
+            key = lambda row: (row.popularity_score, matches[row.id], row.id)
+        elif sort == 'trending':
+            key = lambda row: (row.trending_score, matches[row.id], row.id)
+        else:
+            key = lambda row: (matches[row.id], row.id)
+        
+        if k is None or k >= len(rows):
+            top = sorted(rows, key=key, reverse=True)
+        else:
+            top = heapq.nlargest(k, rows, key=key)
+        return [row.id for row in top]
+    
+    @staticmethod
+    def search_recipes_page(
+        limit,
+        cursor=None,
+        user_ingredient_ids=None,
+        forbidden_ingredient_ids=None,
+        query=None,
+        max_time=None,
+        difficulty=None,
+        category_id=None,
+        min_match=0.0,
+        sort='match',
+        fields=None
+    ):
+        """Страница поиска: возвращает (рецепты, next_cursor).
+        
+        Фильтрация, сортировка и срез выполняются в БД, поэтому стоимость
+        зависит от размера страницы, а не каталога.
+        """
+        fields = fields or RecipeFields.parse()
+        rows, next_cursor = RecipeRepository.search_page(
+            limit,
+            cursor=cursor,
+            sort=sort,
+            query=query,
+            ingredient_ids=user_ingredient_ids or None,
+            forbidden_ingredient_ids=forbidden_ingredient_ids,
+            max_time=max_time,
+            difficulty=difficulty,
+            category_id=category_id,
+            min_match=min_match
+        )
+        
+        with_missing = fields.wants('missing_ingredients')
+        missing = {}
+        if user_ingredient_ids and with_missing:
+            missing = RecipeService._missing_ingredients(
+                [recipe.id for recipe, _ in rows], user_ingredient_ids
+            )
+        
+        results = RecipeCardAssembler.assemble(
+            [recipe.id for recipe, _ in rows], [recipe for recipe, _ in rows], fields
+        )
+        match_percents = {recipe.id: match_percent for recipe, match_percent in rows}
+        for recipe_dict in results:
+            recipe_dict['match_percent'] = match_percents[recipe_dict['id']]
+            if with_missing:
+                recipe_dict['missing_ingredients'] = missing.get(recipe_dict['id'], [])
+        
+        return [fields.project(recipe_dict) for recipe_dict in results], next_cursor
     
     @staticmethod
-    def _calculate_avg_rating(recipe_id):
-        marks = Mark.query.filter_by(recipe_id=recipe_id).all()
-        if marks:
-            return sum(m.value for m in marks) / len(marks)
-        return 0.0
+    def _match_ingredients(user_ingredient_ids, min_match=0.0):
+        """{recipe_id: match_percent} по битовому индексу или агрегатом в БД"""
+        if current_app.config['RECIPE_INDEX_ENABLED']:
+            return RecipeIngredientIndex.get().match(user_ingredient_ids, min_match)
+        return dict(RecipeRepository.match_ratios(user_ingredient_ids, min_match))
     
     @staticmethod
-    def _count_comments(recipe_id):
-        return Comment.query.filter_by(recipe_id=recipe_id).count()
+    def _missing_ingredient_ids(recipe_ids, user_ingredient_ids):
+        """{recipe_id: [ID недостающих ингредиентов]}"""
+        if current_app.config['RECIPE_INDEX_ENABLED']:
+            index = RecipeIngredientIndex.get()
+            return {
+                recipe_id: index.match_info(recipe_id, user_ingredient_ids)[1]
+                for recipe_id in recipe_ids
+            }
+        selected = set(user_ingredient_ids)
+        return {
+            recipe_id: [ing_id for ing_id in ingredient_ids if ing_id not in selected]
+            for recipe_id, ingredient_ids in RecipeRepository.get_ingredient_ids(recipe_ids).items()
+        }
     
     @staticmethod
-    def get_recipe(recipe_id, user_ingredient_ids=None):
-        recipe = RecipeRepository.get_by_id(recipe_id)
+    def _missing_ingredients(recipe_ids, user_ingredient_ids):
+        """{recipe_id: [ingredient.to_dict(), ...]} одним запросом к ингредиентам"""
+        missing_by_recipe = RecipeService._missing_ingredient_ids(recipe_ids, user_ingredient_ids)
+        missing_ids = {ing_id for ids in missing_by_recipe.values() for ing_id in ids}
+        ingredients = {
+            ing.id: ing.to_dict()
+            for ing in IngredientRepository.get_by_ids(list(missing_ids))
+        } if missing_ids else {}
+        return {
+            recipe_id: [ingredients[ing_id] for ing_id in ids if ing_id in ingredients]
+            for recipe_id, ids in missing_by_recipe.items()
+        }
+    
+    @staticmethod
+    def get_recipe(recipe_id, user_ingredient_ids=None, fields=None):
+        fields = fields or RecipeFields.parse(detail=True)
+        # Ингредиенты нужны и для совпадения с продуктами пользователя
+        with_ingredients = fields.wants('ingredients') or bool(user_ingredient_ids)
+        recipe = RecipeRepository.get_details(
+            recipe_id,
+            stats=fields.wants('stats'),
+            categories=fields.wants('categories'),
+            ingredients=with_ingredients,
+            steps=fields.wants('steps')
+        )
         if not recipe:
             raise NotFoundError("Recipe not found")
         
-        recipe_dict = recipe.to_dict(include_details=True)
+        recipe_dict = recipe.to_detail_dict(fields.include)
         
         if user_ingredient_ids:
             match_info = RecipeRepository.calculate_match_info(recipe, user_ingredient_ids)
             recipe_dict['match_percent'] = match_info['match_percent']
-            recipe_dict['missing_ingredients'] = match_info['missing_ingredients']
+            missing_ingredients = match_info['missing_ingredients']
         else:
             recipe_dict['match_percent'] = None
-            recipe_dict['missing_ingredients'] = []
+            missing_ingredients = []
+        if fields.wants('missing_ingredients'):
+            recipe_dict['missing_ingredients'] = missing_ingredients
         
-        return recipe_dict
+        return fields.project(recipe_dict)
     
     @staticmethod
     def get_recommendations(consumer_id):
+        """Лента рекомендаций из кэша; протухшая отдаётся сразу и пересчитывается в фоне"""
+        return RecommendationFeed.get().read(consumer_id, RecipeService.build_recommendations)
+    
+    @staticmethod
+    def refresh_recommendations(consumer_id):
+        """Пересчитать ленту после просмотра, оценки или изменения избранного"""
+        RecommendationFeed.get().refresh(consumer_id, RecipeService.build_recommendations)
+    
+    @staticmethod
+    def build_recommendations(consumer_id):
         consumer = ConsumerRepository.get_by_id(consumer_id)
         if not consumer:
             raise NotFoundError("Consumer not found")
         
-        # Получаем историю
-        history = RecipeRepository.get_history(consumer_id)
+        # Последние просмотры — только id; просмотренное целиком исключаем в SQL
+        recent_ids = RecipeRepository.get_recent_history_ids(consumer_id, RECENT_HISTORY_SIZE)
+        forbidden_ids = [ing.id for ing in consumer.forbidden_ingredients]
         
-        if history:
-            # Берём категории и ингредиенты из истории
-            category_ids = set()
-            ingredient_ids = set()
-            for recipe in history[:5]:  # Берём последние 5
-                category_ids.update(c.id for c in recipe.categories)
-                ingredient_ids.update(ing.id for ing in recipe.ingredients)
-            
-            # Ищем рецепты с похожими категориями/ингредиентами
-            forbidden_ids = [ing.id for ing in consumer.forbidden_ingredients]
-            recipes = RecipeRepository.search(
-                ingredient_ids=list(ingredient_ids) if ingredient_ids else None,
+        # Достаточно оценок и избранного — коллаборативная модель,
+        # иначе сливаем предвычисленные списки похожих для последних просмотров
+        exclude = set(recent_ids)
+        ranked_ids = []
+        collaborative = False
+        factor = RecommenderRepository.get_consumer_factor(consumer_id)
+        if factor is not None and factor.interactions >= current_app.config['RECOMMENDER_MIN_INTERACTIONS']:
+            # Уже оценённое и избранное не рекомендуем
+            collaborative = True
+            exclude |= RecommenderRepository.interacted_recipe_ids(consumer_id)
+            ranked = RecipeFactorIndex.get().top_k(factor.vector, COLLABORATIVE_CANDIDATES, exclude=exclude)
+            ranked_ids = [recipe_id for recipe_id, _ in ranked]
+        if not ranked_ids and recent_ids:
+            scores = RecipeService._merge_neighbors(recent_ids, exclude=exclude)
+            ranked_ids = sorted(scores, key=lambda recipe_id: (-scores[recipe_id], recipe_id))
+        
+        # Просмотренное (и для коллаборативной ленты — оценённое и избранное) отсекаем в БД
+        exclusions = {
+            'exclude_viewed_by': consumer_id,
+            'exclude_interacted_by': consumer_id if collaborative else None
+        }
+        recipes = []
+        if ranked_ids:
+            candidates = RecipeRepository.search(
                 forbidden_ingredient_ids=forbidden_ids,
-                category_id=list(category_ids)[0] if category_ids else None,
-                sort='popular'
+                recipe_ids=ranked_ids,
+                **exclusions
             )
-            
-            # Исключаем уже просмотренные
-            history_ids = {r.id for r in history}
-            recipes = [r for r in recipes if r.id not in history_ids]
-        else:
-            # Топ популярных
-            forbidden_ids = [ing.id for ing in consumer.forbidden_ingredients]
-            recipes = RecipeRepository.search(
+            positions = {recipe_id: i for i, recipe_id in enumerate(ranked_ids)}
+            candidates.sort(key=lambda r: positions[r.id])
+            recipes = candidates[:RECOMMENDATIONS_LIMIT]
+        
+        # Без истории или пока соседи не посчитаны — добиваем популярными
+        if len(recipes) < RECOMMENDATIONS_LIMIT:
+            recipes += RecipeRepository.search(
                 forbidden_ingredient_ids=forbidden_ids,
-                sort='popular'
+                sort='popular',
+                exclude_ids=[r.id for r in recipes],
+                limit=RECOMMENDATIONS_LIMIT - len(recipes),
+                **exclusions
             )
         
-        results = []
-        for recipe in recipes[:10]:  # Ограничиваем 10
-            recipe_dict = recipe.to_dict()
-            recipe_dict['avg_rating'] = RecipeService._calculate_avg_rating(recipe.id)
-            recipe_dict['comments_count'] = RecipeService._count_comments(recipe.id)
-            recipe_dict['categories'] = [c.to_dict() for c in recipe.categories]
-            results.append(recipe_dict)
-        
-        return results
+        return RecipeCardAssembler.assemble([recipe.id for recipe in recipes], recipes)
+    
+    @staticmethod
+    def _merge_neighbors(recent_ids, exclude=()):
+        """{recipe_id: score}: похожесть к недавним просмотрам, более свежие весят больше"""
+        scores = {}
+        neighbors = RecipeNeighborRepository.get_for(recent_ids)
+        for position, recipe_id in enumerate(recent_ids):
+            weight = 1.0 / (position + 1)
+            for neighbor_id, score in neighbors.get(recipe_id, []):
+                if neighbor_id not in exclude:
+                    scores[neighbor_id] = scores.get(neighbor_id, 0.0) + weight * score
+        return scores
@@ -0,0 +1,131 @@
+import numpy as np
+from scipy import sparse
+from extensions import db
+from models import Recipe, RecipeNeighbor
+from models.associations import recipe_ingredient, recipe_category
+from repository import RecipeNeighborRepository
+
+# Вклад ингредиентов и категорий в итоговую похожесть
+INGREDIENT_WEIGHT = 0.7
+CATEGORY_WEIGHT = 0.3
+DEFAULT_TOP_N = 20
+# Признак, который есть у большей доли рецептов (соль, вода), в похожести не участвует:
+# о сходстве он ничего не говорит, а произведение матриц делает почти плотным
+MAX_FEATURE_SHARE = 0.5
+# В маленьком каталоге отсечку не применяем — там любой признак встречается часто
+MIN_RECIPES_FOR_CUTOFF = 100
+# Сколько ненулевых элементов матрицы похожести допускаем в одном блоке строк
+BLOCK_NNZ = 1 << 23
+
+
+class RecipeSimilarity:
+    """Похожие рецепты по косинусу векторов рецепт×ингредиент и рецепт×категория.
+
+    Используется офлайн-задачей build_neighbors.py: NumPy/SciPy в обработке запросов не нужны.
+    """
+
+    def __init__(self):
+        self.recipe_ids = np.array(
+            [recipe_id for (recipe_id,) in db.session.query(Recipe.id).order_by(Recipe.id)],
+            dtype=np.int64
+        )
+        self.positions = {int(recipe_id): i for i, recipe_id in enumerate(self.recipe_ids)}
+        ingredient_pairs = db.session.query(recipe_ingredient.c.recipe_id, recipe_ingredient.c.ingredient_id).all()
+        category_pairs = db.session.query(recipe_category.c.recipe_id, recipe_category.c.category_id).all()
+        self.ingredients, ingredient_cost = self._normalized_matrix(ingredient_pairs)
+        self.categories, category_cost = self._normalized_matrix(category_pairs)
+        # Оценка сверху числа ненулевых в строке матрицы похожести: сумма частот признаков рецепта
+        self.row_cost = ingredient_cost + category_cost
+
+    def _normalized_matrix(self, pairs):
+        """Бинарная разреженная матрица рецепт×признак с L2-нормированными строками
+        и оценка числа ненулевых, которое каждая строка даст в произведении"""
+        pairs = [(self.positions[recipe_id], feature_id) for recipe_id, feature_id in pairs if recipe_id in self.positions]
+        features = sorted({feature_id for _, feature_id in pairs})
+        columns = {feature_id: i for i, feature_id in enumerate(features)}
+        rows = np.array([position for position, _ in pairs], dtype=np.int64)
+        cols = np.array([columns[feature_id] for _, feature_id in pairs], dtype=np.int64)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(pairs), dtype=np.float64), (rows, cols)),
+            shape=(len(self.recipe_ids), len(features))
+        )
+        frequencies = np.asarray(matrix.sum(axis=0)).ravel()
+        if len(self.recipe_ids) >= MIN_RECIPES_FOR_CUTOFF:
+            keep = frequencies <= MAX_FEATURE_SHARE * len(self.recipe_ids)
+            matrix, frequencies = sparse.csr_matrix(matrix[:, keep]), frequencies[keep]
+        cost = matrix @ frequencies
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.csr_matrix(sparse.diags(1.0 / norms) @ matrix), cost
+
+    def _blocks(self, positions):
+        """Делит позиции на блоки подряд, не больше BLOCK_NNZ ожидаемых ненулевых в каждом"""
+        start, total = 0, 0
+        for end, cost in enumerate(self.row_cost[positions]):
+            if end > start and total + cost > BLOCK_NNZ:
+                yield positions[start:end]
+                start, total = end, 0
+            total += cost
+        if start < len(positions):
+            yield positions[start:]
+
+    def similarity(self, positions):
+        """Строки матрицы похожести для заданных позиций рецептов (разреженная матрица)"""
+        by_ingredients = self.ingredients[positions] @ self.ingredients.T
+        by_categories = self.categories[positions] @ self.categories.T
+        return sparse.csr_matrix(INGREDIENT_WEIGHT * by_ingredients + CATEGORY_WEIGHT * by_categories)
+
+    def neighbors(self, recipe_ids=None, top_n=DEFAULT_TOP_N):
+        """{recipe_id: [(neighbor_id, score), ...]} — top_n соседей по убыванию похожести"""
+        if recipe_ids is None:
+            positions = np.arange(len(self.recipe_ids))
+        else:
+            positions = np.array(sorted(self.positions[r] for r in recipe_ids if r in self.positions), dtype=np.int64)
+
+        result = {}
+        for block in self._blocks(positions):
+            scores = self.similarity(block)
+            for row, position in enumerate(block):
+                begin, end = scores.indptr[row], scores.indptr[row + 1]
+                columns = scores.indices[begin:end]
+                values = scores.data[begin:end]
+                keep = (columns != position) & (values > 0)
+                columns, values = columns[keep], values[keep]
+                if len(values) > top_n:
+                    best = np.argpartition(-values, top_n - 1)[:top_n]
+                    columns, values = columns[best], values[best]
+                order = np.lexsort((self.recipe_ids[columns], -values))
+                result[int(self.recipe_ids[position])] = [
+                    (int(self.recipe_ids[columns[i]]), round(float(values[i]), 6)) for i in order
+                ]
+        return result
+
+    def affected(self, recipe_ids):
+        """Изменённые рецепты и все, у кого они могут оказаться в списке соседей"""
+        positions = np.array([self.positions[r] for r in recipe_ids if r in self.positions], dtype=np.int64)
+        affected = set(recipe_ids)
+        for block in self._blocks(positions):
+            scores = self.similarity(block)
+            affected.update(int(recipe_id) for recipe_id in self.recipe_ids[np.unique(scores.indices)])
+        return affected
+
+    @staticmethod
+    def rebuild(recipe_ids=None, top_n=DEFAULT_TOP_N):
+        """Пересчитывает recipe_neighbor: полностью или только для изменённых рецептов.
+        Возвращает (число пересчитанных рецептов, число записанных пар)"""
+        similarity = RecipeSimilarity()
+        if recipe_ids is None:
+            neighbors = similarity.neighbors(top_n=top_n)
+            return len(neighbors), RecipeNeighborRepository.replace(neighbors, replace_all=True)
+        
+        # Плюс рецепты, в чьих текущих списках изменённые уже есть: похожесть могла упасть до нуля
+        targets = similarity.affected(recipe_ids) | {
+            recipe_id for (recipe_id,) in db.session.query(RecipeNeighbor.recipe_id).filter(
+                RecipeNeighbor.neighbor_id.in_(recipe_ids)
+            ).distinct()
+        }
+        neighbors = similarity.neighbors(targets, top_n=top_n)
+        # Удалённым рецептам и потерявшим всех соседей — пустой список, их строки просто удалятся
+        for recipe_id in targets:
+            neighbors.setdefault(recipe_id, [])
+        return len(neighbors), RecipeNeighborRepository.replace(neighbors)
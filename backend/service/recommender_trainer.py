@@ -0,0 +1,77 @@
+import numpy as np
+from scipy import sparse
+from repository import RecommenderRepository
+
+DEFAULT_FACTORS = 32
+DEFAULT_ITERATIONS = 15
+DEFAULT_REGULARIZATION = 0.1
+# Во сколько раз взаимодействие увеличивает уверенность в предпочтении (implicit ALS)
+DEFAULT_ALPHA = 10.0
+
+
+class RecommenderTrainer:
+    """Офлайн-обучение коллаборативной фильтрации: implicit ALS (Hu, Koren, Volinsky)
+    по разреженной матрице пользователь×рецепт из оценок и избранного."""
+
+    @staticmethod
+    def _solve(weights, fixed, regularization, alpha):
+        """Один полушаг ALS: векторы строк weights при фиксированных векторах столбцов"""
+        factors = fixed.shape[1]
+        gram = fixed.T @ fixed + regularization * np.eye(factors)
+        solved = np.zeros((weights.shape[0], factors))
+        for row in range(weights.shape[0]):
+            begin, end = weights.indptr[row], weights.indptr[row + 1]
+            if begin == end:
+                continue
+            columns = weights.indices[begin:end]
+            confidence = alpha * weights.data[begin:end]
+            local = fixed[columns]
+            # (YᵀY + Yᵀ(C - I)Y + λI) x = YᵀCp, где p = 1 для всех взаимодействий
+            matrix = gram + (local.T * confidence) @ local
+            solved[row] = np.linalg.solve(matrix, local.T @ (1.0 + confidence))
+        return solved
+
+    @staticmethod
+    def factorize(weights, factors=DEFAULT_FACTORS, iterations=DEFAULT_ITERATIONS,
+                  regularization=DEFAULT_REGULARIZATION, alpha=DEFAULT_ALPHA, seed=0):
+        """weights — csr пользователь×рецепт; возвращает (векторы пользователей, векторы рецептов)"""
+        rng = np.random.default_rng(seed)
+        users = np.zeros((weights.shape[0], factors))
+        items = rng.normal(scale=0.01, size=(weights.shape[1], factors))
+        by_item = sparse.csr_matrix(weights.T)
+        for _ in range(iterations):
+            users = RecommenderTrainer._solve(weights, items, regularization, alpha)
+            items = RecommenderTrainer._solve(by_item, users, regularization, alpha)
+        return users, items
+
+    @staticmethod
+    def train(factors=DEFAULT_FACTORS, iterations=DEFAULT_ITERATIONS,
+              regularization=DEFAULT_REGULARIZATION, alpha=DEFAULT_ALPHA):
+        """Обучает модель и сохраняет векторы; возвращает (пользователей, рецептов)"""
+        interactions = RecommenderRepository.interactions()
+        consumer_ids = sorted({consumer_id for consumer_id, _, _ in interactions})
+        recipe_ids = sorted({recipe_id for _, recipe_id, _ in interactions})
+        if not interactions:
+            RecommenderRepository.replace_factors([], [])
+            return 0, 0
+
+        consumer_positions = {consumer_id: i for i, consumer_id in enumerate(consumer_ids)}
+        recipe_positions = {recipe_id: i for i, recipe_id in enumerate(recipe_ids)}
+        weights = sparse.csr_matrix((
+            np.array([float(weight) for _, _, weight in interactions]),
+            (
+                np.array([consumer_positions[consumer_id] for consumer_id, _, _ in interactions]),
+                np.array([recipe_positions[recipe_id] for _, recipe_id, _ in interactions])
+            )
+        ), shape=(len(consumer_ids), len(recipe_ids)))
+
+        users, items = RecommenderTrainer.factorize(weights, factors, iterations, regularization, alpha)
+        counts = np.diff(weights.indptr)
+        RecommenderRepository.replace_factors(
+            [
+                (consumer_id, users[i].astype(np.float32).tobytes(), int(counts[i]))
+                for i, consumer_id in enumerate(consumer_ids)
+            ],
+            [(recipe_id, items[i].astype(np.float32).tobytes()) for i, recipe_id in enumerate(recipe_ids)]
+        )
+        return len(consumer_ids), len(recipe_ids)
@@ -2,6 +2,7 @@ import pytest
 from run import create_app
 from extensions import db
 from models import Consumer, Role, Ingredient, Category, Recipe
+from repository import RecipeStatsRepository
 
 @pytest.fixture
 def app():
@@ -9,9 +10,14 @@ def app():
     app.config['TESTING'] = True
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
     app.config['JWT_SECRET_KEY'] = 'test-secret-key'
+    # Ленты рекомендаций пересчитываем синхронно: фоновые потоки и sqlite в памяти не дружат
+    app.config['RECOMMENDATION_FEED_WORKERS'] = 0
+    app.config['PASSWORD_HASH_WORKERS'] = 0
+    app.config['HISTORY_FLUSH_INTERVAL'] = 0
     
     with app.app_context():
         db.create_all()
+        RecipeStatsRepository.ensure_epochs()
         
         # Создаём роли
         admin_role = Role(name='admin')
@@ -53,3 +53,27 @@ def test_get_profile_with_token(client, app):
     data = json.loads(response.data)
     assert data['email'] == 'test@example.com'
 
+
+def test_json_provider_matches_stdlib(app):
+    from datetime import datetime
+    from api.json_provider import FastJSONProvider
+    from repository.rows import IngredientRow
+    payload = {'rows': [IngredientRow(1, 'Курица', None)], 'at': datetime(2024, 5, 1, 12, 30)}
+    with app.app_context():
+        fast = FastJSONProvider(app).response(payload).get_data()
+        plain = FastJSONProvider(app, enabled=False).response(payload).get_data()
+    assert json.loads(fast) == json.loads(plain)
+
+def test_comment_listing_rows(client, app, test_recipe):
+    from extensions import db
+    from models import Recipe
+    with app.app_context():
+        recipe_id = db.session.query(Recipe.id).scalar()
+        consumer = AuthService.register('cook', 'cook@example.com', None, 'password123')
+        token = AuthService.generate_token(consumer.id)
+    headers = {'Authorization': f'Bearer {token}'}
+    client.post(f'/api/recipes/{recipe_id}/comments', json={'text': 'Вкусно'}, headers=headers)
+    
+    data = json.loads(client.get(f'/api/recipes/{recipe_id}/comments').data)
+    assert [(c['text'], c['consumer_username']) for c in data] == [('Вкусно', 'cook')]
+    assert set(data[0]) == {'id', 'text', 'consumer_id', 'consumer_username', 'recipe_id', 'created_at'}
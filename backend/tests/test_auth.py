@@ -1,7 +1,9 @@
 import pytest
+from werkzeug.security import generate_password_hash
 from service import AuthService
 from repository import ConsumerRepository
-from exception import ValidationError, UnauthorizedError
+from exception import ValidationError, UnauthorizedError, ServiceUnavailableError
+from service.password_hasher import PasswordHasher
 
 def test_register_success(app):
     with app.app_context():
@@ -37,3 +39,191 @@ def test_generate_token(app):
         consumer_id = AuthService.verify_token(token)
         assert consumer_id == consumer.id
 
+
+def test_principal_cached_and_invalidated(app, client):
+    from sqlalchemy import event
+    from extensions import db
+    from models import Ingredient
+    with app.app_context():
+        consumer = AuthService.register('cook', 'cook@example.com', None, 'password123')
+        token = AuthService.generate_token(consumer.id)
+        onion = Ingredient(name='лук')
+        db.session.add(onion)
+        db.session.commit()
+        onion_id = onion.id
+    headers = {'Authorization': f'Bearer {token}'}
+    
+    assert client.get('/api/me/marks', headers=headers).status_code == 200
+    statements = []
+    record = lambda *args: statements.append(args[2])
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        client.get('/api/me/marks', headers=headers)
+    finally:
+        with app.app_context():
+            event.remove(db.engine, 'before_cursor_execute', record)
+    # Повторный запрос: только выборка оценок, пользователь — из кэша
+    assert len(statements) == 1 and 'FROM mark' in statements[0]
+    
+    client.put('/api/me/forbidden-ingredients', json={'ingredient_ids': [onion_id]}, headers=headers)
+    data = client.get('/api/me/forbidden-ingredients', headers=headers).get_json()
+    assert [ing['id'] for ing in data] == [onion_id]
+
+def test_login_rehashes_outdated_password(app):
+    with app.app_context():
+        consumer = AuthService.register('testuser', 'test@example.com', None, 'password123')
+        ConsumerRepository.update_password_hash(
+            consumer.id, generate_password_hash('password123', method='pbkdf2:sha256')
+        )
+        
+        AuthService.login('test@example.com', 'password123')
+        password_hash = ConsumerRepository.get_by_id(consumer.id).password_hash
+        assert password_hash.startswith('scrypt:')
+        assert not PasswordHasher.get().needs_rehash(password_hash)
+        assert AuthService.login('test@example.com', 'password123')['access_token']
+
+def test_login_succeeds_when_rehash_is_rejected(app, monkeypatch):
+    with app.app_context():
+        consumer = AuthService.register('testuser', 'test@example.com', None, 'password123')
+        outdated = generate_password_hash('password123', method='pbkdf2:sha256')
+        ConsumerRepository.update_password_hash(consumer.id, outdated)
+        
+        def busy(password):
+            raise ServiceUnavailableError("busy", retry_after=1)
+        monkeypatch.setattr(PasswordHasher.get(), 'hash', busy)
+        # Пароль верный: вход проходит, перехэширование откладывается до следующего раза
+        assert AuthService.login('test@example.com', 'password123')['access_token']
+        assert ConsumerRepository.get_by_id(consumer.id).password_hash == outdated
+
+def test_password_hasher_rejects_when_queue_full(app, client):
+    with app.app_context():
+        AuthService.register('testuser', 'test@example.com', None, 'password123')
+        hasher = PasswordHasher('scrypt', workers=0, max_queue=0)
+        app.extensions[PasswordHasher.EXTENSION_KEY] = hasher
+        # Единственный слот занят другим входом
+        hasher.slots.acquire()
+        try:
+            with pytest.raises(ServiceUnavailableError):
+                hasher.verify('scrypt:1$x$y', 'password123')
+            response = client.post('/api/auth/login', json={'emailOrPhone': 'test@example.com', 'password': 'password123'})
+            assert response.status_code == 503
+            assert response.headers['Retry-After'] == '1'
+        finally:
+            hasher.slots.release()
+
+def test_password_hasher_process_pool():
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=1, max_queue=0)
+    try:
+        password_hash = hasher.hash('password123')
+        assert password_hash.startswith('pbkdf2:sha256:1000$')
+        assert hasher.verify(password_hash, 'password123')
+        assert not hasher.verify(password_hash, 'wrong')
+    finally:
+        hasher.executor.shutdown()
+
+def test_refresh_rotates_token_without_password_check(app, client, monkeypatch):
+    with app.app_context():
+        AuthService.register('testuser', 'test@example.com', None, 'password123')
+    response = client.post('/api/auth/login', json={
+        'emailOrPhone': 'test@example.com', 'password': 'password123', 'device_id': 'phone'
+    })
+    tokens = response.get_json()
+    assert tokens['device_id'] == 'phone'
+    
+    with app.app_context():
+        # Обновление не трогает хэш пароля
+        monkeypatch.setattr(PasswordHasher.get(), 'verify', None)
+    response = client.post('/api/auth/refresh', json={'refresh_token': tokens['refresh_token']})
+    assert response.status_code == 200
+    rotated = response.get_json()
+    assert rotated['device_id'] == 'phone'
+    assert rotated['refresh_token'] != tokens['refresh_token']
+    assert client.get('/api/me', headers={'Authorization': f"Bearer {rotated['access_token']}"}).status_code == 200
+    
+    # Повтор старого токена закрывает сессию устройства, новый токен тоже перестаёт работать
+    assert client.post('/api/auth/refresh', json={'refresh_token': tokens['refresh_token']}).status_code == 401
+    assert client.post('/api/auth/refresh', json={'refresh_token': rotated['refresh_token']}).status_code == 401
+
+def test_refresh_token_per_device(app):
+    with app.app_context():
+        AuthService.register('testuser', 'test@example.com', None, 'password123')
+        phone = AuthService.login('test@example.com', 'password123', 'phone')
+        laptop = AuthService.login('test@example.com', 'password123', 'laptop')
+        assert AuthService.refresh(phone['refresh_token'])['device_id'] == 'phone'
+        assert AuthService.refresh(laptop['refresh_token'])['device_id'] == 'laptop'
+        
+        # Повторный вход с устройства заменяет его токен
+        again = AuthService.login('test@example.com', 'password123', 'laptop')
+        with pytest.raises(UnauthorizedError):
+            AuthService.refresh(laptop['refresh_token'])
+        assert AuthService.refresh(again['refresh_token'])['access_token']
+
+def test_logout_revokes_only_current_token(app, client):
+    with app.app_context():
+        AuthService.register('testuser', 'test@example.com', None, 'password123')
+        first = AuthService.login('test@example.com', 'password123', 'phone')
+        second = AuthService.login('test@example.com', 'password123', 'laptop')
+    
+    headers = {'Authorization': f"Bearer {first['access_token']}"}
+    response = client.post('/api/auth/logout', headers=headers, json={'refresh_token': first['refresh_token']})
+    assert response.status_code == 200
+    assert client.get('/api/me', headers=headers).status_code == 401
+    assert client.post('/api/auth/refresh', json={'refresh_token': first['refresh_token']}).status_code == 401
+    assert client.get('/api/me', headers={'Authorization': f"Bearer {second['access_token']}"}).status_code == 200
+
+def test_sign_out_everywhere(app, client):
+    with app.app_context():
+        AuthService.register('testuser', 'test@example.com', None, 'password123')
+        tokens = AuthService.login('test@example.com', 'password123', 'phone')
+    
+    headers = {'Authorization': f"Bearer {tokens['access_token']}"}
+    assert client.post('/api/auth/logout-all', headers=headers).status_code == 200
+    assert client.get('/api/me', headers=headers).status_code == 401
+    assert client.post('/api/auth/refresh', json={'refresh_token': tokens['refresh_token']}).status_code == 401
+    
+    # Токены, выданные после выхода, действуют
+    with app.app_context():
+        fresh = AuthService.login('test@example.com', 'password123', 'phone')
+    assert client.get('/api/me', headers={'Authorization': f"Bearer {fresh['access_token']}"}).status_code == 200
+
+def test_revocation_check_skips_db_on_filter_miss(app):
+    from sqlalchemy import event
+    from extensions import db
+    with app.app_context():
+        consumer = AuthService.register('testuser', 'test@example.com', None, 'password123')
+        token = AuthService.generate_token(consumer.id)
+        AuthService.verify_token(token)
+        
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            assert AuthService.verify_token(token) == consumer.id
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        assert statements == []
+
+def test_revocation_filter_has_no_false_negatives():
+    from cache import RevocationFilter
+    keys = [f'jti:{i}' for i in range(5000)]
+    bloom = RevocationFilter(keys, 0.01)
+    assert all(bloom.might_contain(key) for key in keys)
+    false_positives = sum(bloom.might_contain(f'jti:other-{i}') for i in range(10000))
+    assert false_positives < 300
+
+def test_invalid_device_id_rejected_before_side_effects(app, client):
+    body = {'username': 'testuser', 'email': 'test@example.com', 'password': 'password123'}
+    assert client.post('/api/auth/register', json={**body, 'device_id': 123}).status_code == 400
+    with app.app_context():
+        assert ConsumerRepository.get_by_email('test@example.com') is None
+    assert client.post('/api/auth/register', json=body).status_code == 201
+    
+    with app.app_context():
+        hasher = PasswordHasher.get()
+        calls = []
+        verify = hasher.verify
+        hasher.verify = lambda *args: calls.append(args) or verify(*args)
+        with pytest.raises(ValidationError):
+            AuthService.login('test@example.com', 'password123', 'x' * 65)
+        assert calls == []
@@ -0,0 +1,111 @@
+import pytest
+from extensions import db
+from models import Ingredient, ingredient_trigram
+from repository import IngredientRepository
+from service import IngredientService
+from cache import IngredientLexicon
+
+@pytest.fixture
+def pantry(app):
+    with app.app_context():
+        names = ['Рис', 'Рисовая мука', 'Бурый рис', 'Морковь', 'Свёкла', 'Курица', 'Картофель']
+        for name in names:
+            db.session.add(Ingredient(name=name))
+        db.session.commit()
+        return names
+
+def _names(ingredients):
+    return [ing.name for ing in ingredients]
+
+def test_search_prefix_first(app, pantry):
+    with app.app_context():
+        names = _names(IngredientRepository.search('рис'))
+        assert names[:2] == ['Рис', 'Рисовая мука']
+        assert 'Бурый рис' in names
+        assert 'Морковь' not in names
+
+def test_search_substring_and_normalization(app, pantry):
+    with app.app_context():
+        assert _names(IngredientRepository.search('ковь')) == ['Морковь']
+        assert _names(IngredientRepository.search('  СВЕКЛА ')) == ['Свёкла']
+
+def test_search_tolerates_typo(app, pantry):
+    with app.app_context():
+        assert _names(IngredientRepository.search('картофель'))[0] == 'Картофель'
+        assert 'Картофель' in _names(IngredientRepository.search('картофиль'))
+
+def test_search_short_query_matches_word_prefix(app, pantry):
+    with app.app_context():
+        assert _names(IngredientRepository.search('ри')) == ['Рис', 'Рисовая мука', 'Бурый рис']
+
+def test_search_limit_applied(app, pantry):
+    with app.app_context():
+        assert len(IngredientRepository.search('рис', limit=1)) == 1
+
+def test_trigrams_follow_renames(app, pantry):
+    with app.app_context():
+        ingredient = Ingredient.query.filter_by(name='Морковь').first()
+        ingredient.name = 'Морковка'
+        db.session.commit()
+        assert ingredient.normalized_name == 'морковка'
+        assert _names(IngredientRepository.search('морковк')) == ['Морковка']
+
+        db.session.delete(ingredient)
+        db.session.commit()
+        remaining = db.session.query(ingredient_trigram).filter_by(ingredient_id=ingredient.id).count()
+        assert remaining == 0
+
+def test_lexicon_matches_substrings_both_ways(app, pantry):
+    with app.app_context():
+        by_name = {ing.name: ing.id for ing in Ingredient.query.all()}
+        lexicon = IngredientLexicon.get()
+        assert lexicon.resolve(['рис']) == {by_name['Рис'], by_name['Рисовая мука'], by_name['Бурый рис']}
+        # Название ингредиента внутри запроса
+        assert lexicon.resolve(['свекла отварная']) == {by_name['Свёкла']}
+        assert lexicon.resolve(['картошка']) == {by_name['Картофель']}
+        assert lexicon.resolve(['ананас', '  ']) == set()
+
+def test_lexicon_invalidated_on_create(app, pantry):
+    with app.app_context():
+        version = IngredientLexicon.get().version
+        assert IngredientService.resolve_ingredient_ids(['тыква']) == []
+        pumpkin = IngredientRepository.create('Тыква')
+        assert IngredientLexicon.get().version == version + 1
+        assert IngredientService.resolve_ingredient_ids(['тыква', str(pumpkin.id)]) == [pumpkin.id]
+
+def test_lexicon_corrects_typos(app, pantry):
+    with app.app_context():
+        by_name = {ing.name: ing.id for ing in Ingredient.query.all()}
+        lexicon = IngredientLexicon.get()
+        name, ids, confidence = lexicon.correct('куриза')
+        assert name == 'курица' and ids == {by_name['Курица']}
+        assert confidence == pytest.approx(5 / 6)
+        assert lexicon.correct('ананас') is None
+        # Короткие слова не исправляем — слишком много ложных срабатываний
+        assert lexicon.correct('рыс') is None
+        assert IngredientService.resolve_ingredient_ids(['марковь']) == [by_name['Морковь']]
+
+def test_latin_ingredient_queries(app, pantry):
+    with app.app_context():
+        by_name = {ing.name: ing.id for ing in Ingredient.query.all()}
+        assert _names(IngredientRepository.search('kartofel')) == ['Картофель']
+        assert IngredientService.resolve_ingredient_ids(['kurica']) == [by_name['Курица']]
+        assert IngredientService.resolve_ingredient_ids(['svekla']) == [by_name['Свёкла']]
+        assert IngredientService.resolve_ingredient_ids(['kartoshka']) == [by_name['Картофель']]
+
+def test_lexicon_infix_lookup_via_suffix_array():
+    lexicon = IngredientLexicon([(1, 'Рис'), (2, 'Бурый рис'), (3, 'Морковь'), (4, 'Рисовая мука')], aliases={})
+    # Каждое имя даёт по суффиксу на позицию, без всех подстрок
+    assert len(lexicon.suffixes) == sum(len(name) for name in lexicon.names)
+    assert lexicon._containing('рис') == {1, 2, 4}
+    assert lexicon._containing('ковь') == {3}
+    assert lexicon._containing('р') == {1, 2, 3, 4}
+    assert lexicon._containing('рисоваяя') == set()
+
+def test_lexicon_typo_near_aliases_of_one_ingredient():
+    lexicon = IngredientLexicon([(1, 'Помидоры'), (2, 'Морковь')])
+    # 'томат' и 'томаты' — синонимы одних помидоров, а не два соперничающих кандидата
+    name, ids, confidence = lexicon.correct('томатв')
+    assert name == 'помидоры' and ids == {1}
+    assert confidence == pytest.approx(5 / 6)
+    assert lexicon.resolve(['томатв']) == {1}
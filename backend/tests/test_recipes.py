@@ -0,0 +1,717 @@
+import pytest
+import json
+from extensions import db
+from models import Recipe, Ingredient, Difficulty
+from cache import RecipeIngredientIndex
+from repository import RecipeRepository
+
+@pytest.fixture
+def catalog(app):
+    with app.app_context():
+        chicken = Ingredient(name='курица')
+        potato = Ingredient(name='картофель')
+        onion = Ingredient(name='лук')
+        rice = Ingredient(name='рис')
+        db.session.add_all([chicken, potato, onion, rice])
+        db.session.flush()
+        
+        roast = Recipe(title='Курица с картофелем', cooking_time=60, difficulty=Difficulty.MEDIUM)
+        roast.ingredients = [chicken, potato, onion]
+        pilaf = Recipe(title='Плов', cooking_time=90, difficulty=Difficulty.HARD)
+        pilaf.ingredients = [chicken, rice]
+        mash = Recipe(title='Пюре', cooking_time=30, difficulty=Difficulty.EASY)
+        mash.ingredients = [potato]
+        db.session.add_all([roast, pilaf, mash])
+        db.session.commit()
+        return {
+            'chicken': chicken.id, 'potato': potato.id, 'onion': onion.id, 'rice': rice.id,
+            'roast': roast.id, 'pilaf': pilaf.id, 'mash': mash.id
+        }
+
+def test_index_match_subset_and_percent(app, catalog):
+    with app.app_context():
+        index = RecipeIngredientIndex.get()
+        matches = index.match([catalog['chicken']])
+        assert set(matches) == {catalog['roast'], catalog['pilaf']}
+        assert matches[catalog['pilaf']] == pytest.approx(0.5)
+        assert matches[catalog['roast']] == pytest.approx(1 / 3)
+        
+        assert index.match([catalog['chicken']], min_match=0.4) == {catalog['pilaf']: 0.5}
+        assert index.match([catalog['rice'], catalog['potato']]) == {}
+
+def test_index_missing_ingredients(app, catalog):
+    with app.app_context():
+        index = RecipeIngredientIndex.get()
+        match_percent, missing_ids = index.match_info(catalog['roast'], [catalog['chicken']])
+        assert match_percent == pytest.approx(1 / 3)
+        assert set(missing_ids) == {catalog['potato'], catalog['onion']}
+
+def test_index_invalidated_on_recipe_create(app, catalog):
+    with app.app_context():
+        assert catalog['rice'] in RecipeIngredientIndex.get().ingredient_postings
+        RecipeRepository.create('Рис отварной', None, 20, 'easy', ingredient_ids=[catalog['rice']])
+        matches = RecipeIngredientIndex.get().match([catalog['rice']])
+        assert len(matches) == 2
+
+def test_index_built_before_invalidate_is_not_reused(app, catalog):
+    with app.app_context():
+        stale = RecipeIngredientIndex.get()
+        RecipeRepository.create('Рис отварной', None, 20, 'easy', ingredient_ids=[catalog['rice']])
+        # Построение, начатое до изменения каталога, успело положить старый индекс
+        app.extensions[RecipeIngredientIndex.EXTENSION_KEY] = stale
+        assert len(RecipeIngredientIndex.get().match([catalog['rice']])) == 2
+
+def test_search_recipes_by_ingredients(client, catalog):
+    response = client.get('/api/recipes?ingredients=курица')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert [r['id'] for r in data] == [catalog['pilaf'], catalog['roast']]
+    assert {i['name'] for i in data[1]['missing_ingredients']} == {'картофель', 'лук'}
+
+def test_match_ratios_in_sql(app, catalog):
+    with app.app_context():
+        ratios = RecipeRepository.match_ratios([catalog['chicken']])
+        assert [recipe_id for recipe_id, _ in ratios] == [catalog['pilaf'], catalog['roast']]
+        assert ratios[0][1] == pytest.approx(0.5)
+        assert RecipeRepository.match_ratios([catalog['chicken']], min_match=0.4) == [(catalog['pilaf'], 0.5)]
+
+def test_search_pushes_ingredient_filter_to_sql(app, catalog):
+    with app.app_context():
+        recipes = RecipeRepository.search(ingredient_ids=[catalog['potato']], min_match=0.5)
+        assert [r.id for r in recipes] == [catalog['mash']]
+
+def test_search_recipes_without_index(app, client, catalog):
+    app.config['RECIPE_INDEX_ENABLED'] = False
+    response = client.get('/api/recipes?ingredients=курица&minMatch=0.4')
+    data = json.loads(response.data)
+    assert [r['id'] for r in data] == [catalog['pilaf']]
+    assert [i['name'] for i in data[0]['missing_ingredients']] == ['рис']
+
+@pytest.mark.parametrize('sort', ['match', 'rating', 'time', 'popular', 'trending'])
+def test_search_pagination_walks_all_pages(client, catalog, sort):
+    expected = [r['id'] for r in json.loads(client.get(f'/api/recipes?sort={sort}&limit=100').data)]
+    
+    seen = []
+    url = f'/api/recipes?sort={sort}&limit=1'
+    while True:
+        response = client.get(url)
+        assert response.status_code == 200
+        page = json.loads(response.data)
+        assert len(page) <= 1
+        seen.extend(r['id'] for r in page)
+        next_cursor = response.headers.get('X-Next-Cursor')
+        if not next_cursor:
+            break
+        url = f'/api/recipes?sort={sort}&limit=1&cursor={next_cursor}'
+    
+    assert seen == expected
+    assert len(seen) == 3
+
+def test_search_pagination_with_ingredients(client, catalog):
+    response = client.get('/api/recipes?ingredients=курица&limit=1')
+    page = json.loads(response.data)
+    assert [r['id'] for r in page] == [catalog['pilaf']]
+    assert page[0]['match_percent'] == pytest.approx(0.5)
+    
+    cursor = response.headers['X-Next-Cursor']
+    response = client.get(f'/api/recipes?ingredients=курица&limit=1&cursor={cursor}')
+    page = json.loads(response.data)
+    assert [r['id'] for r in page] == [catalog['roast']]
+    assert {i['name'] for i in page[0]['missing_ingredients']} == {'картофель', 'лук'}
+    assert 'X-Next-Cursor' not in response.headers
+
+def test_search_pagination_rejects_foreign_cursor(client, catalog):
+    response = client.get('/api/recipes?sort=time&limit=1')
+    cursor = response.headers['X-Next-Cursor']
+    assert client.get(f'/api/recipes?sort=rating&limit=1&cursor={cursor}').status_code == 400
+    assert client.get('/api/recipes?limit=1&cursor=garbage').status_code == 400
+
+def test_recipe_cards_use_constant_number_of_queries(app, client, catalog):
+    from sqlalchemy import event
+    
+    def count_queries(url):
+        statements = []
+        with app.app_context():
+            engine = db.engine
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, 'before_cursor_execute', listener)
+        try:
+            assert client.get(url).status_code == 200
+        finally:
+            event.remove(engine, 'before_cursor_execute', listener)
+        return len(statements)
+    
+    before = count_queries('/api/recipes')
+    with app.app_context():
+        for i in range(5):
+            RecipeRepository.create(f'Рецепт {i}', None, 10, 'easy', ingredient_ids=[catalog['rice']])
+    assert count_queries('/api/recipes') == before
+
+def test_recipe_cards_include_stats(app, client, catalog):
+    with app.app_context():
+        from service import RecipeCardAssembler
+        cards = RecipeCardAssembler.assemble([catalog['mash'], catalog['roast']])
+        assert [c['id'] for c in cards] == [catalog['mash'], catalog['roast']]
+        assert cards[0]['avg_rating'] == 0.0
+        assert cards[0]['comments_count'] == 0
+        assert cards[0]['favorites_count'] == 0
+        assert cards[0]['categories'] == []
+
+def test_favourites_and_recommendations_return_cards(app, client, catalog):
+    from service import AuthService
+    with app.app_context():
+        consumer = AuthService.register('cook', 'cook@example.com', None, 'password123')
+        token = AuthService.generate_token(consumer.id)
+    headers = {'Authorization': f'Bearer {token}'}
+    
+    client.post('/api/favourites', json={'recipe_id': catalog['pilaf']}, headers=headers)
+    data = json.loads(client.get('/api/favourites', headers=headers).data)
+    assert [r['id'] for r in data] == [catalog['pilaf']]
+    assert data[0]['favorites_count'] == 1
+    
+    client.post('/api/history', json={'recipe_id': catalog['pilaf']}, headers=headers)
+    response = client.get('/api/recommendations', headers=headers)
+    assert response.status_code == 200
+    assert catalog['pilaf'] not in [r['id'] for r in json.loads(response.data)]
+
+def test_recipe_stats_follow_writes_and_reconcile(app, catalog):
+    from models import RecipeStats
+    from repository import MarkRepository, CommentRepository, RecipeStatsRepository
+    from service import AuthService
+    with app.app_context():
+        first = AuthService.register('first', 'first@example.com', None, 'password123')
+        second = AuthService.register('second', 'second@example.com', None, 'password123')
+        
+        MarkRepository.upsert(first.id, catalog['mash'], 5)
+        MarkRepository.upsert(second.id, catalog['mash'], 2)
+        MarkRepository.upsert(second.id, catalog['mash'], 4)
+        comment = CommentRepository.create('Вкусно', first.id, catalog['mash'])
+        CommentRepository.create('Очень вкусно', second.id, catalog['mash'])
+        CommentRepository.delete(comment.id)
+        RecipeRepository.add_to_favorites(first.id, catalog['mash'])
+        RecipeRepository.add_to_history(first.id, catalog['mash'])
+        RecipeRepository.add_to_history(first.id, catalog['mash'])
+        
+        stats = db.session.get(RecipeStats, catalog['mash'])
+        assert (stats.rating_sum, stats.rating_count, stats.avg_rating) == (9, 2, 4.5)
+        assert (stats.comment_count, stats.favorite_count, stats.view_count) == (1, 1, 1)
+        
+        MarkRepository.delete_by_consumer_and_recipe(first.id, catalog['mash'])
+        expected = (4, 1, 4.0, 1, 1, 1)
+        assert (stats.rating_sum, stats.rating_count, stats.avg_rating,
+                stats.comment_count, stats.favorite_count, stats.view_count) == expected
+        
+        RecipeStatsRepository.reconcile()
+        stats = db.session.get(RecipeStats, catalog['mash'])
+        assert (stats.rating_sum, stats.rating_count, stats.avg_rating,
+                stats.comment_count, stats.favorite_count, stats.view_count) == expected
+        
+        top = RecipeRepository.search(sort='rating')
+        assert top[0].id == catalog['mash']
+
+def test_decayed_popularity_and_trending(app, client, catalog):
+    import time
+    from models import RecipeStats, ScoreEpoch
+    from repository import RecipeStatsRepository
+    from service import AuthService
+    with app.app_context():
+        cook = AuthService.register('cook', 'cook@example.com', None, 'password123')
+        RecipeRepository.add_to_favorites(cook.id, catalog['roast'])
+        # Давние события: сдвигаем эпоху на три недели назад, как будто избранное добавили тогда
+        for epoch in ScoreEpoch.query.all():
+            epoch.epoch -= 21 * 24 * 3600
+        db.session.commit()
+        RecipeRepository.add_to_history(cook.id, catalog['mash'])
+        RecipeRepository.add_to_history(cook.id, catalog['mash'])
+        
+        roast = db.session.get(RecipeStats, catalog['roast'])
+        mash = db.session.get(RecipeStats, catalog['mash'])
+        # За всё время избранное перевешивает два просмотра, за последнюю неделю — нет
+        assert roast.popularity_score > mash.popularity_score > 0
+        assert mash.trending_score > roast.trending_score
+        
+        ratio = mash.popularity_score / roast.popularity_score
+        RecipeStatsRepository.renormalize(time.time())
+        db.session.refresh(roast)
+        db.session.refresh(mash)
+        assert mash.trending_score == pytest.approx(2.0, rel=1e-3)
+        assert mash.popularity_score / roast.popularity_score == pytest.approx(ratio)
+    
+    assert [r['id'] for r in json.loads(client.get('/api/recipes?sort=popular').data)][:2] == [catalog['roast'], catalog['mash']]
+    assert [r['id'] for r in json.loads(client.get('/api/recipes?sort=trending').data)][:2] == [catalog['mash'], catalog['roast']]
+    data = json.loads(client.get('/api/recipes?ingredients=картофель&sort=trending').data)
+    assert [r['id'] for r in data] == [catalog['mash'], catalog['roast']]
+
+def test_undo_subtracts_original_decayed_contribution(app, catalog):
+    from datetime import datetime, timedelta
+    from models import RecipeStats, Mark
+    from models.associations import consumer_recipe_fav
+    from repository import RecipeStatsRepository, MarkRepository
+    from service import AuthService
+    with app.app_context():
+        cook = AuthService.register('cook', 'cook@example.com', None, 'password123')
+        chef = AuthService.register('chef', 'chef@example.com', None, 'password123')
+        RecipeRepository.add_to_favorites(cook.id, catalog['roast'])
+        RecipeRepository.add_to_favorites(chef.id, catalog['roast'])
+        MarkRepository.upsert(cook.id, catalog['roast'], 5)
+        # Избранное и оценка повара — трёхнедельной давности
+        weeks_ago = datetime.utcnow() - timedelta(days=21)
+        db.session.execute(consumer_recipe_fav.update().where(
+            consumer_recipe_fav.c.consumer_id == cook.id
+        ).values(added_at=weeks_ago))
+        Mark.query.filter_by(consumer_id=cook.id).update({Mark.created_at: weeks_ago})
+        RecipeStatsRepository.reconcile()
+
+        RecipeRepository.remove_from_favorites(cook.id, catalog['roast'])
+        MarkRepository.delete_by_consumer_and_recipe(cook.id, catalog['roast'])
+        stats = db.session.get(RecipeStats, catalog['roast'])
+        scores = (stats.popularity_score, stats.trending_score)
+        # Отмена вычла ровно давний вклад: счёт совпадает с пересчётом с нуля
+        RecipeStatsRepository.reconcile()
+        stats = db.session.get(RecipeStats, catalog['roast'])
+        assert scores == pytest.approx((stats.popularity_score, stats.trending_score), rel=1e-4)
+        assert stats.trending_score > 3.0
+
+def test_search_top_k(app, client, catalog):
+    data = json.loads(client.get('/api/recipes?ingredients=курица&k=1').data)
+    assert [r['id'] for r in data] == [catalog['pilaf']]
+    
+    data = json.loads(client.get('/api/recipes?ingredients=курица&sort=time&k=1').data)
+    assert [r['id'] for r in data] == [catalog['roast']]
+    
+    data = json.loads(client.get('/api/recipes?sort=time&k=2').data)
+    assert [r['id'] for r in data] == [catalog['mash'], catalog['roast']]
+    
+    assert client.get('/api/recipes?k=0').status_code == 400
+
+def test_fulltext_search_matches_word_forms_and_description(app, client, catalog):
+    with app.app_context():
+        RecipeRepository.create('Борщ домашний', 'Наваристый суп со свёклой', 120, 'medium')
+        RecipeRepository.create('Щи', 'Суп без борща', 60, 'easy')
+    
+    data = json.loads(client.get('/api/recipes?q=борща').data)
+    assert [r['title'] for r in data] == ['Борщ домашний', 'Щи']
+    
+    data = json.loads(client.get('/api/recipes?q=свекла').data)
+    assert [r['title'] for r in data] == ['Борщ домашний']
+
+def test_fulltext_search_follows_updates(app, client, catalog):
+    with app.app_context():
+        RecipeRepository.update(catalog['mash'], title='Картофельное пюре')
+    data = json.loads(client.get('/api/recipes?q=картофельное').data)
+    assert [r['id'] for r in data] == [catalog['mash']]
+    assert json.loads(client.get('/api/recipes?q=Пюре&limit=5').data)[0]['id'] == catalog['mash']
+
+def test_latin_queries_are_transliterated(app, client, catalog):
+    with app.app_context():
+        RecipeRepository.create('Борщ домашний', 'Наваристый суп', 120, 'medium')
+    
+    data = json.loads(client.get('/api/recipes?q=borshch').data)
+    assert [r['title'] for r in data] == ['Борщ домашний']
+    data = json.loads(client.get('/api/recipes?ingredients=kuritsa').data)
+    assert [r['id'] for r in data] == [catalog['pilaf'], catalog['roast']]
+
+def test_search_response_cache_hits_and_invalidation(app, client, catalog):
+    from sqlalchemy import event
+    with app.app_context():
+        engine = db.engine
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    
+    first = client.get('/api/recipes?ingredients=курица&sort=match')
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        # Тот же запрос в другой записи — ответ из кэша без запросов к БД
+        second = client.get('/api/recipes?sort=match&ingredients=%20курица')
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    assert statements == []
+    assert second.data == first.data
+    
+    with app.app_context():
+        RecipeRepository.create('Курица карри', None, 40, 'easy', ingredient_ids=[catalog['chicken']])
+    data = json.loads(client.get('/api/recipes?ingredients=курица&sort=match').data)
+    assert len(data) == 3
+
+def test_search_response_cache_varies_by_forbidden_ingredients(app, client, catalog):
+    from service import AuthService
+    from repository import ConsumerRepository
+    with app.app_context():
+        consumer = AuthService.register('cook', 'cook@example.com', None, 'password123')
+        ConsumerRepository.set_forbidden_ingredients(consumer.id, [catalog['rice']])
+        token = AuthService.generate_token(consumer.id)
+    
+    anonymous = json.loads(client.get('/api/recipes').data)
+    personal = json.loads(client.get('/api/recipes', headers={'Authorization': f'Bearer {token}'}).data)
+    assert catalog['pilaf'] in [r['id'] for r in anonymous]
+    assert catalog['pilaf'] not in [r['id'] for r in personal]
+
+def test_response_cache_evicts_by_entries_and_memory():
+    from flask import Response
+    from cache import ResponseCache
+    cache = ResponseCache(max_entries=2, max_bytes=10, ttl=60)
+    cache.store('a', Response(b'1234'))
+    cache.store('b', Response(b'1234'))
+    assert cache.lookup('a') is not None
+    cache.store('c', Response(b'1234'))
+    # 'b' давно не запрашивали — вытеснен первым
+    assert cache.lookup('b') is None
+    assert cache.lookup('a').get_data() == b'1234'
+    cache.store('d', Response(b'123456'))
+    assert cache.size <= 10 and cache.lookup('d') is not None
+    cache.store('big', Response(b'x' * 11))
+    assert cache.lookup('big') is None
+
+def test_recipe_detail_etag(app, client, catalog):
+    from service import AuthService
+    url = f"/api/recipes/{catalog['roast']}"
+    response = client.get(url)
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'no-cache'
+    
+    not_modified = client.get(url, headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b''
+    assert not_modified.headers['ETag'] == etag
+    
+    # Новый комментарий и правка рецепта меняют ETag
+    with app.app_context():
+        consumer = AuthService.register('cook', 'cook@example.com', None, 'password123')
+        token = AuthService.generate_token(consumer.id)
+    client.post(f"/api/recipes/{catalog['roast']}/comments", json={'text': 'Вкусно'},
+                headers={'Authorization': f'Bearer {token}'})
+    commented = client.get(url, headers={'If-None-Match': etag})
+    assert commented.status_code == 200
+    assert json.loads(commented.data)['comments_count'] == 1
+    
+    with app.app_context():
+        RecipeRepository.update(catalog['roast'], cooking_time=55)
+    assert client.get(url, headers={'If-None-Match': commented.headers['ETag']}).status_code == 200
+    assert client.get('/api/recipes/999999').status_code == 404
+
+def test_recipe_detail_constant_queries(app, catalog):
+    from sqlalchemy import event
+    from models import Learning, StepLearning, Category
+    from repository import MarkRepository, CommentRepository
+    from service import AuthService, RecipeService
+    with app.app_context():
+        recipe = db.session.get(Recipe, catalog['roast'])
+        recipe.categories = [Category(name='Горячее')]
+        learning = Learning(title='Как готовить', recipe_id=recipe.id)
+        learning.steps = [
+            StepLearning(title=f'Шаг {number}', description='...', number=number) for number in (2, 1, 3)
+        ]
+        db.session.add(learning)
+        db.session.commit()
+        for i in range(6):
+            cook = AuthService.register(f'cook{i}', f'cook{i}@example.com', None, 'password123')
+            MarkRepository.upsert(cook.id, catalog['roast'], 3 + i % 3)
+            CommentRepository.create('Вкусно', cook.id, catalog['roast'])
+        db.session.expire_all()
+        
+        statements = []
+        record = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            details = RecipeService.get_recipe(catalog['roast'], [catalog['chicken']])
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        
+        # Рецепт с recipe_stats и learning, категории, ингредиенты, шаги
+        assert len(statements) == 4
+        assert details['comments_count'] == 6
+        assert details['avg_rating'] == pytest.approx(4.0)
+        assert [step['number'] for step in details['steps']] == [1, 2, 3]
+        assert [c['name'] for c in details['categories']] == ['Горячее']
+        assert details['match_percent'] == pytest.approx(1 / 3)
+        assert {i['name'] for i in details['missing_ingredients']} == {'картофель', 'лук'}
+
+def test_sparse_fieldsets_skip_unrequested_work(app, client, catalog):
+    from sqlalchemy import event
+    app.config['RECIPE_CACHE_ENABLED'] = False
+    statements = []
+    record = lambda *args: statements.append(args[2])
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        full = json.loads(client.get('/api/recipes?ingredients=курица').data)
+        full_queries = len(statements)
+        statements.clear()
+        grid = json.loads(client.get('/api/recipes?ingredients=курица&fields=id,title,image_url,avg_rating').data)
+        grid_queries = len(statements)
+    finally:
+        with app.app_context():
+            event.remove(db.engine, 'before_cursor_execute', record)
+    
+    assert [r['id'] for r in grid] == [r['id'] for r in full]
+    assert set(grid[0]) == {'id', 'title', 'image_url', 'avg_rating'}
+    # Категории и недостающие ингредиенты не запрашивались
+    assert grid_queries <= full_queries - 2
+    
+    data = json.loads(client.get('/api/recipes?include=categories').data)
+    assert 'categories' in data[0] and 'avg_rating' not in data[0] and 'missing_ingredients' not in data[0]
+    
+    detail = json.loads(client.get(f"/api/recipes/{catalog['roast']}?fields=id,title&include=stats").data)
+    assert set(detail) == {'id', 'title', 'avg_rating', 'comments_count', 'favorites_count'}
+    assert client.get('/api/recipes?include=steps').status_code == 400
+    assert client.get(f"/api/recipes/{catalog['roast']}?fields=secret").status_code == 400
+
+def test_catalog_list_etags(app, client, catalog):
+    for url in ['/api/categories', '/api/ingredients', '/api/ingredients?q=кур']:
+        response = client.get(url)
+        assert response.headers['Cache-Control'].startswith('public')
+        assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    
+    etag = client.get('/api/ingredients').headers['ETag']
+    with app.app_context():
+        from repository import IngredientRepository
+        IngredientRepository.create('Тыква')
+    assert client.get('/api/ingredients', headers={'If-None-Match': etag}).status_code == 200
+
+def test_recipe_neighbors_rebuild_full_and_incremental(app, catalog):
+    from service.recipe_similarity import RecipeSimilarity
+    from repository import RecipeNeighborRepository
+    with app.app_context():
+        RecipeSimilarity.rebuild()
+        neighbors = RecipeNeighborRepository.get_for([catalog['roast'], catalog['mash']])
+        # Жаркое: с пловом общая курица, с пюре — картофель; списки отсортированы по похожести
+        assert [n for n, _ in neighbors[catalog['roast']]] == [catalog['mash'], catalog['pilaf']]
+        assert neighbors[catalog['roast']][0][1] == pytest.approx(0.7 / 3 ** 0.5)
+        assert [n for n, _ in neighbors[catalog['mash']]] == [catalog['roast']]
+        
+        # Новый рецепт попадает в списки соседей после инкрементального пересчёта
+        fries = RecipeRepository.create('Картофель фри', None, 20, 'easy', ingredient_ids=[catalog['potato']])
+        RecipeSimilarity.rebuild([fries.id])
+        neighbors = RecipeNeighborRepository.get_for([catalog['mash'], fries.id])
+        assert neighbors[catalog['mash']][0] == (fries.id, pytest.approx(0.7))
+        assert catalog['mash'] in [n for n, _ in neighbors[fries.id]]
+
+def test_recipe_similarity_drops_common_features_and_sizes_blocks(app, catalog, monkeypatch):
+    import numpy as np
+    from service import recipe_similarity
+    from service.recipe_similarity import RecipeSimilarity
+    with app.app_context():
+        full = RecipeSimilarity().neighbors()
+        # Блок на строку даёт те же списки, что и общий блок
+        monkeypatch.setattr(recipe_similarity, 'BLOCK_NNZ', 1)
+        similarity = RecipeSimilarity()
+        assert all(len(block) == 1 for block in similarity._blocks(np.arange(3)))
+        assert similarity.neighbors() == full
+
+        # Курица и картофель есть в двух рецептах из трёх — при отсечке они не связывают рецепты
+        monkeypatch.setattr(recipe_similarity, 'MIN_RECIPES_FOR_CUTOFF', 0)
+        similarity = RecipeSimilarity()
+        assert similarity.ingredients.shape == (3, 2)
+        assert similarity.neighbors() == {catalog['roast']: [], catalog['pilaf']: [], catalog['mash']: []}
+        assert similarity.affected([catalog['mash']]) == {catalog['mash']}
+
+def test_recommendations_merge_neighbors_of_history(app, client, catalog):
+    from service import AuthService
+    from service.recipe_similarity import RecipeSimilarity
+    with app.app_context():
+        fries = RecipeRepository.create('Картофель фри', None, 20, 'easy', ingredient_ids=[catalog['potato']])
+        fries_id = fries.id
+        RecipeSimilarity.rebuild()
+        consumer = AuthService.register('cook', 'cook@example.com', None, 'password123')
+        token = AuthService.generate_token(consumer.id)
+    headers = {'Authorization': f'Bearer {token}'}
+    
+    client.post('/api/history', json={'recipe_id': catalog['mash']}, headers=headers)
+    data = json.loads(client.get('/api/recommendations', headers=headers).data)
+    ids = [r['id'] for r in data]
+    # Сначала соседи пюре, затем популярные; просмотренное не рекомендуем
+    assert ids[:2] == [fries_id, catalog['roast']]
+    assert catalog['mash'] not in ids
+    assert set(ids) == {fries_id, catalog['roast'], catalog['pilaf']}
+
+def test_recommendation_feed_serves_stale_and_refreshes(app, client, catalog):
+    from service import AuthService
+    from service.recipe_similarity import RecipeSimilarity
+    from cache import RecommendationFeed
+    with app.app_context():
+        RecipeSimilarity.rebuild()
+        consumer = AuthService.register('cook', 'cook@example.com', None, 'password123')
+        token = AuthService.generate_token(consumer.id)
+        consumer_id = consumer.id
+    headers = {'Authorization': f'Bearer {token}'}
+    
+    first = [r['id'] for r in json.loads(client.get('/api/recommendations', headers=headers).data)]
+    # Просмотр пересчитывает ленту: пюре больше не рекомендуется, его сосед — первый
+    client.post('/api/history', json={'recipe_id': catalog['mash']}, headers=headers)
+    second = [r['id'] for r in json.loads(client.get('/api/recommendations', headers=headers).data)]
+    assert catalog['mash'] in first
+    assert second[0] == catalog['roast'] and catalog['mash'] not in second
+    
+    with app.app_context():
+        feed = RecommendationFeed.get()
+        calls = []
+        build = lambda consumer_id: calls.append(consumer_id) or ['fresh']
+        # Свежая лента из памяти, протухшая отдаётся как есть и пересчитывается
+        assert feed.read(consumer_id, build) == feed.entries[consumer_id].cards
+        feed.entries[consumer_id].built_at -= feed.ttl
+        assert feed.read(consumer_id, build) != ['fresh']
+        assert calls == [consumer_id]
+        assert feed.read(consumer_id, build) == ['fresh']
+
+def test_collaborative_recommendations(app, client, catalog):
+    from service import AuthService
+    from service.recommender_trainer import RecommenderTrainer
+    from repository import MarkRepository
+    app.config['RECOMMENDER_MIN_INTERACTIONS'] = 1
+    with app.app_context():
+        cooks = [AuthService.register(f'cook{i}', f'cook{i}@example.com', None, 'password123') for i in range(4)]
+        # Кто любит плов, любит и жаркое; пюре — отдельная аудитория
+        for cook in cooks[:3]:
+            RecipeRepository.add_to_favorites(cook.id, catalog['pilaf'])
+        for cook in cooks[:2]:
+            RecipeRepository.add_to_favorites(cook.id, catalog['roast'])
+        MarkRepository.upsert(cooks[3].id, catalog['mash'], 5)
+        assert RecommenderTrainer.train(factors=4, iterations=10) == (4, 3)
+        token = AuthService.generate_token(cooks[2].id)
+    
+    data = json.loads(client.get('/api/recommendations', headers={'Authorization': f'Bearer {token}'}).data)
+    # Избранное не рекомендуем; жаркое модель ставит выше пюре
+    assert [r['id'] for r in data] == [catalog['roast'], catalog['mash']]
+
+def test_recipe_factor_index_ann_matches_brute_force():
+    import numpy as np
+    from cache import RecipeFactorIndex
+    rng = np.random.default_rng(1)
+    rows = [(i, rng.normal(size=8).astype(np.float32).tobytes()) for i in range(1, 201)]
+    query = rng.normal(size=8).astype(np.float32).tobytes()
+    exact = RecipeFactorIndex(rows).top_k(query, 5, exclude={1, 2})
+    approximate = RecipeFactorIndex(rows, ann_tables=8).top_k(query, 5, exclude={1, 2})
+    scores = [score for _, score in exact]
+    assert len(exact) == 5 and scores == sorted(scores, reverse=True)
+    assert {r for r, _ in exact} & {1, 2} == set()
+    assert len({r for r, _ in approximate} & {r for r, _ in exact}) >= 3
+
+def test_history_ingestor_batches_and_spools(app, catalog, tmp_path, monkeypatch):
+    from models import RecipeStats, consumer_recipe_history
+    from service import AuthService
+    from service.history_ingestor import HistoryIngestor
+    with app.app_context():
+        cook = AuthService.register('cook', 'cook@example.com', None, 'password123')
+        cook_id = cook.id
+        RecipeRepository.add_to_history(cook_id, catalog['mash'])
+        ingestor = HistoryIngestor(app, interval=3600, max_batch=1000, spool_dir=str(tmp_path))
+        try:
+            ingestor.record(cook_id, catalog['mash'])
+            ingestor.record(cook_id, catalog['roast'])
+            ingestor.record(cook_id, catalog['roast'])
+            ingestor.record(cook_id, 10 ** 6)
+            # До сброса просмотры только в памяти
+            assert db.session.query(consumer_recipe_history).count() == 1
+            
+            assert ingestor.flush()
+            db.session.expire_all()
+            assert db.session.query(consumer_recipe_history).count() == 2
+            # Повторный зритель пюре не увеличивает view_count, два просмотра жаркого — один зритель
+            assert db.session.get(RecipeStats, catalog['mash']).view_count == 1
+            assert db.session.get(RecipeStats, catalog['roast']).view_count == 1
+            
+            # БД недоступна: пакет уходит в спул и переигрывается после восстановления
+            record_views = RecipeRepository.record_views
+            monkeypatch.setattr(RecipeRepository, 'record_views', staticmethod(lambda views: 1 / 0))
+            ingestor.record(cook_id, catalog['pilaf'])
+            assert not ingestor.flush()
+            assert len(list(tmp_path.glob('*.jsonl'))) == 1
+            
+            monkeypatch.setattr(RecipeRepository, 'record_views', record_views)
+            ingestor.close()
+            assert list(tmp_path.iterdir()) == []
+            db.session.expire_all()
+            assert db.session.get(RecipeStats, catalog['pilaf']).view_count == 1
+        finally:
+            ingestor.close()
+
+def test_record_views_updates_stats_in_one_statement(app, catalog):
+    from datetime import datetime
+    from sqlalchemy import event
+    from models import RecipeStats
+    from repository import RecipeStatsRepository
+    from service import AuthService
+    with app.app_context():
+        cook = AuthService.register('cook', 'cook@example.com', None, 'password123')
+        RecipeStatsRepository.reconcile()
+        # У плова строки статистики нет — она пересчитается из истории
+        RecipeStats.query.filter_by(recipe_id=catalog['pilaf']).delete()
+        db.session.commit()
+        now = datetime.utcnow()
+        views = [(cook.id, recipe_id, now) for recipe_id in (catalog['roast'], catalog['mash'], catalog['mash'], catalog['pilaf'])]
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            RecipeRepository.record_views(views)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        # Эпохи читаются один раз на пакет, счётчики сдвигаются одним UPDATE
+        print([s for s in statements if "score_epoch" in s])
+        assert sum('FROM score_epoch' in statement for statement in statements) == 1
+        assert sum(statement.startswith('UPDATE recipe_stats') for statement in statements) == 1
+        stats = RecipeStatsRepository.get_by_recipe_ids([catalog['roast'], catalog['mash'], catalog['pilaf']])
+        assert [stats[catalog[name]].view_count for name in ('roast', 'mash', 'pilaf')] == [1, 1, 1]
+        assert stats[catalog['mash']].popularity_score == pytest.approx(2 * stats[catalog['roast']].popularity_score)
+        assert stats[catalog['pilaf']].popularity_score > 0
+
+def test_search_keys_passes_candidates_in_chunks(app, catalog, monkeypatch):
+    import repository.recipe_repository as recipe_repository
+    with app.app_context():
+        # Порции по одному id: результат тот же, что и одним запросом
+        candidates = [catalog['roast'], catalog['pilaf'], catalog['mash']]
+        expected = sorted(row.id for row in RecipeRepository.search_keys(recipe_ids=candidates, max_time=60))
+        monkeypatch.setattr(recipe_repository, 'SEARCH_KEYS_CHUNK', 1)
+        rows = RecipeRepository.search_keys(recipe_ids=candidates, max_time=60)
+        assert sorted(row.id for row in rows) == expected == sorted([catalog['roast'], catalog['mash']])
+
+def test_search_pagination_rejects_malformed_cursor_key(client, catalog):
+    import base64
+    def cursor(payload):
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+    for key in ['60', [60], {'a': 1}, True, None]:
+        response = client.get(f"/api/recipes?sort=time&limit=1&cursor={cursor({'s': 'time', 'k': key, 'id': 1})}")
+        assert response.status_code == 400
+    assert client.get(f"/api/recipes?sort=time&limit=1&cursor={cursor({'s': 'time', 'k': 60, 'id': '1'})}").status_code == 400
+    assert client.get(f"/api/recipes?sort=time&limit=1&cursor={cursor({'s': 'time', 'k': 60, 'id': 1})}").status_code == 200
+    assert client.get(f"/api/recipes?limit=1&cursor={cursor({'s': 'match', 'k': None, 'id': 1})}").status_code == 200
+
+def test_mark_update_without_stats_row(app, catalog):
+    from models import RecipeStats
+    from repository import MarkRepository
+    from service import AuthService
+    with app.app_context():
+        cook = AuthService.register('cook', 'cook@example.com', None, 'password123')
+        MarkRepository.upsert(cook.id, catalog['mash'], 3)
+        # Рецепт из БД до появления recipe_stats: строки ещё нет
+        RecipeStats.query.filter_by(recipe_id=catalog['mash']).delete()
+        db.session.commit()
+        
+        MarkRepository.upsert(cook.id, catalog['mash'], 5)
+        stats = db.session.get(RecipeStats, catalog['mash'])
+        assert (stats.rating_sum, stats.rating_count, stats.avg_rating) == (5, 1, 5.0)
+
+def test_recommendations_exclude_whole_history_in_sql(app, client, catalog, monkeypatch):
+    import service.recipe_service as recipe_service
+    from service import AuthService
+    with app.app_context():
+        consumer = AuthService.register('cook', 'cook@example.com', None, 'password123')
+        token = AuthService.generate_token(consumer.id)
+        RecipeRepository.add_to_history(consumer.id, catalog['mash'])
+        RecipeRepository.add_to_history(consumer.id, catalog['pilaf'])
+    # В память попадает только последний просмотр, но пюре всё равно не рекомендуем
+    monkeypatch.setattr(recipe_service, 'RECENT_HISTORY_SIZE', 1)
+    data = json.loads(client.get('/api/recommendations', headers={'Authorization': f'Bearer {token}'}).data)
+    assert [r['id'] for r in data] == [catalog['roast']]
+
+def test_score_epochs_seeded_idempotently(app):
+    from models import ScoreEpoch
+    from repository import RecipeStatsRepository
+    with app.app_context():
+        before = {row.name: row.epoch for row in ScoreEpoch.query}
+        assert set(before) == {'popularity_score', 'trending_score'}
+        # Повторный запуск (другой процесс) не падает и не сдвигает эпохи
+        RecipeStatsRepository.ensure_epochs()
+        assert {row.name: row.epoch for row in ScoreEpoch.query} == before
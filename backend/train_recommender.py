@@ -0,0 +1,36 @@
+"""
+Обучение коллаборативных рекомендаций по оценкам и избранному (implicit ALS).
+Векторы пользователей и рецептов сохраняются в consumer_factor / recipe_factor,
+сервер перечитывает их раз в RECOMMENDER_RELOAD_SECONDS.
+Использование:
+  python train_recommender.py
+  python train_recommender.py --factors 64 --iterations 20 --regularization 0.05 --alpha 20
+"""
+import argparse
+from run import create_app
+from extensions import db
+from service.recommender_trainer import (
+    RecommenderTrainer, DEFAULT_FACTORS, DEFAULT_ITERATIONS, DEFAULT_REGULARIZATION, DEFAULT_ALPHA
+)
+
+def main():
+    parser = argparse.ArgumentParser(description='Обучение коллаборативных рекомендаций')
+    parser.add_argument('--factors', type=int, default=DEFAULT_FACTORS)
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument('--regularization', type=float, default=DEFAULT_REGULARIZATION)
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA)
+    args = parser.parse_args()
+    
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        consumers, recipes = RecommenderTrainer.train(
+            factors=args.factors,
+            iterations=args.iterations,
+            regularization=args.regularization,
+            alpha=args.alpha
+        )
+        print(f"✓ Recommender trained: {consumers} consumers, {recipes} recipes")
+
+if __name__ == '__main__':
+    main()
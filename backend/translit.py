@@ -0,0 +1,86 @@
+"""Транслитерация кириллица ↔ латиница для слагов картинок и поиска с латинской раскладки"""
+import re
+import unicodedata
+
+TRANSLIT_MAP = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'i', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya'
+}
+
+# Обратная транслитерация: сначала самые длинные сочетания
+REVERSE_TRANSLIT = [
+    ('shch', 'щ'), ('sch', 'щ'),
+    ('zh', 'ж'), ('kh', 'х'), ('ts', 'ц'), ('tz', 'ц'), ('ch', 'ч'), ('sh', 'ш'),
+    ('yu', 'ю'), ('ya', 'я'), ('yo', 'е'), ('ye', 'е'),
+    ('a', 'а'), ('b', 'б'), ('c', 'к'), ('d', 'д'), ('e', 'е'), ('f', 'ф'), ('g', 'г'),
+    ('h', 'х'), ('i', 'и'), ('j', 'й'), ('k', 'к'), ('l', 'л'), ('m', 'м'), ('n', 'н'),
+    ('o', 'о'), ('p', 'п'), ('q', 'к'), ('r', 'р'), ('s', 'с'), ('t', 'т'), ('u', 'у'),
+    ('v', 'в'), ('w', 'в'), ('x', 'кс'), ('z', 'з'), ("'", 'ь')
+]
+_REVERSE_PATTERN = re.compile('|'.join(re.escape(latin) for latin, _ in REVERSE_TRANSLIT) + '|y')
+_REVERSE_LOOKUP = dict(REVERSE_TRANSLIT)
+_CYRILLIC_VOWELS = set('аеиоуыэюя')
+
+# Разные способы записать одно и то же латиницей сводим к одному ключу
+_LATIN_VARIANTS = [
+    (re.compile(r'shch'), 'sch'), (re.compile(r'kh'), 'h'), (re.compile(r'tz'), 'ts'),
+    (re.compile(r'ph'), 'f'), (re.compile(r'ck'), 'k'), (re.compile(r'c(?!h)'), 'ts'),
+    (re.compile(r'w'), 'v'), (re.compile(r'q'), 'k'), (re.compile(r'x'), 'ks'),
+    (re.compile(r'j'), 'y'), (re.compile(r'yo'), 'e'), (re.compile(r'y'), 'i'),
+    (re.compile(r'(\w)\1+'), r'\1')
+]
+
+def _strip_marks(value):
+    normalized = unicodedata.normalize('NFKD', value).lower().replace('ё', 'е')
+    return ''.join(char for char in normalized if unicodedata.category(char) != 'Mn')
+
+def is_latin(value):
+    """Есть латинские буквы и нет кириллицы"""
+    return bool(re.search(r'[a-z]', value, re.IGNORECASE)) and not re.search(r'[а-яё]', value, re.IGNORECASE)
+
+def to_latin(value):
+    """Прямая транслитерация: 'курица' -> 'kuritsa'"""
+    return ''.join(TRANSLIT_MAP.get(char, char) for char in _strip_marks(value or ''))
+
+def to_cyrillic(value):
+    """Обратная транслитерация: 'kuritsa' -> 'курица', 'pomidory' -> 'помидоры'"""
+    result = []
+
+    def replace(match):
+        latin = match.group(0)
+        if latin != 'y':
+            return _REVERSE_LOOKUP[latin]
+        # y после согласной — «ы», после гласной или в начале слова — «й»
+        previous = ''.join(result)[-1:]
+        return 'ы' if previous.isalpha() and previous not in _CYRILLIC_VOWELS else 'й'
+
+    position = 0
+    text = (value or '').lower()
+    for match in _REVERSE_PATTERN.finditer(text):
+        result.append(text[position:match.start()])
+        result.append(replace(match))
+        position = match.end()
+    result.append(text[position:])
+    return ''.join(result)
+
+def latin_key(value):
+    """Ключ для сравнения латинских написаний: kuritsa / kuritza / kurica -> один ключ"""
+    key = to_latin(value)
+    for pattern, replacement in _LATIN_VARIANTS:
+        key = pattern.sub(replacement, key)
+    return key
+
+def slugify(name):
+    if not name:
+        return ''
+    slug_chars = []
+    for char in _strip_marks(name):
+        if char.isalnum():
+            slug_chars.append(TRANSLIT_MAP.get(char, char))
+        else:
+            slug_chars.append('-')
+    slug = re.sub(r'-{2,}', '-', ''.join(slug_chars))
+    return slug.strip('-')
@@ -7,12 +7,16 @@ Usage:
 from __future__ import annotations
 
 import re
-import unicodedata
+import sys
 from pathlib import Path
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 OUTPUT_ROOT = REPO_ROOT / "backend" / "static" / "img"
 
+# Таблица транслитерации общая с backend (seed.py и поиск)
+sys.path.insert(0, str(REPO_ROOT / "backend"))
+from translit import slugify  # noqa: E402
+
 CATEGORIES = [
     'Завтраки', 'Обеды', 'Ужины', 'Десерты', 'Салаты', 'Супы', 'Выпечка',
     'Напитки', 'Закуски', 'Вегетарианские', 'Мясо', 'Паста', 'Все блюда'
@@ -97,30 +101,6 @@ def normalize_name(value: str) -> str:
     return normalized
 
 
-def slugify(value: str) -> str:
-    if not value:
-        return ''
-    translit_map = {
-        'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
-        'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'i', 'к': 'k', 'л': 'l', 'м': 'm',
-        'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
-        'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch',
-        'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya'
-    }
-    normalized = unicodedata.normalize('NFKD', value).lower().replace('ё', 'е')
-    normalized = ''.join(
-        char for char in normalized if unicodedata.category(char) != 'Mn'
-    )
-    slug_chars = []
-    for char in normalized:
-        if char.isalnum():
-            slug_chars.append(translit_map.get(char, char))
-        else:
-            slug_chars.append('-')
-    slug = re.sub(r'-{2,}', '-', ''.join(slug_chars))
-    return slug.strip('-')
-
-
 def dedupe(names: list[str]) -> list[str]:
     seen = set()
     unique = []